@@ -0,0 +1,131 @@
+"""Benchmark: FPS และ mAP drift ของ inference backend (PyTorch / ONNX Runtime / OpenVINO / INT8)
+
+รันทุก backend กับเฟรมเดียวกันจากคลิปในเครื่อง ใช้ผลของ PyTorch FP32 เป็นค่าอ้างอิง
+แล้ววัด mAP@0.5 และ mAP@0.5:0.95 ของแต่ละ backend เทียบกับค่าอ้างอิง (drift: 1.0 = ตรงกันทั้งหมด)
+
+รัน:
+    python benchmarks/bench_backends.py --video pool.mp4 [--model yolo11m.pt]
+        [--backends pytorch,onnx,openvino,openvino-int8] [--calibration pool_calib.mp4] [--frames 200]
+"""
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.backends import load_detection_model  # noqa: E402
+
+
+def read_frames(path: str, count: int) -> list:
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < count:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        frames.append(frame)
+    cap.release()
+    if not frames:
+        raise SystemExit(f"อ่านเฟรมไม่ได้: {path}")
+    return frames
+
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+def average_precision(predictions: list, references: list, iou_threshold: float) -> float:
+    """AP (all-point interpolation) ของกล่อง [x1, y1, x2, y2, conf] เทียบกับกล่องอ้างอิงต่อเฟรม"""
+    scores, hits = [], []
+    total_refs = sum(len(ref) for ref in references)
+    if total_refs == 0:
+        return 1.0 if sum(len(p) for p in predictions) == 0 else 0.0
+    for pred, ref in zip(predictions, references):
+        if len(pred) == 0:
+            continue
+        order = np.argsort(-pred[:, 4])
+        pred = pred[order]
+        matched = np.zeros(len(ref), dtype=bool)
+        ious = iou_matrix(pred[:, :4], ref[:, :4]) if len(ref) else np.zeros((len(pred), 0))
+        for row in range(len(pred)):
+            scores.append(pred[row, 4])
+            candidates = np.where(~matched & (ious[row] >= iou_threshold))[0] if len(ref) else []
+            if len(candidates):
+                best = candidates[np.argmax(ious[row, candidates])]
+                matched[best] = True
+                hits.append(1)
+            else:
+                hits.append(0)
+    if not scores:
+        return 0.0
+    hits = np.array(hits)[np.argsort(-np.array(scores))]
+    tp = np.cumsum(hits)
+    recall = tp / total_refs
+    precision = tp / np.arange(1, len(hits) + 1)
+    recall = np.concatenate([[0.0], recall, [1.0]])
+    precision = np.concatenate([[1.0], precision, [0.0]])
+    precision = np.maximum.accumulate(precision[::-1])[::-1]
+    return float(np.sum((recall[1:] - recall[:-1]) * precision[1:]))
+
+
+def run_backend(model, frames: list, device: str, conf: float) -> tuple:
+    """คืนค่า (FPS, [กล่อง (N, 5) ต่อเฟรม])"""
+    model.predict(frames[:1], device=device, conf=conf, verbose=False, classes=[0])  # warm-up
+    boxes = []
+    start = time.perf_counter()
+    for frame in frames:
+        result = model.predict([frame], device=device, conf=conf, verbose=False, classes=[0])[0]
+        data = result.boxes.data.cpu().numpy()
+        boxes.append(data[:, [0, 1, 2, 3, -2]] if len(data) else np.zeros((0, 5), dtype=np.float32))
+    fps = len(frames) / (time.perf_counter() - start)
+    return fps, boxes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", required=True)
+    parser.add_argument("--model", default="yolo11m.pt")
+    parser.add_argument("--backends", default="pytorch,onnx,openvino,openvino-int8",
+                        help="backend (ต่อท้าย -int8 = INT8) คั่นด้วย comma")
+    parser.add_argument("--calibration", default="", help="คลิป/โฟลเดอร์ภาพสำหรับ INT8 (ว่าง = ใช้ --video)")
+    parser.add_argument("--cache-dir", default="model_cache")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--conf", type=float, default=0.25)
+    parser.add_argument("--frames", type=int, default=200)
+    args = parser.parse_args()
+
+    frames = read_frames(args.video, args.frames)
+    print(f"video={args.video} frames={len(frames)} model={args.model} device={args.device}")
+
+    reference = None
+    print(f"{'backend':>16} | {'FPS':>7} | {'det/frame':>9} | {'mAP50 vs ref':>12} | {'mAP50-95 vs ref':>15}")
+    for name in ["pytorch"] + [b for b in args.backends.split(",") if b != "pytorch"]:
+        backend, _, suffix = name.partition("-")
+        model = load_detection_model(
+            args.model,
+            backend=backend,
+            int8=suffix == "int8",
+            calibration_source=args.calibration or args.video,
+            cache_dir=args.cache_dir,
+        )
+        fps, boxes = run_backend(model, frames, args.device, args.conf)
+        if reference is None:
+            reference = boxes
+        map50 = average_precision(boxes, reference, 0.5)
+        map50_95 = float(np.mean([average_precision(boxes, reference, t) for t in np.arange(0.5, 0.96, 0.05)]))
+        per_frame = np.mean([len(b) for b in boxes])
+        print(f"{name:>16} | {fps:>7.2f} | {per_frame:>9.2f} | {map50:>12.3f} | {map50_95:>15.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Benchmark: ความแม่นยำของตำแหน่งที่ทำนาย (keyframe detection) เทียบกับการรัน detector ทุกเฟรม
+
+รัน detector + tracker กับทุกเฟรมของคลิปที่บันทึกไว้ (ใช้เป็นค่าอ้างอิง) แล้วจำลองโหมด keyframe:
+เฟรมที่ i % K == 0 ใช้ผลตรวจจับจริง เฟรมอื่นใช้ ConstantVelocityModel ทำนายกล่อง
+จากนั้นเทียบกล่องที่ทำนายกับกล่องจริงของ track เดียวกัน (ระยะกึ่งกลาง px, IoU)
+เทียบกับ "hold" (ใช้กล่องของ keyframe ล่าสุดโดยไม่ทำนาย)
+
+หมายเหตุ: keyframe ใช้ track id จากการติดตามที่อัตราเต็ม ผลจึงวัดเฉพาะความแม่นยำของ motion model
+(ไม่รวมผลของ tracker ที่ได้เฟรมน้อยลง)
+
+รัน:
+    python benchmarks/bench_keyframe.py --video pool.mp4 [--model yolo11m.pt] [--k 2,3,5,10]
+"""
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import cv2
+import torch
+from ultralytics import YOLO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.detections import extract_detections  # noqa: E402
+from src.inference import BatchTracker  # noqa: E402
+from src.motion import ConstantVelocityModel  # noqa: E402
+
+
+def record_tracks(video_path: str, model_name: str, device: str, conf: float, max_frames: int):
+    """รัน detector + tracker ทุกเฟรม - คืนค่า (fps, [{track_id: box}], ms/เฟรม)"""
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise SystemExit(f"เปิดวิดีโอไม่ได้: {video_path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+
+    detector = BatchTracker(YOLO(model_name), device, conf)
+    frames_tracks = []
+    elapsed = 0.0
+    while max_frames <= 0 or len(frames_tracks) < max_frames:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        start = time.perf_counter()
+        result = detector.track([frame], ["bench"])[0]
+        elapsed += time.perf_counter() - start
+        detections = extract_detections(result).tracked()
+        frames_tracks.append({
+            track_id: box for track_id, box in zip(detections.track_ids.tolist(), detections.xyxy.astype(np.float64))
+        })
+    cap.release()
+    ms_per_frame = elapsed / len(frames_tracks) * 1000.0 if frames_tracks else 0.0
+    return fps, frames_tracks, ms_per_frame
+
+
+def box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """IoU ของกล่องคู่ต่อคู่ (N, 4)"""
+    x1 = np.maximum(a[:, 0], b[:, 0])
+    y1 = np.maximum(a[:, 1], b[:, 1])
+    x2 = np.minimum(a[:, 2], b[:, 2])
+    y2 = np.minimum(a[:, 3], b[:, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a + area_b - inter, 1e-9)
+
+
+def evaluate(frames_tracks: list, fps: float, every_n: int) -> dict:
+    """จำลอง keyframe ทุก every_n เฟรม - คืนค่าความคลาดเคลื่อนของกล่องที่ทำนาย / hold"""
+    motion = ConstantVelocityModel()
+    hold = {}
+    predicted_boxes, held_boxes, truth_boxes = [], [], []
+    for index, tracks in enumerate(frames_tracks):
+        ts = index / fps
+        if index % every_n == 0:
+            motion.update(list(tracks.keys()), list(tracks.values()), ts)
+            hold = dict(tracks)
+            continue
+        # เทียบเฉพาะ track ที่อยู่ทั้งใน keyframe ล่าสุดและในเฟรมนี้
+        common = [track_id for track_id in tracks if track_id in hold]
+        if not common:
+            continue
+        predicted_boxes.append(motion.predict(common, ts))
+        held_boxes.append(np.array([hold[track_id] for track_id in common]))
+        truth_boxes.append(np.array([tracks[track_id] for track_id in common]))
+
+    if not truth_boxes:
+        return {"samples": 0}
+    truth = np.concatenate(truth_boxes)
+    out = {"samples": len(truth)}
+    for name, boxes in (("predicted", np.concatenate(predicted_boxes)), ("hold", np.concatenate(held_boxes))):
+        centers = (boxes[:, :2] + boxes[:, 2:]) / 2.0
+        truth_centers = (truth[:, :2] + truth[:, 2:]) / 2.0
+        errors = np.linalg.norm(centers - truth_centers, axis=1)
+        out[name] = {
+            "center_err_mean": float(errors.mean()),
+            "center_err_p95": float(np.percentile(errors, 95)),
+            "iou_mean": float(box_iou(boxes, truth).mean()),
+        }
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", required=True, help="คลิปที่บันทึกไว้")
+    parser.add_argument("--model", default="yolo11m.pt")
+    parser.add_argument("--device", default="0" if torch.cuda.is_available() else "cpu")
+    parser.add_argument("--conf", type=float, default=0.5)
+    parser.add_argument("--k", default="2,3,5,10", help="ค่า K (รัน detector ทุก K เฟรม) คั่นด้วย comma")
+    parser.add_argument("--max-frames", type=int, default=0, help="จำนวนเฟรมสูงสุด (0 = ทั้งคลิป)")
+    args = parser.parse_args()
+
+    fps, frames_tracks, ms_per_frame = record_tracks(args.video, args.model, args.device, args.conf, args.max_frames)
+    print(f"video={args.video} frames={len(frames_tracks)} fps={fps:.1f} detector+tracker={ms_per_frame:.1f} ms/เฟรม")
+    print(f"{'K':>3} | {'samples':>7} | {'pred err px (mean/p95)':>22} | {'pred IoU':>8} | "
+          f"{'hold err px (mean/p95)':>22} | {'hold IoU':>8} | {'detector ms/frame':>17}")
+    for every_n in [int(k) for k in args.k.split(",")]:
+        stats = evaluate(frames_tracks, fps, every_n)
+        if not stats["samples"]:
+            print(f"{every_n:>3} | {0:>7} | (ไม่มี track ที่เทียบได้)")
+            continue
+        pred, hold = stats["predicted"], stats["hold"]
+        print(f"{every_n:>3} | {stats['samples']:>7} | "
+              f"{pred['center_err_mean']:>10.1f} / {pred['center_err_p95']:>9.1f} | {pred['iou_mean']:>8.3f} | "
+              f"{hold['center_err_mean']:>10.1f} / {hold['center_err_p95']:>9.1f} | {hold['iou_mean']:>8.3f} | "
+              f"{ms_per_frame / every_n:>17.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""Benchmark: pipeline เต็มรูปแบบของ main() จากคลิปที่บันทึกไว้ - latency แยกตามขั้นตอน + FPS + peak RSS
+
+รัน main() ตัวจริงกับไฟล์วิดีโอ (อ่านทุกเฟรม ไม่ทิ้งเฟรม) โดย:
+    - Telegram ส่งไปที่ StandInBotApi ในเครื่อง (benchmarks/telegram_standin.py)
+    - การแสดงผลใช้ display ว่าง (ยังวาดผลลัพธ์ทุกเฟรมเหมือนเปิดหน้าต่าง) หรือ --headless
+    - zones อ่านจากไฟล์โดยไม่ถาม (ไม่ระบุ --zones = ติดตามทั้งเฟรม)
+
+ขั้นตอนที่วัด (p50 / p95 / p99 ms): capture, inference, logic (zone/state/tier), annotation,
+alert_process_frame, alert_trigger, alert_encode_clip, alert_encode_snapshot, prebuffer_encode, display,
+journal (สรุป track ต่อเฟรม), journal_write (writer thread ต่อ batch), dvr_encode (เมื่อ --env DVR_MAX_MB=...)
+
+ค่าใน .env ยังมีผล (เช่น MODEL_NAME) ยกเว้นค่าที่กำหนดด้วย --env
+ผลลัพธ์บันทึกเป็น JSON เทียบกับ release ก่อนหน้าด้วย --baseline (exit code 1 เมื่อช้าลงเกิน --tolerance)
+
+รัน:
+    python benchmarks/bench_pipeline.py --video pool.mp4 [--zones zones.json] [--frames 0]
+        [--env MODEL_NAME=yolo11n.pt --env DETECT_EVERY_N_FRAMES=2] [--headless]
+        [--output bench_pipeline.json] [--baseline previous.json] [--tolerance 0.1]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import main as app  # noqa: E402  (โหลด .env ตอน import - ค่าจาก --env ตั้งทีหลังจึงมีผลเหนือกว่า)
+from src.stage_timer import StageTimer  # noqa: E402
+from telegram_standin import StandInBotApi  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# ขั้นตอนที่ใช้ตรวจ regression ของ p95 (ขั้นตอนอื่นแสดงผลอย่างเดียว)
+REGRESSION_STAGES = ("capture", "inference", "logic", "annotation", "alert_process_frame", "alert_encode_clip")
+
+
+class NullDisplay:
+    """display ที่ไม่แสดงอะไร - main() ยังวาดผลลัพธ์ทุกเฟรมเหมือนมีหน้าต่าง"""
+
+    def __init__(self):
+        self.frames_shown = 0
+
+    def show(self, title, frame):
+        self.frames_shown += 1
+
+    def wait_key(self) -> int:
+        return 0xFF
+
+    def close(self):
+        pass
+
+
+def peak_rss_mb():
+    """หน่วยความจำสูงสุดของ process (MB) หรือ None เมื่อวัดไม่ได้"""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux รายงานเป็น KB, macOS เป็น byte
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    try:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+    except Exception:
+        return None
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=app.BASE_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list:
+    """รายการ regression: FPS ลดลง หรือ p95 ของขั้นตอนหลักเพิ่มขึ้นเกิน tolerance (สัดส่วน)"""
+    regressions = []
+    old_fps, new_fps = baseline.get("fps", 0.0), report["fps"]
+    if old_fps > 0 and new_fps < old_fps * (1.0 - tolerance):
+        regressions.append(f"fps {old_fps:.2f} -> {new_fps:.2f}")
+    for stage in REGRESSION_STAGES:
+        old, new = baseline.get("stages", {}).get(stage), report["stages"].get(stage)
+        if old and new and new["p95_ms"] > old["p95_ms"] * (1.0 + tolerance):
+            regressions.append(f"{stage} p95 {old['p95_ms']:.2f} -> {new['p95_ms']:.2f} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", required=True, help="คลิปที่บันทึกไว้ (คั่นด้วย comma = หลายกล้อง)")
+    parser.add_argument("--zones", default="", help="ไฟล์ zones ของกล้องแรก (ว่าง = ทั้งเฟรม)")
+    parser.add_argument("--frames", type=int, default=0, help="จำนวนเฟรมสูงสุด (0 = จนจบคลิป)")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="ตั้งค่าเพิ่ม (ซ้ำได้)")
+    parser.add_argument("--headless", action="store_true", help="ไม่วาดผลลัพธ์ทุกเฟรม (เหมือน SHOW_VIDEO=false)")
+    parser.add_argument("--telegram-delay-ms", type=float, default=20.0, help="เวลาตอบกลับของ stand-in server")
+    parser.add_argument("--output", default="bench_pipeline.json")
+    parser.add_argument("--baseline", default="", help="ผลของ release ก่อนหน้า")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args()
+
+    standin = StandInBotApi(delay_sec=args.telegram_delay_ms / 1000.0).start()
+    work_dir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    overrides = {
+        "VIDEO_SOURCES": args.video,
+        "SHOW_VIDEO": "false",
+        "ZONE_SETUP": "false",
+        "ZONES_FILE": os.path.abspath(args.zones) if args.zones else os.path.join(work_dir, "zones.json"),
+        "CAPTURE_DROP_FRAMES": "false",
+        "CAPTURE_STOP_AT_EOF": "true",
+        "STATS_INTERVAL_SEC": "1000000",
+        "TELEGRAM_TOKEN": "123:standin",
+        "TELEGRAM_CHAT_ID": "1",
+        "TELEGRAM_API_BASE_URL": standin.base_url,
+        "ALERT_SNAPSHOT_PATH": os.path.join(work_dir, "alert_snapshot.jpg"),
+        "ALERT_VIDEO_PATH": os.path.join(work_dir, "alert_video.mp4"),
+        "JOURNAL_PATH": os.path.join(work_dir, "events.db"),
+        "DVR_DIR": os.path.join(work_dir, "dvr"),
+    }
+    for item in args.env:
+        key, _, value = item.partition("=")
+        overrides[key.strip()] = value
+    os.environ.update(overrides)
+
+    timer = StageTimer(max_samples=0)
+    display = None if args.headless else NullDisplay()
+    try:
+        run = app.main(display=display, timer=timer, max_frames=args.frames, require_env_file=False)
+    finally:
+        standin.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+    if not run or run["frames"] == 0:
+        raise SystemExit("❌ pipeline ไม่ได้ประมวลผลเฟรมใดเลย")
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "revision": git_revision(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "video": args.video,
+        "headless": args.headless,
+        "config": {key: value for key, value in overrides.items() if not key.startswith("TELEGRAM_")},
+        "frames": run["frames"],
+        "batches": run["batches"],
+        "elapsed_sec": run["elapsed_sec"],
+        "fps": run["frames"] / run["elapsed_sec"] if run["elapsed_sec"] > 0 else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+        "telegram_requests": {method: standin.count(method) for method in ("sendMessage", "sendPhoto", "sendVideo")},
+        "stages": timer.summary(),
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    print(f"\n{'stage':>22} | {'count':>6} | {'p50 ms':>8} | {'p95 ms':>8} | {'p99 ms':>8}")
+    for stage, stats in report["stages"].items():
+        print(f"{stage:>22} | {stats['count']:>6} | {stats['p50_ms']:>8.2f} | {stats['p95_ms']:>8.2f} | {stats['p99_ms']:>8.2f}")
+    rss = report["peak_rss_mb"]
+    print(f"frames={report['frames']} fps={report['fps']:.2f} peak_rss={f'{rss:.0f} MB' if rss else 'n/a'} -> {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"❌ ช้าลงเกิน {args.tolerance:.0%} เทียบกับ {baseline.get('revision') or args.baseline}:")
+            for line in regressions:
+                print(f"   {line}")
+            sys.exit(1)
+        print(f"✅ ไม่มี regression เทียบกับ {baseline.get('revision') or args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
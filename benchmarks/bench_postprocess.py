@@ -0,0 +1,79 @@
+"""Micro-benchmark: การดึงผลลัพธ์ YOLO ทีละกล่อง (เดิม) เทียบกับแบบ vectorized (extract_detections)
+
+รัน:
+    python benchmarks/bench_postprocess.py [--device cpu|cuda] [--iters 2000]
+"""
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import torch
+from ultralytics.engine.results import Results
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.detections import extract_detections  # noqa: E402
+
+
+def make_result(num_boxes: int, device: str, rng) -> Results:
+    """สร้างผลลัพธ์จำลองแบบเดียวกับ model.track() (boxes มี id)"""
+    x1 = rng.uniform(0, 560, num_boxes)
+    y1 = rng.uniform(0, 400, num_boxes)
+    data = np.stack([
+        x1, y1, x1 + rng.uniform(20, 80, num_boxes), y1 + rng.uniform(40, 80, num_boxes),
+        np.arange(1, num_boxes + 1), rng.uniform(0.5, 1.0, num_boxes), np.zeros(num_boxes),
+    ], axis=1).astype(np.float32)
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    return Results(frame, path="bench", names={0: "person"}, boxes=torch.from_numpy(data).to(device))
+
+
+def per_box_path(result):
+    """path เดิมใน main(): เข้าถึง tensor ทีละกล่อง"""
+    out = []
+    for box in result.boxes:
+        x1, y1, x2, y2 = map(int, box.xyxy[0])
+        conf_score = float(box.conf[0])
+        track_id = int(box.id[0]) if box.id is not None else None
+        out.append(((x1 + x2) // 2, (y1 + y2) // 2, conf_score, track_id))
+    return out
+
+
+def vectorized_path(result):
+    """path ใหม่: ดึงข้อมูลครั้งเดียวต่อเฟรม"""
+    detections = extract_detections(result).tracked()
+    return list(zip(detections.centers.tolist(), detections.conf.tolist(), detections.track_ids.tolist()))
+
+
+def bench(fn, result, iters: int, device: str) -> float:
+    for _ in range(min(50, iters)):
+        fn(result)
+    if device.startswith("cuda"):
+        torch.cuda.synchronize()
+    start = time.perf_counter()
+    for _ in range(iters):
+        fn(result)
+    if device.startswith("cuda"):
+        torch.cuda.synchronize()
+    return (time.perf_counter() - start) / iters * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--device", default="cuda" if torch.cuda.is_available() else "cpu")
+    parser.add_argument("--iters", type=int, default=2000)
+    parser.add_argument("--sizes", default="5,20,50", help="จำนวน detection ต่อเฟรม (คั่นด้วย comma)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"device={args.device} iters={args.iters}")
+    print(f"{'detections':>10} | {'per-box (us)':>12} | {'vectorized (us)':>15} | {'speedup':>7}")
+    for num_boxes in [int(n) for n in args.sizes.split(",")]:
+        result = make_result(num_boxes, args.device, rng)
+        old_us = bench(per_box_path, result, args.iters, args.device)
+        new_us = bench(vectorized_path, result, args.iters, args.device)
+        print(f"{num_boxes:>10} | {old_us:>12.1f} | {new_us:>15.1f} | {old_us / new_us:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
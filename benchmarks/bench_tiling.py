@@ -0,0 +1,89 @@
+"""Benchmark: tiled inference เทียบกับการส่งทั้งเฟรมเข้าโมเดล (จำนวน detection และ latency)
+
+อ่านเฟรมจากคลิป (หรือภาพนิ่ง) ความละเอียดสูง แล้วรัน BatchTracker.detect() แบบไม่แบ่ง tile
+และแบบแบ่ง tile ตามขนาดที่กำหนด (ทุก tile ของเฟรมอยู่ใน batch เดียว + NMS ข้าม tile)
+
+รัน:
+    python benchmarks/bench_tiling.py --video pool_4k.mp4 [--model yolo11m.pt] [--tiles 640,960,1280]
+        [--overlap 0.2] [--roi x0,y0,x1,y1] [--frames 50]
+"""
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import cv2
+import torch
+from ultralytics import YOLO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.inference import BatchTracker, tile_rects  # noqa: E402
+
+
+def read_frames(path: str, count: int) -> list:
+    image = cv2.imread(path) if os.path.splitext(path)[1].lower() in (".jpg", ".jpeg", ".png", ".bmp") else None
+    if image is not None:
+        return [image] * count
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < count:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        frames.append(frame)
+    cap.release()
+    if not frames:
+        raise SystemExit(f"อ่านเฟรมไม่ได้: {path}")
+    return frames
+
+
+def run(detector: BatchTracker, frames: list, roi, device: str) -> tuple:
+    """คืนค่า (จำนวน detection เฉลี่ยต่อเฟรม, latency เฉลี่ย ms, latency p95 ms)"""
+    detector.detect(frames[:1], [roi])  # warm-up
+    counts, latencies = [], []
+    for frame in frames:
+        start = time.perf_counter()
+        result = detector.detect([frame], [roi])[0]
+        if device != "cpu":
+            torch.cuda.synchronize()
+        latencies.append((time.perf_counter() - start) * 1000.0)
+        counts.append(len(result.boxes))
+    return float(np.mean(counts)), float(np.mean(latencies)), float(np.percentile(latencies, 95))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", required=True, help="คลิปหรือภาพนิ่งความละเอียดสูง")
+    parser.add_argument("--model", default="yolo11m.pt")
+    parser.add_argument("--device", default="0" if torch.cuda.is_available() else "cpu")
+    parser.add_argument("--conf", type=float, default=0.5)
+    parser.add_argument("--tiles", default="640,960,1280", help="ขนาด tile (px) คั่นด้วย comma")
+    parser.add_argument("--overlap", type=float, default=0.2)
+    parser.add_argument("--nms-iou", type=float, default=0.5)
+    parser.add_argument("--roi", default="", help="x0,y0,x1,y1 (ว่าง = ทั้งเฟรม)")
+    parser.add_argument("--frames", type=int, default=50)
+    args = parser.parse_args()
+
+    frames = read_frames(args.video, args.frames)
+    roi = tuple(int(v) for v in args.roi.split(",")) if args.roi else None
+    height, width = frames[0].shape[:2]
+    region = roi or (0, 0, width, height)
+    model = YOLO(args.model)
+    print(f"input={args.video} {width}x{height} frames={len(frames)} device={args.device} region={region}")
+    print(f"{'mode':>14} | {'tiles':>5} | {'detections/frame':>16} | {'latency ms (mean/p95)':>21}")
+
+    detector = BatchTracker(model, args.device, args.conf)
+    count, mean_ms, p95_ms = run(detector, frames, roi, args.device)
+    print(f"{'untiled':>14} | {1:>5} | {count:>16.2f} | {mean_ms:>10.1f} / {p95_ms:>8.1f}")
+
+    for tile_size in [int(t) for t in args.tiles.split(",")]:
+        detector = BatchTracker(model, args.device, args.conf, tile_size=tile_size,
+                                tile_overlap=args.overlap, tile_nms_iou=args.nms_iou)
+        tiles = len(tile_rects(region, tile_size, detector.tile_overlap))
+        count, mean_ms, p95_ms = run(detector, frames, roi, args.device)
+        print(f"{f'tile {tile_size}':>14} | {tiles:>5} | {count:>16.2f} | {mean_ms:>10.1f} / {p95_ms:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
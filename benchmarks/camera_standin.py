@@ -0,0 +1,259 @@
+"""Stand-in กล้องสด (ffmpeg MPEG-TS ผ่าน TCP ภายในเครื่อง) + วัดเวลากลับมาของ CaptureSupervisor
+
+ใช้ได้ 2 แบบ:
+    1) เป็น module: StandInCamera(ffmpeg_path).start() แล้วเปิด .url ด้วย CaptureSupervisor / cv2.VideoCapture
+       stop_stream(sec) = สัญญาณขาด (kill ffmpeg), freeze(sec) = ส่งเฟรมเดิมซ้ำ (ภาพค้าง)
+       แต่ละเฟรมฝังเวลาที่สร้างภาพ (ms) เป็นแถบขาวดำด้านบน - read_timestamp(frame) อ่านกลับเพื่อวัด glass-to-frame
+    2) รันตรง: python benchmarks/camera_standin.py [--ffmpeg ffmpeg] [--rounds 3] [--outage-sec 5] [--freeze-sec 3]
+        [--stale-sec 2] [--backoff-max-sec 2] [--steady-sec 5] [--output bench_reconnect.json]
+       วัด: glass-to-frame latency ช่วงปกติ (steady-sec แรก), เวลาตรวจพบ (สัญญาณขาด / ภาพค้าง),
+       เวลาที่ใช้กลับมาหลัง stand-in กลับมา และจำนวนข้อความแจ้งเตือนที่ส่งถึง StandInBotApi
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import threading
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.capture import CaptureSupervisor, LatestFrameReader  # noqa: E402
+from src.clip_writer import find_ffmpeg  # noqa: E402
+from src.telegram_utils import TelegramBot  # noqa: E402
+from telegram_standin import StandInBotApi  # noqa: E402
+
+# แถบเวลา: 42 bit (ms ตั้งแต่ epoch) ช่องละ BIT_PX x BIT_PX พิกเซลที่มุมซ้ายบน
+TIMESTAMP_BITS = 42
+BIT_PX = 12
+
+
+def stamp_timestamp(frame, ts: float):
+    value = int(ts * 1000)
+    for bit in range(TIMESTAMP_BITS):
+        x = bit * BIT_PX
+        frame[:BIT_PX, x:x + BIT_PX] = 255 if (value >> bit) & 1 else 0
+
+
+def read_timestamp(frame):
+    """เวลาที่ stand-in สร้างเฟรม (epoch) จากแถบด้านบน - None เมื่ออ่านไม่ได้"""
+    if frame is None or frame.shape[1] < TIMESTAMP_BITS * BIT_PX:
+        return None
+    centre = BIT_PX // 2
+    row = frame[centre, centre:TIMESTAMP_BITS * BIT_PX:BIT_PX].mean(axis=-1)
+    value = sum(1 << bit for bit, level in enumerate(row) if level >= 128)
+    return value / 1000.0 if value else None
+
+
+class StandInCamera:
+    """กล้องจำลอง: thread สร้างภาพ (พื้นไล่สี + วัตถุเคลื่อนที่ + noise + เวลา) ส่งเข้า ffmpeg ที่รอ client ที่ tcp://host:port (ครั้งละ 1 client)"""
+
+    def __init__(self, ffmpeg_path: str, host: str = "127.0.0.1", port: int = 18554, fps: float = 15.0,
+                 size: tuple = (640, 360)):
+        self.ffmpeg_path = ffmpeg_path
+        self.host = host
+        self.port = port
+        self.fps = fps
+        self.size = size
+        self.frames_sent = 0
+        self._down_until = 0.0
+        self._frozen_until = 0.0
+        self._running = False
+        self._process = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"tcp://{self.host}:{self.port}"
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="StandInCamera", daemon=True)
+        self._thread.start()
+        return self
+
+    def _spawn(self):
+        width, height = self.size
+        return subprocess.Popen(
+            [self.ffmpeg_path, "-loglevel", "error", "-f", "rawvideo", "-pix_fmt", "bgr24",
+             "-s", f"{width}x{height}", "-r", f"{self.fps:g}", "-i", "pipe:0",
+             "-c:v", "libx264", "-preset", "ultrafast", "-tune", "zerolatency", "-pix_fmt", "yuv420p",
+             "-qp", "0",  # lossless: เฟรมเดิมซ้ำถอดรหัสได้เหมือนเดิมทุกไบต์ (แบบกล้องที่ค้าง)
+             "-g", str(max(1, int(self.fps))), "-f", "mpegts", f"{self.url}?listen=1"],
+            stdin=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+    def _run(self):
+        width, height = self.size
+        rng = np.random.default_rng(0)
+        background = np.zeros((height, width, 3), dtype=np.int16)
+        background[:] = np.linspace(40, 200, width, dtype=np.int16)[None, :, None]
+        frame = None
+        while self._running:
+            if time.time() < self._down_until:
+                time.sleep(0.05)
+                continue
+            with self._lock:
+                self._process = process = self._spawn()
+            next_frame = time.time()
+            try:
+                while self._running and time.time() >= self._down_until and process.poll() is None:
+                    now = time.time()
+                    if frame is None or now >= self._frozen_until:
+                        x = int((now * 80) % (width - 60))
+                        noisy = background + rng.integers(-4, 5, background.shape, dtype=np.int16)
+                        noisy[height // 2 - 30:height // 2 + 30, x:x + 60] = (30, 60, 220)
+                        frame = np.clip(noisy, 0, 255).astype(np.uint8)
+                        stamp_timestamp(frame, now)
+                    process.stdin.write(frame.tobytes())
+                    process.stdin.flush()
+                    self.frames_sent += 1
+                    next_frame += 1.0 / self.fps
+                    time.sleep(max(0.0, next_frame - time.time()))
+            except (BrokenPipeError, OSError):
+                pass  # client ตัดการเชื่อมต่อ - เปิดรอ client ใหม่
+            with self._lock:
+                self._kill(process)
+
+    @staticmethod
+    def _kill(process):
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+        if process.stdin:
+            try:
+                process.stdin.close()
+            except OSError:
+                pass
+
+    def stop_stream(self, duration_sec: float):
+        """สัญญาณขาด duration_sec วินาที (ปิด ffmpeg ทันที - client เห็นการเชื่อมต่อถูกตัด)"""
+        self._down_until = time.time() + duration_sec
+        with self._lock:
+            if self._process is not None and self._process.poll() is None:
+                self._process.kill()
+
+    def freeze(self, duration_sec: float):
+        """ส่งเฟรมเดิมซ้ำ duration_sec วินาที (การเชื่อมต่อยังอยู่)"""
+        self._frozen_until = time.time() + duration_sec
+
+    def stop(self):
+        self._running = False
+        with self._lock:
+            if self._process is not None:
+                self._kill(self._process)
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+
+
+def _wait(predicate, timeout: float, interval: float = 0.01) -> float:
+    """รอจน predicate() เป็นจริง - คืนเวลาที่เกิด (None = หมดเวลา)"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return time.time()
+        time.sleep(interval)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ffmpeg", default="ffmpeg", help="ffmpeg สำหรับ stand-in (ชื่อใน PATH หรือ path)")
+    parser.add_argument("--port", type=int, default=18554)
+    parser.add_argument("--rounds", type=int, default=3, help="จำนวนรอบของแต่ละสถานการณ์")
+    parser.add_argument("--outage-sec", type=float, default=5.0, help="ระยะเวลาที่ stand-in ปิดตัว")
+    parser.add_argument("--freeze-sec", type=float, default=3.0, help="ระยะเวลาที่ภาพค้างหลังถูกตรวจพบ")
+    parser.add_argument("--stale-sec", type=float, default=2.0, help="CAPTURE_STALE_SEC ของ CaptureSupervisor")
+    parser.add_argument("--backoff-max-sec", type=float, default=2.0, help="CAPTURE_BACKOFF_MAX_SEC")
+    parser.add_argument("--steady-sec", type=float, default=5.0, help="ช่วงปกติสำหรับวัด glass-to-frame latency")
+    parser.add_argument("--output", default="", help="บันทึกผลเป็น JSON")
+    args = parser.parse_args()
+
+    ffmpeg_path = find_ffmpeg(args.ffmpeg)
+    if ffmpeg_path is None:
+        print(f"❌ ไม่พบ ffmpeg ({args.ffmpeg}) - ระบุด้วย --ffmpeg")
+        return 1
+
+    camera = StandInCamera(ffmpeg_path, port=args.port).start()
+    bot_api = StandInBotApi().start()
+    bot = TelegramBot("123:standin", "1", base_url=bot_api.base_url, retry_backoff_sec=0.05)
+    time.sleep(0.5)
+    supervisor = CaptureSupervisor(camera.url, name="STANDIN", ffmpeg_options="", bot_obj=bot,
+                                   open_timeout_ms=2000, read_timeout_ms=2000, backoff_max_sec=args.backoff_max_sec,
+                                   stale_sec=args.stale_sec, outage_notice_sec=1.0, timestamp_fn=read_timestamp)
+    reader = LatestFrameReader(supervisor, drop_frames=True).start()
+
+    def wait_frames(count: int, timeout: float) -> float:
+        target = reader.frames_captured + count
+        return _wait(lambda: reader.frames_captured >= target, timeout)
+
+    results = {"outage": [], "freeze": []}
+    try:
+        if wait_frames(15, 10.0) is None:
+            print("❌ อ่านเฟรมจาก stand-in ไม่ได้")
+            return 1
+        supervisor.latencies.clear()
+        time.sleep(args.steady_sec)
+        latencies = sorted(supervisor.latencies)
+        results["glass_to_frame_ms"] = {
+            "frames": len(latencies),
+            "p50_ms": latencies[len(latencies) // 2] * 1000.0 if latencies else 0.0,
+            "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000.0 if latencies else 0.0,
+            "max_ms": latencies[-1] * 1000.0 if latencies else 0.0,
+        }
+        print(f"⏱️ glass-to-frame ({len(latencies)} เฟรม): p50 {results['glass_to_frame_ms']['p50_ms']:.0f} ms | "
+              f"p95 {results['glass_to_frame_ms']['p95_ms']:.0f} ms | max {results['glass_to_frame_ms']['max_ms']:.0f} ms")
+
+        for round_index in range(args.rounds):
+            # --- สัญญาณขาด: kill ffmpeg แล้วกลับมาหลัง outage_sec ---
+            reconnects = supervisor.reconnects
+            lost_at = time.time()
+            camera.stop_stream(args.outage_sec)
+            detected = _wait(lambda: supervisor.outage_started is not None, args.outage_sec + 10.0)
+            recovered = _wait(lambda: supervisor.reconnects > reconnects, args.outage_sec + args.backoff_max_sec + 20.0)
+            back_at = lost_at + args.outage_sec
+            results["outage"].append({
+                "detect_sec": detected - lost_at if detected else None,
+                "recover_after_source_sec": recovered - back_at if recovered else None,
+                "outage_sec": recovered - lost_at if recovered else None,
+            })
+            print(f"📵 รอบ {round_index + 1}: ตรวจพบ {results['outage'][-1]['detect_sec']} s | "
+                  f"กลับมาหลัง stand-in กลับมา {results['outage'][-1]['recover_after_source_sec']} s")
+            wait_frames(15, 10.0)
+
+            # --- ภาพค้าง: เฟรมเดิมซ้ำ (การเชื่อมต่อยังอยู่) ---
+            reconnects = supervisor.reconnects
+            frozen_at = time.time()
+            camera.freeze(args.stale_sec + args.freeze_sec)
+            detected = _wait(lambda: supervisor.outage_started is not None, args.stale_sec + 10.0)
+            recovered = _wait(lambda: supervisor.reconnects > reconnects,
+                              args.stale_sec + args.freeze_sec + args.backoff_max_sec + 20.0)
+            unfrozen_at = frozen_at + args.stale_sec + args.freeze_sec
+            results["freeze"].append({
+                "detect_sec": detected - frozen_at if detected else None,
+                "recover_after_source_sec": recovered - unfrozen_at if recovered else None,
+            })
+            print(f"🧊 รอบ {round_index + 1}: ตรวจพบ {results['freeze'][-1]['detect_sec']} s | "
+                  f"กลับมาหลังภาพเดินต่อ {results['freeze'][-1]['recover_after_source_sec']} s")
+            wait_frames(15, 10.0)
+    finally:
+        reader.release()
+        camera.stop()
+        bot.close(timeout=10)
+        bot_api.stop()
+
+    results["supervisor"] = supervisor.stats()
+    results["telegram_messages"] = bot_api.count("sendMessage")
+    print(f"📨 ข้อความแจ้งเตือนที่ส่งถึง stand-in: {results['telegram_messages']} "
+          f"(คาดว่า {args.rounds * 4} = ขาด/กลับมา x 2 สถานการณ์ x {args.rounds} รอบ)")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"💾 {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
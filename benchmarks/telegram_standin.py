@@ -0,0 +1,132 @@
+"""Stand-in Telegram Bot API server (ภายในเครื่อง ไม่ใช้เครือข่ายภายนอก) + วัด latency ของ TelegramBot
+
+ใช้ได้ 2 แบบ:
+    1) เป็น module: StandInBotApi().start() แล้วส่ง base_url ให้ TelegramBot(..., base_url=...)
+    2) รันตรง: python benchmarks/telegram_standin.py [--messages 50] [--photos 10] [--delay-ms 20] [--fail-rate 0.1]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import numpy as np
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.telegram_utils import TelegramBot  # noqa: E402
+
+
+class StandInBotApi:
+    """HTTP server จำลอง Bot API: ตอบ getMe / sendMessage / sendPhoto / sendVideo แบบ ok"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, delay_sec: float = 0.0, fail_rate: float = 0.0):
+        self.delay_sec = delay_sec
+        self.fail_rate = fail_rate
+        self.requests = []  # [(method, bytes_received, ts)]
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._message_id = 0
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive เพื่อให้เห็นผลของ connection pool
+
+            def setup(self):
+                super().setup()
+                with standin._lock:
+                    standin.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                self.rfile.read(length)
+                method = self.path.rsplit("/", 1)[-1]
+                with standin._lock:
+                    standin.requests.append((method, length, time.time()))
+                    standin._message_id += 1
+                    message_id = standin._message_id
+                if standin.delay_sec:
+                    time.sleep(standin.delay_sec)
+
+                if method != "getMe" and random.random() < standin.fail_rate:
+                    self._reply(502, {"ok": False, "error_code": 502, "description": "Bad Gateway (stand-in)"})
+                    return
+                if method == "getMe":
+                    result = {"id": 1, "is_bot": True, "first_name": "standin", "username": "standin_bot"}
+                else:
+                    result = {"message_id": message_id, "date": int(time.time()), "chat": {"id": 1, "type": "private"}}
+                self._reply(200, {"ok": True, "result": result})
+
+            do_GET = do_POST
+
+            def _reply(self, status, payload):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/bot"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def count(self, method: str) -> int:
+        with self._lock:
+            return sum(1 for m, _, _ in self.requests if m == method)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=50)
+    parser.add_argument("--photos", type=int, default=10)
+    parser.add_argument("--delay-ms", type=float, default=20.0, help="เวลาตอบกลับของ stand-in server")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="สัดส่วนคำขอที่ตอบ 502")
+    args = parser.parse_args()
+
+    standin = StandInBotApi(delay_sec=args.delay_ms / 1000.0, fail_rate=args.fail_rate).start()
+    bot = TelegramBot("123:standin", "1", base_url=standin.base_url, retry_backoff_sec=0.05)
+
+    import cv2
+    photo_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "_standin_photo.jpg")
+    cv2.imwrite(photo_path, np.zeros((480, 640, 3), dtype=np.uint8))
+
+    start = time.time()
+    for i in range(args.messages):
+        bot.send_message(f"stand-in message {i}")
+    for i in range(args.photos):
+        bot.send_media(photo_path, mode="photo", caption=f"stand-in photo {i}")
+    bot.close(timeout=60)
+    elapsed = time.time() - start
+    os.remove(photo_path)
+    standin.stop()
+
+    stats = bot.stats()
+    latencies = sorted(latency for _, latency, _ in bot.send_latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000.0 if latencies else 0.0
+    print(f"ส่ง {stats['sent']} งาน ใน {elapsed:.2f}s | failed={stats['failed']} retries={stats['retries']} dropped={stats['dropped']}")
+    print(f"latency (เข้าคิว -> ส่งสำเร็จ): p50={stats['latency_p50_ms']:.1f} ms p95={p95:.1f} ms max={stats['latency_max_ms']:.1f} ms")
+    print(f"TCP connections ที่ server เห็น: {standin.connections} (คำขอทั้งหมด {len(standin.requests)})")
+
+
+if __name__ == "__main__":
+    main()
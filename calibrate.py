@@ -0,0 +1,126 @@
+"""Calibration - เลือกขนาดโมเดลและ imgsz ที่รันทันบนเครื่องนี้
+
+วัดความเร็ว end-to-end ต่อเฟรม (detector + tracker + CameraPipeline.process: pre-buffer, zone / state,
+annotation, AlertManager) ของโมเดลแต่ละขนาด (n/s/m) กับ imgsz แต่ละค่า
+ด้วยคลิปที่บันทึกไว้ (หรือเฟรมสังเคราะห์) แล้วบันทึกค่าที่ผ่านเป้าหมาย FPS / latency
+ลง calibration.json ซึ่ง main.py อ่านเป็นค่าเริ่มต้นตอนเริ่มทำงาน (ค่าใน .env ยังมีผลเหนือกว่า)
+
+ใช้งาน:
+    python calibrate.py --target-fps 10 [--video pool.mp4] [--cameras 2] [--max-latency-ms 250]
+        [--models yolo11n.pt,yolo11s.pt,yolo11m.pt] [--imgsz 480,640] [--backend pytorch]
+        [--zones zones.json] [--annotate]
+"""
+
+import os
+import argparse
+import numpy as np
+import cv2
+import torch
+from src.backends import load_detection_model
+from src.calibration import measure_pipeline, choose_configuration, save_calibration
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _load_frames(video: str, count: int, width: int, height: int) -> list:
+    """เฟรมจากคลิป หรือเฟรมสังเคราะห์ (พื้นสีน้ำ + สี่เหลี่ยมขนาดคน) เมื่อไม่ระบุคลิป"""
+    if video:
+        cap = cv2.VideoCapture(video)
+        frames = []
+        while len(frames) < count:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            frames.append(frame)
+        cap.release()
+        if not frames:
+            raise SystemExit(f"อ่านเฟรมจาก {video} ไม่ได้")
+        return frames
+
+    rng = np.random.default_rng(0)
+    frames = []
+    for _ in range(count):
+        frame = np.empty((height, width, 3), dtype=np.uint8)
+        frame[:] = (180, 140, 60)
+        frame += rng.integers(0, 40, frame.shape, dtype=np.uint8)
+        for _ in range(6):
+            x, y = int(rng.integers(0, width - 60)), int(rng.integers(0, height - 120))
+            cv2.rectangle(frame, (x, y), (x + 40, y + 100), (60, 90, 160), -1)
+        frames.append(frame)
+    return frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target-fps", type=float, required=True, help="FPS ต่อกล้องที่ต้องการ")
+    parser.add_argument("--max-latency-ms", type=float, default=0, help="p95 latency ต่อ batch สูงสุด (0 = 1000 / target-fps)")
+    parser.add_argument("--video", default="", help="คลิปที่บันทึกไว้ (ว่าง = เฟรมสังเคราะห์)")
+    parser.add_argument("--size", default="1280x720", help="ขนาดเฟรมสังเคราะห์ WxH")
+    parser.add_argument("--cameras", type=int, default=1, help="จำนวนกล้อง (ขนาด batch)")
+    parser.add_argument("--models", default="yolo11n.pt,yolo11s.pt,yolo11m.pt", help="เรียงจากเล็กไปใหญ่")
+    parser.add_argument("--imgsz", default="320,480,640")
+    parser.add_argument("--backend", default="pytorch", help="pytorch / onnx / openvino")
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--zones", default=os.path.join(BASE_DIR, "zones.json"),
+                        help="zones.json ของพื้นที่สระ (ไม่มีไฟล์ = ติดตามทั้งเฟรม)")
+    parser.add_argument("--annotate", action="store_true", help="รวมเวลาวาดผลลัพธ์ (เหมือน SHOW_VIDEO=true)")
+    parser.add_argument("--output", default=os.path.join(BASE_DIR, "calibration.json"))
+    args = parser.parse_args()
+
+    device = "0" if torch.cuda.is_available() else "cpu"
+    max_latency_ms = args.max_latency_ms or 1000.0 / args.target_fps
+    width, height = (int(v) for v in args.size.lower().split("x"))
+    frames = _load_frames(args.video, 60, width, height)
+    print(f"💻 Device: {'CUDA GPU' if device == '0' else 'CPU'} | กล้อง: {args.cameras} | "
+          f"เป้าหมาย: {args.target_fps:g} FPS, p95 ≤ {max_latency_ms:.0f} ms | "
+          f"เฟรม: {'คลิป ' + args.video if args.video else 'สังเคราะห์ ' + args.size}")
+
+    results = []
+    model_names = [m.strip() for m in args.models.split(",") if m.strip()]
+    for size_rank, model_name in enumerate(model_names):
+        for imgsz in [int(v) for v in args.imgsz.split(",")]:
+            try:
+                model = load_detection_model(model_name, backend=args.backend, imgsz=imgsz,
+                                             cache_dir=os.path.join(BASE_DIR, "model_cache"))
+                stats = measure_pipeline(model, device, imgsz, frames, cameras=args.cameras,
+                                         iterations=args.iterations, zones_file=args.zones,
+                                         annotate=args.annotate)
+            except Exception as e:
+                print(f"⚠️ {model_name} @ {imgsz}: วัดไม่สำเร็จ ({e})")
+                continue
+            stats.update({"model": model_name, "imgsz": imgsz, "size_rank": size_rank})
+            results.append(stats)
+            verdict = "✅" if stats["fps"] >= args.target_fps and stats["latency_p95_ms"] <= max_latency_ms else "❌"
+            print(f"{verdict} {model_name:>12} @ {imgsz:>4} | {stats['fps']:6.2f} FPS | "
+                  f"p50 {stats['latency_p50_ms']:7.1f} ms | p95 {stats['latency_p95_ms']:7.1f} ms | "
+                  f"detector p50 {stats['inference_p50_ms']:7.1f} ms")
+
+    if not results:
+        raise SystemExit("❌ ไม่มีค่าใดวัดได้")
+
+    best, meets_target = choose_configuration(results, args.target_fps, max_latency_ms)
+    if meets_target:
+        print(f"🏁 เลือก {best['model']} @ {best['imgsz']} ({best['fps']:.2f} FPS)")
+    else:
+        print(f"⚠️ ไม่มีค่าใดผ่านเป้าหมาย - ใช้ค่าที่เร็วที่สุด {best['model']} @ {best['imgsz']} "
+              f"({best['fps']:.2f} FPS) ควรลดจำนวนกล้องหรือใช้ DETECTOR_TARGET_FPS")
+
+    save_calibration(
+        args.output,
+        {"MODEL_NAME": best["model"], "MODEL_IMGSZ": best["imgsz"], "INFERENCE_BACKEND": args.backend},
+        {
+            "device": "cuda" if device == "0" else "cpu",
+            "cameras": args.cameras,
+            "target_fps": args.target_fps,
+            "max_latency_ms": max_latency_ms,
+            "meets_target": meets_target,
+            "source": args.video or f"synthetic {args.size}",
+            "annotate": args.annotate,
+            "selected": best,
+            "results": results,
+        },
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -10,23 +10,37 @@
 
 import os
 import cv2
+import json
 import torch
 import time
-import json
-import numpy as np
+import argparse
+import multiprocessing
 from collections import deque
-from ultralytics import YOLO
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from dotenv import load_dotenv
 from src.telegram_utils import TelegramBot
 from src.alert_manager import AlertManager
+from src.capture import LatestFrameReader, CaptureSupervisor, is_live_source, open_capture, default_ffmpeg_options
+from src.zones import setup_zones, load_zones
+from src.camera_pipeline import CameraPipeline
+from src.inference import BatchTracker, KeyframeScheduler
+from src.frame_buffer import CompressedFrameBuffer
+from src.backends import load_detection_model
+from src.calibration import load_calibration
+from src.stage_timer import StageTimer
+from src.clock import WallClock, VideoClock
+from src.event_log import AlertEventLog
+from src.event_journal import EventJournal
+from src.dvr import SegmentRecorder
+from src.clip_writer import find_ffmpeg
+from src.metrics import MetricsServer
+from src.profiling import RuntimeProfiler
 
 # --- โหลด Configuration ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 ENV_PATH = os.path.join(BASE_DIR, ".env")
-ZONES_FILE = os.path.join(BASE_DIR, "zones.json")
-if not os.path.exists(ENV_PATH):
-    raise RuntimeError(f"ENV_ERROR: ไม่พบไฟล์ .env ที่ {ENV_PATH}")
-load_dotenv(ENV_PATH, override=True)
+if os.path.exists(ENV_PATH):
+    load_dotenv(ENV_PATH, override=True)
 
 
 def _get_env(name: str, default: str = None) -> str:
@@ -53,222 +67,128 @@ def _get_env_bool(name: str, default: bool) -> bool:
     return val in ("1", "true", "yes", "y", "on")
 
 
-def _open_capture(source):
-    """เปิด video source (webcam หรือ RTSP)"""
-    if isinstance(source, str) and source.strip().lower().startswith("rtsp://"):
-        for transport in ["tcp", "udp"]:
-            os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = f"rtsp_transport;{transport}|stimeout;5000000"
-            cap = cv2.VideoCapture(source, cv2.CAP_FFMPEG)
-            if cap.isOpened():
-                print(f"📹 RTSP เปิดสำเร็จ (transport={transport})")
-                return cap
-            cap.release()
-    return cv2.VideoCapture(source)
+def _parse_video_source(source: str):
+    """แปลง "0" -> 0 (webcam index) ส่วน RTSP/ไฟล์ใช้ string ตามเดิม"""
+    source = source.strip()
+    return int(source) if source.isnumeric() else source
 
 
-# ==================== ZONE MANAGEMENT ====================
+def _camera_file_path(path: str, index: int) -> str:
+    """กล้องแรกใช้ชื่อไฟล์เดิม, กล้องถัดไปเติม _cam2, _cam3, ... ก่อนนามสกุล"""
+    if index == 0:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}_cam{index + 1}{ext}"
 
-def load_zones():
-    """โหลดพื้นที่จากไฟล์ zones.json"""
-    if os.path.exists(ZONES_FILE):
-        try:
-            with open(ZONES_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return data.get("pool_zone"), data.get("safe_zone")
-        except Exception as e:
-            print(f"⚠️ โหลด zones.json ไม่สำเร็จ: {e}")
-    return None, None
-
-
-def save_zones(pool_zone, safe_zone):
-    """บันทึกพื้นที่ลงไฟล์ zones.json"""
-    data = {"pool_zone": pool_zone, "safe_zone": safe_zone}
-    with open(ZONES_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
-    print(f"✅ บันทึกพื้นที่ลง {ZONES_FILE} เรียบร้อย")
-
-
-def point_in_zone(point, zone):
-    """ตรวจสอบว่าจุดอยู่ในพื้นที่หรือไม่ (รองรับ polygon)"""
-    if zone is None:
-        return False
-    
-    # แปลง zone เป็น numpy array
-    pts = np.array(zone, dtype=np.int32)
-    
-    # ใช้ pointPolygonTest
-    result = cv2.pointPolygonTest(pts, point, False)
-    return result >= 0
 
+def _open_capture(source, ffmpeg_options: list, open_timeout_ms: int = 5000, read_timeout_ms: int = 5000):
+    """เปิด video source (webcam / RTSP / ไฟล์) - ลอง FFmpeg options ของ source นี้ตามลำดับ"""
+    for options in ffmpeg_options:
+        cap = open_capture(source, options, open_timeout_ms, read_timeout_ms)
+        if cap.isOpened():
+            if options:
+                print(f"📹 สตรีมเปิดสำเร็จ ({options})")
+            return cap
+        cap.release()
+    return cap
+
+
+def _load_model():
+    """
+    โหลดโมเดลตาม .env (ค่าเริ่มต้นจาก calibration.json ถ้ามี)
+
+    คืนค่า:
+        (model, imgsz) หรือ None เมื่อโหลดไม่สำเร็จ
+    """
+    # Model settings - ค่าเริ่มต้นจาก calibration.json (python calibrate.py) ถ้ามี
+    CALIBRATION_FILE = os.path.join(BASE_DIR, _get_env("CALIBRATION_FILE", "calibration.json"))
+    calibration = load_calibration(CALIBRATION_FILE)
+    if calibration:
+        print(f"📐 ใช้ค่าจาก {os.path.basename(CALIBRATION_FILE)}: {calibration}")
+    MODEL_NAME = _get_env("MODEL_NAME", calibration.get("MODEL_NAME", "yolo11m.pt"))  # โมเดลมาตรฐานจาก Ultralytics
+    MODEL_IMGSZ = _get_env_int("MODEL_IMGSZ", calibration.get("MODEL_IMGSZ", 640))
+    # Backend สำหรับเครื่อง CPU: pytorch / onnx / openvino (export ครั้งแรกแล้ว cache ไว้ใน MODEL_CACHE_DIR)
+    INFERENCE_BACKEND = _get_env("INFERENCE_BACKEND", calibration.get("INFERENCE_BACKEND", "pytorch"))
+    INFERENCE_INT8 = _get_env_bool("INFERENCE_INT8", False)
+    INT8_CALIBRATION_SOURCE = _get_env("INT8_CALIBRATION_SOURCE", "")  # คลิป/โฟลเดอร์ภาพของสระ
+    MODEL_CACHE_DIR = os.path.join(BASE_DIR, _get_env("MODEL_CACHE_DIR", "model_cache"))
+
+    print(f"📦 กำลังโหลดโมเดล: {MODEL_NAME} @ {MODEL_IMGSZ} (backend: {INFERENCE_BACKEND}{', INT8' if INFERENCE_INT8 else ''})")
+    try:
+        model = load_detection_model(
+            MODEL_NAME,
+            backend=INFERENCE_BACKEND,
+            int8=INFERENCE_INT8,
+            calibration_source=INT8_CALIBRATION_SOURCE or None,
+            imgsz=MODEL_IMGSZ,
+            cache_dir=MODEL_CACHE_DIR,
+        )
+        print(f"✅ โหลดโมเดลสำเร็จ!")
+        print(f"📋 Classes: {model.names}")
+    except Exception as e:
+        print(f"❌ CRITICAL: โหลดโมเดลไม่สำเร็จ: {e}")
+        return None
+    return model, MODEL_IMGSZ
 
-def draw_zones(frame, pool_zone, safe_zone):
-    """วาดพื้นที่บนเฟรม"""
-    overlay = frame.copy()
-    
-    # วาดพื้นที่สระว่ายน้ำ (สีฟ้า)
-    if pool_zone and len(pool_zone) >= 3:
-        pts = np.array(pool_zone, dtype=np.int32)
-        cv2.fillPoly(overlay, [pts], (255, 200, 100))  # สีฟ้าอ่อน
-        cv2.polylines(frame, [pts], True, (255, 150, 0), 3)  # ขอบสีฟ้าเข้ม
-    
-    # วาดพื้นที่ปลอดภัย (สีเขียว)
-    if safe_zone and len(safe_zone) >= 3:
-        pts = np.array(safe_zone, dtype=np.int32)
-        cv2.fillPoly(overlay, [pts], (100, 255, 100))  # สีเขียวอ่อน
-        cv2.polylines(frame, [pts], True, (0, 200, 0), 3)  # ขอบสีเขียวเข้ม
-    
-    # ผสมภาพ
-    cv2.addWeighted(overlay, 0.3, frame, 0.7, 0, frame)
-    return frame
 
+def _create_detector(model, imgsz: int, device: str):
+    """BatchTracker (tracker แยกต่อกล้อง) และ KeyframeScheduler ตาม .env"""
+    CONFIDENCE_THRESHOLD = _get_env_float("DET_CONF", 0.5)
+    TRACKER_CFG = _get_env("TRACKER_CFG", "botsort.yaml")
+    # Keyframe detection: รัน detector ทุก N เฟรม หรือตามอัตราเป้าหมายต่อกล้อง (0 = ไม่จำกัด)
+    # เฟรมระหว่างนั้นเลื่อนกล่องตาม motion model (ไม่นับว่า "เห็น" คน)
+    DETECT_EVERY_N_FRAMES = _get_env_int("DETECT_EVERY_N_FRAMES", 1)
+    DETECTOR_TARGET_FPS = _get_env_float("DETECTOR_TARGET_FPS", 0)
+    # Tiled inference (กล้องความละเอียดสูง): แบ่ง ROI/เฟรมเป็น tile ที่ซ้อนทับกัน (0 = ไม่แบ่ง)
+    TILE_SIZE = _get_env_int("TILE_SIZE", 0)
+    TILE_OVERLAP = _get_env_float("TILE_OVERLAP", 0.2)
+    TILE_NMS_IOU = _get_env_float("TILE_NMS_IOU", 0.5)
+
+    detector = BatchTracker(
+        model,
+        device,
+        CONFIDENCE_THRESHOLD,
+        tracker_cfg=TRACKER_CFG,
+        tile_size=TILE_SIZE,
+        tile_overlap=TILE_OVERLAP,
+        tile_nms_iou=TILE_NMS_IOU,
+        imgsz=imgsz,
+    )
+    if TILE_SIZE > 0:
+        print(f"🧩 Tiled inference: tile {TILE_SIZE}px, overlap {TILE_OVERLAP:.0%}, NMS IoU {TILE_NMS_IOU}")
+    keyframes = KeyframeScheduler(every_n=DETECT_EVERY_N_FRAMES, target_fps=DETECTOR_TARGET_FPS)
+    if keyframes.enabled:
+        print(f"⏱️ Keyframe detection: ทุก {keyframes.every_n} เฟรม / เป้าหมาย {DETECTOR_TARGET_FPS:g} FPS ต่อกล้อง")
+    return detector, keyframes
 
-class ZoneSelector:
-    """คลาสสำหรับเลือกพื้นที่ด้วยการคลิกเมาส์"""
-    
-    def __init__(self, window_name):
-        self.window_name = window_name
-        self.points = []
-        self.current_zone = None
-        self.done = False
-        
-    def mouse_callback(self, event, x, y, flags, param):
-        if event == cv2.EVENT_LBUTTONDOWN:
-            self.points.append((x, y))
-        elif event == cv2.EVENT_RBUTTONDOWN:
-            if len(self.points) >= 3:
-                self.current_zone = self.points.copy()
-                self.done = True
-    
-    def select_zone(self, frame, zone_name, color):
-        """ให้ผู้ใช้เลือกพื้นที่"""
-        self.points = []
-        self.current_zone = None
-        self.done = False
-        
-        cv2.namedWindow(self.window_name)
-        cv2.setMouseCallback(self.window_name, self.mouse_callback)
-        
-        print(f"\n📍 กำหนด{zone_name}:")
-        print("   - คลิกซ้าย = เพิ่มจุด")
-        print("   - คลิกขวา = ยืนยัน (ต้องมีอย่างน้อย 3 จุด)")
-        print("   - กด 's' = ข้าม (ไม่กำหนดพื้นที่นี้)")
-        print("   - กด 'r' = รีเซ็ตจุด")
-        
-        while not self.done:
-            display = frame.copy()
-            
-            # วาดจุดที่คลิก
-            for i, pt in enumerate(self.points):
-                cv2.circle(display, pt, 6, color, -1)
-                cv2.putText(display, str(i+1), (pt[0]+10, pt[1]-10),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
-            
-            # วาดเส้นเชื่อม
-            if len(self.points) > 1:
-                for i in range(len(self.points) - 1):
-                    cv2.line(display, self.points[i], self.points[i+1], color, 2)
-            
-            # วาดเส้นปิด polygon (ถ้ามีอย่างน้อย 3 จุด)
-            if len(self.points) >= 3:
-                cv2.line(display, self.points[-1], self.points[0], color, 2, cv2.LINE_AA)
-                pts = np.array(self.points, dtype=np.int32)
-                overlay = display.copy()
-                cv2.fillPoly(overlay, [pts], (*color[:3], 50))
-                cv2.addWeighted(overlay, 0.3, display, 0.7, 0, display)
-            
-            # แสดงคำแนะนำ
-            cv2.putText(display, f"Selecting: {zone_name}", (10, 30),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.8, color, 2)
-            cv2.putText(display, f"Points: {len(self.points)} | Left-click: Add | Right-click: Done | 's': Skip | 'r': Reset",
-                       (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-            
-            cv2.imshow(self.window_name, display)
-            key = cv2.waitKey(1) & 0xFF
-            
-            if key == ord('s'):  # Skip
-                print(f"   ⏭️ ข้าม{zone_name}")
-                return None
-            elif key == ord('r'):  # Reset
-                self.points = []
-                print("   🔄 รีเซ็ตจุด")
-            elif key == ord('q'):  # Quit
-                return None
-        
-        print(f"   ✅ กำหนด{zone_name}เรียบร้อย ({len(self.current_zone)} จุด)")
-        return self.current_zone
 
+class _OpenCVDisplay:
+    """แสดงผลด้วยหน้าต่าง OpenCV (benchmark ส่ง display อื่นที่มี show / wait_key / close แทนได้)"""
 
-def setup_zones(cap):
-    """ตั้งค่าพื้นที่ก่อนเริ่มระบบ"""
-    print("\n" + "=" * 60)
-    print("🎯 โหมดกำหนดพื้นที่ (Zone Setup)")
-    print("=" * 60)
-    
-    # โหลดพื้นที่เดิม
-    pool_zone, safe_zone = load_zones()
-    
-    if pool_zone or safe_zone:
-        print("\n📂 พบพื้นที่ที่บันทึกไว้:")
-        if pool_zone:
-            print(f"   🔵 พื้นที่สระว่ายน้ำ: {len(pool_zone)} จุด")
-        if safe_zone:
-            print(f"   🟢 พื้นที่ปลอดภัย: {len(safe_zone)} จุด")
-        
-        # อ่านเฟรมแรก
-        ok, frame = cap.read()
-        if not ok:
-            print("❌ ไม่สามารถอ่านเฟรมจากกล้องได้")
-            return pool_zone, safe_zone
-        
-        # แสดงพื้นที่เดิม
-        display = draw_zones(frame.copy(), pool_zone, safe_zone)
-        cv2.putText(display, "Press 'y' to use saved zones, 'n' to reset, 'q' to quit",
-                   (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-        cv2.imshow("Zone Setup", display)
-        
-        print("\n❓ ต้องการใช้พื้นที่เดิมหรือไม่?")
-        print("   'y' = ใช้พื้นที่เดิม")
-        print("   'n' = กำหนดใหม่")
-        print("   'q' = ออก")
-        
-        while True:
-            key = cv2.waitKey(0) & 0xFF
-            if key == ord('y'):
-                print("✅ ใช้พื้นที่เดิม")
-                cv2.destroyWindow("Zone Setup")
-                return pool_zone, safe_zone
-            elif key == ord('n'):
-                print("🔄 กำหนดพื้นที่ใหม่...")
-                pool_zone, safe_zone = None, None
-                break
-            elif key == ord('q'):
-                cv2.destroyWindow("Zone Setup")
-                return None, None
-    
-    # อ่านเฟรมแรก
-    ok, frame = cap.read()
-    if not ok:
-        print("❌ ไม่สามารถอ่านเฟรมจากกล้องได้")
-        return None, None
-    
-    selector = ZoneSelector("Zone Setup")
-    
-    # กำหนดพื้นที่สระว่ายน้ำ (สีฟ้า)
-    pool_zone = selector.select_zone(frame.copy(), "พื้นที่สระว่ายน้ำ (Pool Zone)", (255, 150, 0))
-    
-    # กำหนดพื้นที่ปลอดภัย (สีเขียว) - optional
-    safe_zone = selector.select_zone(frame.copy(), "พื้นที่ปลอดภัย (Safe Zone)", (0, 200, 0))
-    
-    cv2.destroyWindow("Zone Setup")
-    
-    # บันทึกพื้นที่
-    if pool_zone or safe_zone:
-        save_zones(pool_zone, safe_zone)
-    
-    return pool_zone, safe_zone
+    def show(self, title: str, frame):
+        cv2.imshow(title, frame)
+
+    def wait_key(self) -> int:
+        return cv2.waitKey(1) & 0xFF
+
+    def close(self):
+        cv2.destroyAllWindows()
+
+
+def main(display=None, timer: StageTimer = None, max_frames: int = 0, require_env_file: bool = True):
+    """
+    พารามิเตอร์ (สำหรับ benchmarks/bench_pipeline.py - ใช้งานปกติไม่ต้องส่ง):
+        display: ตัวแสดงผล (None = หน้าต่าง OpenCV เมื่อ SHOW_VIDEO, ไม่แสดงผลเมื่อ SHOW_VIDEO=false).
+        timer (StageTimer): เก็บเวลาของแต่ละขั้นตอน (None = สร้างใหม่).
+        max_frames (int): หยุดเมื่อประมวลผลครบจำนวนเฟรมนี้ (0 = ไม่จำกัด).
+        require_env_file (bool): ต้องมีไฟล์ .env (False = ใช้ตัวแปรใน environment อย่างเดียว).
 
+    คืนค่า:
+        dict: elapsed_sec, frames, batches ของรอบนี้ (None เมื่อเริ่มทำงานไม่สำเร็จ)
+    """
+    if require_env_file and not os.path.exists(ENV_PATH):
+        raise RuntimeError(f"ENV_ERROR: ไม่พบไฟล์ .env ที่ {ENV_PATH}")
 
-def main():
     print("\n" + "=" * 60)
     print("🏊 ระบบตรวจจับการจมน้ำ - YOLOv11 Standard + ID Tracking")
     print("=" * 60 + "\n")
@@ -276,19 +196,50 @@ def main():
     # --- Configuration ---
     TELEGRAM_TOKEN = _get_env("TELEGRAM_TOKEN")
     TELEGRAM_CHAT_ID = _get_env("TELEGRAM_CHAT_ID")
+    TELEGRAM_API_BASE_URL = _get_env("TELEGRAM_API_BASE_URL")  # ว่าง = api.telegram.org
+    TELEGRAM_QUEUE_SIZE = _get_env_int("TELEGRAM_QUEUE_SIZE", 100)
+    TELEGRAM_MAX_RETRIES = _get_env_int("TELEGRAM_MAX_RETRIES", 3)
     VIDEO_SOURCE = _get_env("VIDEO_SOURCE", "0")
+    # หลายกล้อง: คั่นด้วย comma เช่น VIDEO_SOURCES=rtsp://cam1/...,rtsp://cam2/...
+    VIDEO_SOURCES = [s for s in _get_env("VIDEO_SOURCES", VIDEO_SOURCE).split(",") if s.strip()]
     SHOW_VIDEO = _get_env_bool("SHOW_VIDEO", True)
+    # กล้องที่ 2 เป็นต้นไปใช้ zones_cam2.json, ... / ZONE_SETUP=false = ใช้พื้นที่ที่บันทึกไว้โดยไม่ถาม
+    ZONES_FILE = os.path.join(BASE_DIR, _get_env("ZONES_FILE", "zones.json"))
+    ZONE_SETUP = _get_env_bool("ZONE_SETUP", True)
+    STATS_INTERVAL_SEC = _get_env_float("STATS_INTERVAL_SEC", 60)
+    # เวลาของเฟรม: wall = เวลาจริงของเครื่อง, video = timestamp ในไฟล์วิดีโอ (เฉพาะ source ที่เป็นไฟล์)
+    CLOCK_SOURCE = _get_env("CLOCK_SOURCE", "wall").lower()
+    # Prometheus endpoint (http://METRICS_HOST:METRICS_PORT/metrics) - 0 = ปิด
+    METRICS_PORT = _get_env_int("METRICS_PORT", 0)
+    METRICS_HOST = _get_env("METRICS_HOST", "127.0.0.1")
+    # Profiler: ปุ่ม 'p' หรือ kill -USR1 <pid> เพื่อเริ่ม/หยุด (stack แบบ folded + tracemalloc diff)
+    PROFILE_DIR = os.path.join(BASE_DIR, _get_env("PROFILE_DIR", "profiles"))
+    PROFILE_DURATION_SEC = _get_env_float("PROFILE_DURATION_SEC", 30)
+    PROFILE_INTERVAL_MS = _get_env_float("PROFILE_INTERVAL_MS", 10)
+    # กล้องสด: FFmpeg options ต่อ source ("key;value|key;value" - CAPTURE_FFMPEG_OPTIONS_CAM2 = เฉพาะกล้องที่ 2)
+    # ว่าง = RTSP ลอง TCP แล้ว UDP
+    CAPTURE_FFMPEG_OPTIONS = _get_env("CAPTURE_FFMPEG_OPTIONS", "")
+    CAPTURE_OPEN_TIMEOUT_MS = _get_env_int("CAPTURE_OPEN_TIMEOUT_MS", 5000)
+    CAPTURE_READ_TIMEOUT_MS = _get_env_int("CAPTURE_READ_TIMEOUT_MS", 5000)
+    # เชื่อมต่อใหม่อัตโนมัติเมื่อสัญญาณขาด / ภาพค้าง (ค่าเริ่มต้น: เฉพาะกล้องสด)
+    CAPTURE_BACKOFF_MAX_SEC = _get_env_float("CAPTURE_BACKOFF_MAX_SEC", 30)
+    CAPTURE_STALE_SEC = _get_env_float("CAPTURE_STALE_SEC", 10)
+    CAPTURE_OUTAGE_NOTICE_SEC = _get_env_float("CAPTURE_OUTAGE_NOTICE_SEC", 5)
     
-    # Model settings
-    MODEL_NAME = "yolo11m.pt"  # โมเดลมาตรฐานจาก Ultralytics
-    CONFIDENCE_THRESHOLD = _get_env_float("DET_CONF", 0.5)
+    # ROI inference: crop เฉพาะกรอบที่ครอบพื้นที่สระ + พื้นที่ปลอดภัย (เผื่อขอบ) ก่อนส่งเข้าโมเดล
+    INFERENCE_ROI = _get_env_bool("INFERENCE_ROI", False)
+    ROI_MARGIN_PX = _get_env_int("ROI_MARGIN_PX", 32)
     
     # Tracking & Alert settings
     MISSING_ALERT_SEC = _get_env_float("MISSING_ALERT_SEC", 40)  # แจ้งเตือนเมื่อหายไป 40 วินาที
     REPEAT_ALERT_INTERVAL = 10  # ส่งแจ้งเตือนซ้ำทุก 10 วินาทีหลังจาก 40 วินาที
+    REIDENTIFY_DISTANCE_PX = _get_env_float("REIDENTIFY_DISTANCE_PX", 150)  # ระยะทางที่ถือว่าใกล้เคียง (พิกเซล)
+    REIDENTIFY_TIME_SEC = _get_env_float("REIDENTIFY_TIME_SEC", 60)  # เวลาที่รอ re-identify (วินาที)
     
     # Alert settings
     ALERT_COOLDOWN_SEC = _get_env_float("ALERT_COOLDOWN_SEC", 0)
+    ALERT_COALESCE_SEC = _get_env_float("ALERT_COALESCE_SEC", 1.0)  # พักรวม ID ที่ถึง tier เดียวกันพร้อมกัน (วินาที)
+    ALERT_URGENT_LEVEL = _get_env_int("ALERT_URGENT_LEVEL", 5)  # ระดับนี้ขึ้นไปส่งทันทีโดยไม่พัก
     ALERT_TEXT = _get_env("ALERT_TEXT", "แจ้งเตือนพบคนจมน้ำ")
     SEND_MESSAGE = _get_env_bool("SEND_MESSAGE", True)
     SEND_PHOTO = _get_env_bool("SEND_PHOTO", True)
@@ -296,497 +247,524 @@ def main():
     SNAPSHOT_PATH = os.path.join(BASE_DIR, _get_env("ALERT_SNAPSHOT_PATH", "alert_snapshot.jpg"))
     VIDEO_PATH = os.path.join(BASE_DIR, _get_env("ALERT_VIDEO_PATH", "alert_video.mp4"))
     VIDEO_BUFFER_LEN = _get_env_int("VIDEO_BUFFER_LEN", 100)
+    # Pre-event buffer แบบบีบอัด: จำกัดหน่วยความจำต่อกล้อง (MB), jpeg/raw, อัตราย่อขนาด
+    PREBUFFER_MAX_MB = _get_env_float("PREBUFFER_MAX_MB", 64)
+    PREBUFFER_ENCODING = _get_env("PREBUFFER_ENCODING", "jpeg")
+    PREBUFFER_JPEG_QUALITY = _get_env_int("PREBUFFER_JPEG_QUALITY", 85)
+    PREBUFFER_SCALE = _get_env_float("PREBUFFER_SCALE", 1.0)
     VIDEO_FPS = _get_env_float("VIDEO_FPS", 30)
     VIDEO_DURATION_SEC = _get_env_float("VIDEO_DURATION_SEC", 3)
     VIDEO_CODEC = _get_env("VIDEO_CODEC", "avc1")
+    # การเข้ารหัสคลิปแจ้งเตือน: ย่อขนาด + H.264 ผ่าน ffmpeg คุม bitrate / ขนาดไฟล์ (ไม่มี ffmpeg = OpenCV + VIDEO_CODEC)
+    CLIP_MAX_WIDTH = _get_env_int("CLIP_MAX_WIDTH", 960)
+    CLIP_BITRATE_KBPS = _get_env_float("CLIP_BITRATE_KBPS", 1500)
+    CLIP_MAX_MB = _get_env_float("CLIP_MAX_MB", 0)
+    FFMPEG_PATH = _get_env("FFMPEG_PATH", "ffmpeg")
+    # รูป/คลิปที่เล็กกว่านี้ (MB) ส่งจากหน่วยความจำ ใหญ่กว่าใช้ไฟล์ชั่วคราวของแต่ละการแจ้งเตือน
+    MEDIA_SPOOL_MB = _get_env_float("MEDIA_SPOOL_MB", 8)
+    # Event journal (SQLite WAL): track / zone / submerge / re-identify / alert - "none" = ไม่บันทึก
+    JOURNAL_PATH = _get_env("JOURNAL_PATH", "events.db")
+    JOURNAL_BATCH_SIZE = _get_env_int("JOURNAL_BATCH_SIZE", 500)
+    JOURNAL_FLUSH_SEC = _get_env_float("JOURNAL_FLUSH_SEC", 1.0)
+    # DVR บนดิสก์ (segment วนทับ): ส่งคลิปยาวย้อนหลังตามหลังคลิปแจ้งเตือน - 0 MB = ปิด
+    DVR_MAX_MB = _get_env_float("DVR_MAX_MB", 0)
+    DVR_DIR = _get_env("DVR_DIR", "dvr")
+    DVR_SEGMENT_SEC = _get_env_float("DVR_SEGMENT_SEC", 10)
+    DVR_FPS = _get_env_float("DVR_FPS", 10)
+    DVR_MAX_WIDTH = _get_env_int("DVR_MAX_WIDTH", 960)
+    DVR_BITRATE_KBPS = _get_env_float("DVR_BITRATE_KBPS", 600)
+    DVR_ALERT_PRE_SEC = _get_env_float("DVR_ALERT_PRE_SEC", 120)
+    DVR_ALERT_POST_SEC = _get_env_float("DVR_ALERT_POST_SEC", 10)
 
     # --- ตรวจสอบ Telegram ---
     if not TELEGRAM_TOKEN or not TELEGRAM_CHAT_ID:
         print(" Error: กรุณาตั้งค่า TELEGRAM_TOKEN และ TELEGRAM_CHAT_ID ใน .env")
         return
 
-    # --- สร้าง Telegram Bot และ Alert Manager ---
-    bot = TelegramBot(TELEGRAM_TOKEN, TELEGRAM_CHAT_ID)
+    # --- สร้าง Telegram Bot ---
+    bot = TelegramBot(
+        TELEGRAM_TOKEN,
+        TELEGRAM_CHAT_ID,
+        queue_size=TELEGRAM_QUEUE_SIZE,
+        max_retries=TELEGRAM_MAX_RETRIES,
+        base_url=TELEGRAM_API_BASE_URL,
+    )
     print(f" Telegram Bot พร้อมใช้งาน (Chat ID: {TELEGRAM_CHAT_ID})")
 
-    alert_manager = AlertManager(
-        bot_obj=bot,
-        alert_text=ALERT_TEXT,
-        send_message=SEND_MESSAGE,
-        send_photo=SEND_PHOTO,
-        send_video=SEND_VIDEO,
-        snapshot_path=SNAPSHOT_PATH,
-        video_path=VIDEO_PATH,
-        video_duration_sec=VIDEO_DURATION_SEC,
-        video_fps=VIDEO_FPS,
-        video_codec=VIDEO_CODEC,
-        alert_cooldown_sec=ALERT_COOLDOWN_SEC,
-    )
+    if display is None and SHOW_VIDEO:
+        display = _OpenCVDisplay()
+    if timer is None:
+        timer = StageTimer()
 
-    # --- โหลดโมเดล YOLOv11 มาตรฐาน ---
+    # --- โหลดโมเดล YOLOv11 มาตรฐาน (โหลดครั้งเดียว ใช้ร่วมกันทุกกล้อง) ---
     device = "0" if torch.cuda.is_available() else "cpu"
     print(f"💻 Device: {'CUDA GPU' if device == '0' else 'CPU'}")
-    print(f"📦 กำลังโหลดโมเดล: {MODEL_NAME}")
-    
-    try:
-        model = YOLO(MODEL_NAME)
-        print(f"✅ โหลดโมเดลสำเร็จ!")
-        print(f"📋 Classes: {model.names}")
-    except Exception as e:
-        print(f"❌ CRITICAL: โหลดโมเดลไม่สำเร็จ: {e}")
+    loaded = _load_model()
+    if loaded is None:
         return
-
-    # --- เปิดกล้อง ---
-    video_source = VIDEO_SOURCE
-    if isinstance(video_source, str) and video_source.isnumeric():
-        video_source = int(video_source)
-    
-    print(f"📹 กำลังเปิดกล้อง: {video_source}")
-    cap = _open_capture(video_source)
-    
-    if not cap.isOpened():
-        print("❌ Error: ไม่สามารถเปิดกล้องได้")
-        return
-
-    # --- กำหนดพื้นที่ (Zone Setup) ---
-    pool_zone, safe_zone = setup_zones(cap)
-    
-    if pool_zone:
-        print(f"\n🔵 พื้นที่สระว่ายน้ำ: {len(pool_zone)} จุด (เปิดการติดตาม)")
-    else:
-        print("\n⚠️ ไม่ได้กำหนดพื้นที่สระ - ติดตามทั้งเฟรม")
-    
-    if safe_zone:
-        print(f"🟢 พื้นที่ปลอดภัย: {len(safe_zone)} จุด (ไม่ติดตาม)")
-
-    # --- ตัวแปรสำหรับ Tracking ---
-    video_buffer = deque(maxlen=VIDEO_BUFFER_LEN)
-    track_id_to_display = {}  # แปลง track_id -> ID1, ID2, ...
-    next_display_id = 1
-    person_state = {}  # เก็บสถานะของแต่ละ ID
-    
-    # --- ระบบจำกัด ID ตามจำนวนคนทั้งหมด ---
-    # จำนวน ID สูงสุด = จำนวนคนที่เคยเห็นพร้อมกัน (Pool + Safe)
-    max_total_count = 0  # จำนวนคนสูงสุดที่เคยเห็นทั้งหมด
-    max_pool_count = 0  # จำนวนคนสูงสุดที่เคยเห็นในสระ
-    active_pool_ids = set()  # ID ที่กำลังอยู่ในสระ
-    active_safe_ids = set()  # ID ที่กำลังอยู่ใน Safe Zone
-    ids_entered_from_safe = set()  # ID ที่เข้ามาจาก Safe Zone (สามารถสร้าง ID ใหม่ได้)
-    
-    # --- Re-identification: ติดตามคนที่ดำน้ำแล้วโผล่ขึ้นมา ---
-    submerged_persons = {}  # เก็บข้อมูลคนที่หายไป (อาจดำน้ำ) {display_id: {"position": (x,y), "time": ts, "state": {...}}}
-    REIDENTIFY_DISTANCE_PX = _get_env_float("REIDENTIFY_DISTANCE_PX", 150)  # ระยะทางที่ถือว่าใกล้เคียง (พิกเซล)
-    REIDENTIFY_TIME_SEC = _get_env_float("REIDENTIFY_TIME_SEC", 60)  # เวลาที่รอ re-identify (วินาที)
-    
-    # --- นับจำนวนคนที่หายไปใน Pool Zone ---
-    missing_in_pool_count = 0  # จำนวนคนที่หายไปใน Pool Zone (อาจจมน้ำ)
-    exited_to_safe_ids = set()  # ID ที่ออกจาก pool ไป safe zone (ไม่นับว่าหายไป)
-    
-    # --- ระบบแจ้งเตือนแบบขั้นบันได (Tiered Missing Alerts) ---
-    MISSING_ALERT_TIERS = [
-        {"seconds": 20, "message": "🏊 ID{id} ดำน้ำได้ 20 วินาทีแล้ว", "level": 1},
-        {"seconds": 25, "message": "🏊 ID{id} ดำน้ำได้ 25 วินาทีแล้ว", "level": 2},
-        {"seconds": 30, "message": "⚠️ ID{id} มีโอกาสเสี่ยงจมน้ำได้ 30 วินาทีแล้ว ให้รีบทำการตรวจสอบ", "level": 3},
-        {"seconds": 35, "message": "🚨 ID{id} มีโอกาสเสี่ยงจมน้ำได้ 35 วินาทีแล้ว ให้รีบทำการตรวจสอบโดยด่วน", "level": 4},
-        {"seconds": 40, "message": "🆘 ID{id} เสี่ยงจมน้ำสูงได้ 40 วินาทีแล้ว ให้รีบทำการตรวจสอบโดยด่วน", "level": 5},
-    ]
-    
-    # สีสำหรับแสดงผล
-    COLORS = {
-        "normal": (0, 255, 0),        # เขียว - ปกติ
-        "outside": (128, 128, 128),   # เทา - นอกพื้นที่สระ
-        "missing": (0, 0, 255),       # แดง - หายไป/ดำน้ำ
-    }
-
-    print(f"\n⏱️  Missing Alert: {MISSING_ALERT_SEC} วินาที (แจ้งเตือนซ้ำทุก 10 วินาทีหลัง 40s)")
-    print(f"⏱️  Alert Cooldown: {ALERT_COOLDOWN_SEC} วินาที")
+    detector, keyframes = _create_detector(*loaded, device)
+
+    journal = None
+    if JOURNAL_PATH and JOURNAL_PATH.lower() != "none":
+        journal = EventJournal(os.path.join(BASE_DIR, JOURNAL_PATH), batch_size=JOURNAL_BATCH_SIZE,
+                               flush_interval_sec=JOURNAL_FLUSH_SEC, timer=timer)
+        print(f"🗂️ Event journal: {journal.path}")
+
+    # --- เปิดกล้องและสร้าง pipeline ของแต่ละกล้อง ---
+    multi_camera = len(VIDEO_SOURCES) > 1
+    cameras = []
+    for index, source_text in enumerate(VIDEO_SOURCES):
+        name = f"CAM{index + 1}"
+        video_source = _parse_video_source(source_text)
+
+        print(f"📹 [{name}] กำลังเปิดกล้อง: {video_source}")
+        camera_options = _get_env(f"CAPTURE_FFMPEG_OPTIONS_{name}", CAPTURE_FFMPEG_OPTIONS)
+        ffmpeg_options = [camera_options] if camera_options else default_ffmpeg_options(video_source)
+        cap = _open_capture(video_source, ffmpeg_options, CAPTURE_OPEN_TIMEOUT_MS, CAPTURE_READ_TIMEOUT_MS)
+        
+        if not cap.isOpened():
+            print(f"❌ Error: [{name}] ไม่สามารถเปิดกล้องได้")
+            for cam in cameras:
+                cam.reader.release()
+                if cam.dvr is not None:
+                    cam.dvr.close()
+            if journal is not None:
+                journal.close()
+            return
+
+        # --- Thread อ่านเฟรม (แยก cap.read() ออกจาก model.track()) ---
+        drop_frames = _get_env_bool("CAPTURE_DROP_FRAMES", is_live_source(video_source))
+        stop_at_eof = _get_env_bool("CAPTURE_STOP_AT_EOF", not is_live_source(video_source))
+        if _get_env_bool("CAPTURE_RECONNECT", is_live_source(video_source)):
+            cap = CaptureSupervisor(
+                video_source,
+                name=name,
+                ffmpeg_options=ffmpeg_options,
+                bot_obj=bot,
+                message_prefix=f"[{name}] " if multi_camera else "",
+                open_timeout_ms=CAPTURE_OPEN_TIMEOUT_MS,
+                read_timeout_ms=CAPTURE_READ_TIMEOUT_MS,
+                backoff_max_sec=CAPTURE_BACKOFF_MAX_SEC,
+                stale_sec=CAPTURE_STALE_SEC,
+                outage_notice_sec=CAPTURE_OUTAGE_NOTICE_SEC,
+                timer=timer,
+                cap=cap,
+            )
+        if CLOCK_SOURCE == "video" and not is_live_source(video_source):
+            clock = VideoClock(origin=time.time(), fps=cap.get(cv2.CAP_PROP_FPS))
+        else:
+            clock = WallClock()
+        reader = LatestFrameReader(cap, drop_frames=drop_frames, stop_at_eof=stop_at_eof, clock=clock).start()
+        print(f"📹 [{name}] Capture thread เริ่มทำงาน (drop_frames={drop_frames})")
+
+        # --- กำหนดพื้นที่ (Zone Setup) ---
+        zones_file = _camera_file_path(ZONES_FILE, index)
+        if ZONE_SETUP:
+            pool_zone, safe_zone = setup_zones(reader, zones_file, window_name=f"Zone Setup - {name}")
+        else:
+            pool_zone, safe_zone = load_zones(zones_file)
+        
+        if pool_zone:
+            print(f"\n🔵 [{name}] พื้นที่สระว่ายน้ำ: {len(pool_zone)} จุด (เปิดการติดตาม)")
+        else:
+            print(f"\n⚠️ [{name}] ไม่ได้กำหนดพื้นที่สระ - ติดตามทั้งเฟรม")
+        
+        if safe_zone:
+            print(f"🟢 [{name}] พื้นที่ปลอดภัย: {len(safe_zone)} จุด (ไม่ติดตาม)")
+
+        dvr = None
+        if DVR_MAX_MB > 0:
+            dvr = SegmentRecorder(
+                os.path.join(BASE_DIR, DVR_DIR, name),
+                fps=DVR_FPS,
+                segment_sec=DVR_SEGMENT_SEC,
+                max_bytes=int(DVR_MAX_MB * 1024 * 1024),
+                max_width=DVR_MAX_WIDTH,
+                bitrate_kbps=DVR_BITRATE_KBPS,
+                ffmpeg_path=find_ffmpeg(FFMPEG_PATH),
+                timer=timer,
+            )
+            print(f"📼 [{name}] DVR: {dvr.out_dir} ({DVR_MAX_MB:g} MB, segment {DVR_SEGMENT_SEC:g}s, "
+                  f"{'ffmpeg' if dvr.ffmpeg_path else 'OpenCV'})")
+
+        alert_manager = AlertManager(
+            bot_obj=bot,
+            alert_text=ALERT_TEXT,
+            send_message=SEND_MESSAGE,
+            send_photo=SEND_PHOTO,
+            send_video=SEND_VIDEO,
+            snapshot_path=_camera_file_path(SNAPSHOT_PATH, index),
+            video_path=_camera_file_path(VIDEO_PATH, index),
+            video_duration_sec=VIDEO_DURATION_SEC,
+            video_fps=VIDEO_FPS,
+            video_codec=VIDEO_CODEC,
+            alert_cooldown_sec=ALERT_COOLDOWN_SEC,
+            coalesce_window_sec=ALERT_COALESCE_SEC,
+            urgent_level=ALERT_URGENT_LEVEL,
+            timer=timer,
+            clock=clock,
+            clip_max_width=CLIP_MAX_WIDTH,
+            clip_bitrate_kbps=CLIP_BITRATE_KBPS,
+            clip_max_mb=CLIP_MAX_MB,
+            ffmpeg_path=FFMPEG_PATH,
+            media_spool_mb=MEDIA_SPOOL_MB,
+            dvr=dvr,
+            dvr_pre_sec=DVR_ALERT_PRE_SEC,
+            dvr_post_sec=DVR_ALERT_POST_SEC,
+        )
+
+        cameras.append(CameraPipeline(
+            name=name,
+            reader=reader,
+            alert_manager=alert_manager,
+            bot_obj=bot,
+            zones_file=zones_file,
+            pool_zone=pool_zone,
+            safe_zone=safe_zone,
+            video_buffer=CompressedFrameBuffer(
+                max_bytes=int(PREBUFFER_MAX_MB * 1024 * 1024),
+                max_frames=VIDEO_BUFFER_LEN,
+                encoding=PREBUFFER_ENCODING,
+                jpeg_quality=PREBUFFER_JPEG_QUALITY,
+                scale=PREBUFFER_SCALE,
+            ),
+            missing_alert_sec=MISSING_ALERT_SEC,
+            repeat_alert_interval=REPEAT_ALERT_INTERVAL,
+            reidentify_distance_px=REIDENTIFY_DISTANCE_PX,
+            reidentify_time_sec=REIDENTIFY_TIME_SEC,
+            message_prefix=f"[{name}] " if multi_camera else "",
+            # ไม่แสดงผล (headless) -> วาดภาพเฉพาะตอนส่ง snapshot แจ้งเตือน
+            annotate=display is not None,
+            roi_margin_px=ROI_MARGIN_PX if INFERENCE_ROI else None,
+            timer=timer,
+            clock=clock,
+            journal=journal,
+            dvr=dvr,
+        ))
+
+    print(f"\n📹 จำนวนกล้อง: {len(cameras)} (inference แบบ batch เดียวต่อรอบ)")
+    print(f"⏱️  Missing Alert: {MISSING_ALERT_SEC} วินาที (แจ้งเตือนซ้ำทุก 10 วินาทีหลัง 40s)")
+    print(f"⏱️  Alert Cooldown: {ALERT_COOLDOWN_SEC} วินาที (รวมการแจ้งเตือนภายใน {ALERT_COALESCE_SEC} วินาที)")
     print("\n" + "=" * 60)
-    print("🎬 เริ่มการทำงาน - 'q'=ออก, 'z'=กำหนดพื้นที่, 's'=หยุดแจ้งเตือน")
+    print("🎬 เริ่มการทำงาน - 'q'=ออก, 'z'=กำหนดพื้นที่, 's'=หยุดแจ้งเตือน, 'p'=profiler")
     print("=" * 60 + "\n")
 
+    metrics_server = None
+    if METRICS_PORT > 0:
+        try:
+            metrics_server = MetricsServer(cameras, timer=timer, bot=bot, host=METRICS_HOST, port=METRICS_PORT).start()
+            print(f"📊 Metrics: {metrics_server.url}")
+        except OSError as e:
+            print(f"⚠️ เปิด metrics endpoint ไม่สำเร็จ ({METRICS_HOST}:{METRICS_PORT}): {e}")
+
+    profiler = RuntimeProfiler(PROFILE_DIR, duration_sec=PROFILE_DURATION_SEC, interval_sec=PROFILE_INTERVAL_MS / 1000.0)
+    if profiler.install_signal():
+        print(f"🔬 Profiler: kill -USR1 {os.getpid()} เพื่อเริ่ม/หยุด ({PROFILE_DURATION_SEC:g}s -> {PROFILE_DIR})")
+
     # ส่งข้อความเริ่มต้น
-    bot.send_message("🏊 ระบบตรวจจับการจมน้ำเริ่มทำงานแล้ว (YOLOv11 Standard)")
+    bot.send_message(f"🏊 ระบบตรวจจับการจมน้ำเริ่มทำงานแล้ว (YOLOv11 Standard, {len(cameras)} กล้อง)")
 
-    try:
-        while cap.isOpened():
-            ts = time.time()
-            ok, frame = cap.read()
-            if not ok:
-                time.sleep(0.05)
-                continue
+    run_started = time.time()
+    last_stats_time = run_started
+    for cam in cameras:
+        cam.started_at = cam.clock.now()
+    batches = 0
+    total_frames = 0
 
-            video_buffer.append((ts, frame.copy()))
-            annotated_frame = frame.copy()
-            
-            # --- วาดพื้นที่ (Zones) ---
-            annotated_frame = draw_zones(annotated_frame, pool_zone, safe_zone)
-            
-            # --- YOLO Tracking ---
-            try:
-                results = model.track(
-                    frame,
-                    device=device,
-                    conf=CONFIDENCE_THRESHOLD,
-                    persist=True,
-                    verbose=False,
-                    classes=[0]  # class 0 = person
-                )
-            except Exception:
-                results = model.predict(
-                    frame,
-                    device=device,
-                    conf=CONFIDENCE_THRESHOLD,
-                    verbose=False,
-                    classes=[0]
-                )
-
-            seen_track_ids = set()
-            
-            # รีเซ็ต active IDs สำหรับเฟรมนี้
-            current_frame_pool_ids = set()
-            current_frame_safe_ids = set()
-
-            # --- ประมวลผลผลลัพธ์ ---
-            if results and len(results) > 0 and results[0].boxes is not None:
-                for box in results[0].boxes:
-                    x1, y1, x2, y2 = map(int, box.xyxy[0])
-                    conf_score = float(box.conf[0])
-                    
-                    # คำนวณตำแหน่งกึ่งกลาง
-                    center_x = (x1 + x2) // 2
-                    center_y = (y1 + y2) // 2
-                    current_pos = (center_x, center_y)
-
-                    # ดึง track_id
-                    track_id = None
-                    if hasattr(box, "id") and box.id is not None:
-                        try:
-                            track_id = int(box.id[0])
-                        except:
-                            pass
-
-                    if track_id is None:
-                        continue
-
-                    # --- ตรวจสอบว่าอยู่ในพื้นที่ไหน (ก่อน assign ID) ---
-                    in_pool = point_in_zone(current_pos, pool_zone) if pool_zone else True
-                    in_safe = point_in_zone(current_pos, safe_zone) if safe_zone else False
-                    
-                    # --- Re-identification & ID Assignment ---
-                    reidentified_display_id = None
-                    is_new_from_safe = False
-                    
-                    if track_id not in track_id_to_display:
-                        # === กรณี 1: คนใหม่โผล่ใน Pool Zone โดยตรง ===
-                        if in_pool and not in_safe:
-                            # ต้อง Re-identify เป็น ID ที่หายไปก่อนหน้า (ถ้ามี)
-                            # หาคนที่หายไปที่ใกล้ที่สุด
-                            best_match_id = None
-                            best_match_dist = float('inf')
-                            
-                            for sub_display_id, sub_info in list(submerged_persons.items()):
-                                sub_pos = sub_info["position"]
-                                sub_time = sub_info["time"]
-                                time_since_submerged = ts - sub_time
-                                
-                                if time_since_submerged <= REIDENTIFY_TIME_SEC:
-                                    dist = ((current_pos[0] - sub_pos[0])**2 + (current_pos[1] - sub_pos[1])**2)**0.5
-                                    if dist < best_match_dist:
-                                        best_match_dist = dist
-                                        best_match_id = sub_display_id
-                            
-                            # ถ้ามีคนหายไปอยู่ → บังคับ re-identify (ไม่สร้าง ID ใหม่)
-                            if best_match_id is not None:
-                                reidentified_display_id = best_match_id
-                                sub_info = submerged_persons[best_match_id]
-                                # กู้คืนสถานะเดิม
-                                person_state[track_id] = sub_info["state"].copy()
-                                person_state[track_id]["last_seen"] = ts
-                                person_state[track_id]["last_position"] = current_pos
-                                person_state[track_id]["counted_as_missing"] = False
-                                # ลบออกจาก submerged
-                                del submerged_persons[best_match_id]
-                                # ลดจำนวนคนหายไป
-                                if missing_in_pool_count > 0:
-                                    missing_in_pool_count -= 1
-                                print(f"🔄 Re-identified: ID{best_match_id} โผล่ขึ้นมาใน Pool Zone (dist={best_match_dist:.1f}px)")
-                                track_id_to_display[track_id] = reidentified_display_id
-                            else:
-                                # ไม่มีคนหายไป → สร้าง ID ใหม่ได้ถ้าจำนวนคนเพิ่มขึ้น
-                                # ตรวจสอบจำนวนคนปัจจุบัน (รวม Pool + Safe)
-                                current_total = len(current_frame_pool_ids) + len(current_frame_safe_ids)
-                                if max_total_count == 0 or current_total < max_total_count or next_display_id <= max_total_count:
-                                    track_id_to_display[track_id] = next_display_id
-                                    print(f"👤 คนใหม่ใน Pool Zone: ID{next_display_id}")
-                                    next_display_id += 1
-                                else:
-                                    # มีคนครบแล้ว แต่ไม่มีใครหายไป → ข้ามคนนี้
-                                    cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), (0, 255, 255), 2)
-                                    cv2.putText(annotated_frame, "UNKNOWN (waiting re-id)", (x1, max(0, y1 - 10)),
-                                               cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 2)
-                                    continue
-                        
-                        # === กรณี 2: คนใหม่เข้ามาจาก Safe Zone ===
-                        elif in_safe:
-                            # สามารถสร้าง ID ใหม่ได้
-                            track_id_to_display[track_id] = next_display_id
-                            ids_entered_from_safe.add(next_display_id)
-                            print(f"🚶 คนใหม่เข้ามาจาก Safe Zone: ID{next_display_id}")
-                            next_display_id += 1
-                            is_new_from_safe = True
-                        
-                        # === กรณี 3: นอกพื้นที่ทั้งหมด ===
-                        else:
-                            track_id_to_display[track_id] = next_display_id
-                            next_display_id += 1
-                    
-                    display_id = track_id_to_display[track_id]
-                    seen_track_ids.add(track_id)
-                    
-                    # ถ้าอยู่ในพื้นที่ปลอดภัย = ติดแท็ก ID แต่ไม่ติดตามความเสี่ยง
-                    if in_safe:
-                        # บันทึกว่า ID นี้ออกจาก Pool ไป Safe Zone (ไม่นับว่าหายไป)
-                        exited_to_safe_ids.add(display_id)
-                        current_frame_safe_ids.add(display_id)  # เพิ่มเข้า Safe Zone ในเฟรมนี้
-                        # ลบออกจาก submerged_persons ถ้ามี (เพราะโผล่ขึ้นมาแล้ว)
-                        if display_id in submerged_persons:
-                            del submerged_persons[display_id]
-                            if missing_in_pool_count > 0:
-                                missing_in_pool_count -= 1
-                        # วาด bounding box สีเขียวเข้ม (Safe Zone)
-                        safe_color = (0, 200, 100)  # สีเขียวเข้ม
-                        cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), safe_color, 2)
-                        cv2.circle(annotated_frame, (center_x, y1), 8, safe_color, -1)
-                        cv2.putText(annotated_frame, f"ID{display_id} SAFE", (x1, max(0, y1 - 10)),
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, safe_color, 2)
-                        continue
-                    
-                    # ถ้าไม่อยู่ในพื้นที่สระ (และมีการกำหนดพื้นที่สระ) = ไม่ติดตาม
-                    if not in_pool and pool_zone:
-                        active_pool_ids.discard(display_id)
-                        # วาด bounding box สีเทา (นอกพื้นที่)
-                        cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), COLORS["outside"], 2)
-                        cv2.putText(annotated_frame, f"ID{display_id} OUTSIDE", (x1, max(0, y1 - 10)),
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, COLORS["outside"], 2)
-                        continue
-
-                    # === อยู่ในพื้นที่สระว่ายน้ำ - เปิดการติดตาม ===
-                    
-                    # เพิ่ม ID เข้า current_frame_pool_ids
-                    current_frame_pool_ids.add(display_id)
-                    
-                    # สร้างหรืออัพเดทสถานะ
-                    if track_id not in person_state:
-                        person_state[track_id] = {
-                            "display_id": display_id,
-                            "last_seen": ts,
-                            "last_position": current_pos,
-                            "missing_alerted": False,
-                            "missing_alert_level": 0,  # ระดับการแจ้งเตือนที่ส่งไปแล้ว (0 = ยังไม่เคย)
-                            "last_repeat_alert": 0,  # เวลาที่ส่งแจ้งเตือนซ้ำครั้งล่าสุด
-                            "acknowledged": False,  # กดปุ่ม S หยุดแจ้งเตือนแล้วหรือไม่
-                        }
-
-                    state = person_state[track_id]
-
-                    # อัพเดทสถานะ - คนโผล่ขึ้นมาแล้ว รีเซ็ตทุกอย่าง
-                    state["last_seen"] = ts
-                    state["last_position"] = current_pos
-                    state["missing_alerted"] = False
-                    state["missing_alert_level"] = 0  # รีเซ็ตระดับแจ้งเตือน
-                    state["last_repeat_alert"] = 0
-                    state["acknowledged"] = False  # รีเซ็ตเมื่อคนโผล่ขึ้นมา
-                    state["submerged_logged"] = False  # รีเซ็ต flag สำหรับ print
-
-                    # เลือกสีและ label - คนในสระปกติ
-                    color = COLORS["normal"]
-                    status = "IN POOL"
-
-                    # วาด bounding box
-                    cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), color, 2)
-                    
-                    # วาด ID บนศีรษะ
-                    cv2.circle(annotated_frame, (center_x, y1), 8, color, -1)
-                    label = f"ID{display_id} {status} {conf_score:.0%}"
-                    cv2.putText(annotated_frame, label, (x1, max(0, y1 - 10)),
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
-
-            # --- อัปเดต active IDs หลังจบ loop ---
-            active_pool_ids = current_frame_pool_ids.copy()
-            active_safe_ids = current_frame_safe_ids.copy()
-            
-            # อัปเดตจำนวนคนทั้งหมดและในสระ
-            total_visible = len(active_pool_ids) + len(active_safe_ids)
-            if total_visible > max_total_count:
-                max_total_count = total_visible
-                print(f"📊 อัปเดตจำนวนคนทั้งหมดสูงสุด: {max_total_count} คน (Pool: {len(active_pool_ids)}, Safe: {len(active_safe_ids)})")
-            if len(active_pool_ids) > max_pool_count:
-                max_pool_count = len(active_pool_ids)
-                print(f"📊 อัปเดตจำนวนคนในสระสูงสุด: {max_pool_count} คน")
-
-            # --- ตรวจสอบคนที่หายไป ---
-            for tid, state in list(person_state.items()):
-                if tid in seen_track_ids:
+    try:
+        while any(cam.reader.isOpened() for cam in cameras):
+            # --- รวมเฟรมล่าสุดของทุกกล้องเป็น batch เดียว ---
+            # ts = เวลาที่อ่านเฟรมได้จริง (ไม่ใช่เวลาที่ Main Loop หยิบเฟรม)
+            # เฟรมที่ไม่ใช่ keyframe ไม่เข้า detector (ใช้ตำแหน่งที่ทำนายแทน)
+            batch_cams, batch_frames, batch_ts = [], [], []
+            processed = []  # [(cam, annotated_frame)]
+            for cam in cameras:
+                with timer.stage("capture"):
+                    ok, frame, ts = cam.reader.read_latest(timeout=0.02)
+                if not ok:
                     continue
-
-                time_missing = ts - state["last_seen"]
-                display_id = state["display_id"]
-                last_pos = state.get("last_position")
-                
-                # ตรวจสอบว่าหายไปใน Pool Zone หรือไม่ (ไม่ใช่ออกไป Safe Zone)
-                was_in_pool = point_in_zone(last_pos, pool_zone) if (pool_zone and last_pos) else True
-                exited_safely = display_id in exited_to_safe_ids
-                
-                # --- บันทึกลง submerged_persons สำหรับ Re-identification ---
-                if was_in_pool and not exited_safely and display_id not in submerged_persons:
-                    if time_missing >= 1.0 and not state.get("submerged_logged", False):  # หายไปอย่างน้อย 1 วินาที
-                        submerged_persons[display_id] = {
-                            "position": last_pos,
-                            "time": state["last_seen"],
-                            "state": state.copy(),
-                        }
-                        state["submerged_logged"] = True  # ป้องกัน print ซ้ำ
-                        print(f" ID{display_id} หายไปใน Pool Zone (อาจดำน้ำ) - รอ re-identify")
-                
-                # --- นับจำนวนคนที่หายไปใน Pool Zone ---
-                if was_in_pool and not exited_safely:
-                    if time_missing >= MISSING_ALERT_SEC and not state.get("counted_as_missing"):
-                        missing_in_pool_count += 1
-                        state["counted_as_missing"] = True
-                        print(f"⚠️ ID{display_id} หายไปใน Pool Zone นานกว่า {MISSING_ALERT_SEC}s - นับว่าหายไป (รวม: {missing_in_pool_count})")
-
-                # --- แจ้งเตือนแบบขั้นบันได (Tiered Alerts) ---
-                # แจ้งเตือนทุกคนที่หายไปใน Pool Zone (ถ้ายังไม่กด S หยุด)
-                if was_in_pool and not exited_safely and not state.get("acknowledged", False):
-                    current_alert_level = state.get("missing_alert_level", 0)
-                    
-                    for tier in MISSING_ALERT_TIERS:
-                        tier_seconds = tier["seconds"]
-                        tier_level = tier["level"]
-                        tier_message = tier["message"]
-                        
-                        # ถ้าหายไปครบเวลาตาม tier และยังไม่เคยแจ้งเตือนระดับนี้
-                        if time_missing >= tier_seconds and current_alert_level < tier_level:
-                            msg = tier_message.format(id=display_id)
-                            print(f"📢 แจ้งเตือนระดับ {tier_level}: {msg}")
-                            alert_manager.trigger_alert(annotated_frame, video_buffer, custom_text=msg)
-                            state["missing_alert_level"] = tier_level
-                            state["missing_alerted"] = True
-                            state["last_repeat_alert"] = ts
-                            break  # แจ้งเตือนทีละระดับ
-                    
-                    # --- แจ้งเตือนซ้ำทุก REPEAT_ALERT_INTERVAL วินาที เมื่อเกิน 40 วินาที ---
-                    if time_missing >= 40 and current_alert_level >= 5:
-                        last_repeat = state.get("last_repeat_alert", 0)
-                        if ts - last_repeat >= REPEAT_ALERT_INTERVAL:  # ส่งซ้ำตาม interval
-                            msg = f"🆘🆘 ID{display_id} หายไปนานกว่า {int(time_missing)} วินาที! กด 'S' เพื่อหยุดแจ้งเตือน"
-                            print(f"� แจ้งเตือนซ้ำ: {msg}")
-                            alert_manager.trigger_alert(annotated_frame, video_buffer, custom_text=msg)
-                            state["last_repeat_alert"] = ts
-                
-                # --- ลบ submerged_persons ที่หมดเวลา ---
-                for sub_id in list(submerged_persons.keys()):
-                    if ts - submerged_persons[sub_id]["time"] > REIDENTIFY_TIME_SEC:
-                        del submerged_persons[sub_id]
-
-            # --- Alert Manager ---
-            alert_manager.process_frame(frame)
-
-            # --- วาด Status Panel ---
-            height, width = annotated_frame.shape[:2]
-            overlay = annotated_frame.copy()
-            cv2.rectangle(overlay, (10, 10), (480, 185), (0, 0, 0), -1)
-            cv2.addWeighted(overlay, 0.6, annotated_frame, 0.4, 0, annotated_frame)
-            
-            current_time_str = time.strftime("%H:%M:%S")
-            status_color = (0, 0, 255) if missing_in_pool_count > 0 else (0, 255, 0)
-            status_text = "MISSING DETECTED!" if missing_in_pool_count > 0 else "MONITORING"
-            
-            cv2.putText(annotated_frame, f"Status: {status_text}", (20, 35),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, status_color, 2)
-            
-            # แสดงจำนวนคนทั้งหมด (Pool + Safe)
-            total_current = len(active_pool_ids) + len(active_safe_ids)
-            cv2.putText(annotated_frame, f"Total: {total_current}/{max_total_count} | Missing: {missing_in_pool_count}", (20, 60),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-            cv2.putText(annotated_frame, f"Time: {current_time_str}", (20, 85),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-            
-            # แสดงจำนวนคนใน Pool Zone และ Safe Zone
-            pool_info_color = (255, 200, 100)
-            cv2.putText(annotated_frame, f"Pool: {len(active_pool_ids)} | Safe: {len(active_safe_ids)} | Submerged: {len(submerged_persons)}", (20, 110),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, pool_info_color, 1)
-            
-            # แสดงจำนวนคนที่หายไปใน Pool Zone
-            missing_color = (0, 0, 255) if missing_in_pool_count > 0 else (255, 255, 255)
-            cv2.putText(annotated_frame, f"Missing in Pool: {missing_in_pool_count}", (20, 135),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, missing_color, 1)
-            
-            # แสดง ID ที่ใช้อยู่
-            all_visible_ids = sorted(list(active_pool_ids | active_safe_ids))
-            ids_str = ", ".join([f"ID{i}" for i in all_visible_ids]) if all_visible_ids else "None"
-            cv2.putText(annotated_frame, f"IDs: {ids_str}", (20, 160),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.4, (200, 200, 200), 1)
-            cv2.putText(annotated_frame, "'z'=zones | 'q'=quit | 's'=stop alert", (20, 175),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.4, (200, 200, 200), 1)
+                if keyframes.is_keyframe(cam.name, ts):
+                    batch_cams.append(cam)
+                    batch_frames.append(frame)
+                    batch_ts.append(ts)
+                else:
+                    # เวลาที่ไม่ได้อยู่ในขั้นตอนย่อย (prebuffer / annotation / alert) = logic ของ zone/state/tier
+                    with timer.frame("logic"):
+                        processed.append((cam, cam.process_predicted(frame, ts)))
+
+            if batch_cams:
+                # --- YOLO Tracking (โมเดลเดียว, batch เดียว, tracker แยกต่อกล้อง) ---
+                with timer.stage("inference"):
+                    results = detector.track(
+                        batch_frames,
+                        [cam.name for cam in batch_cams],
+                        rois=[cam.inference_roi(frame) for cam, frame in zip(batch_cams, batch_frames)],
+                    )
+                batches += 1
+                for cam, frame, ts, result in zip(batch_cams, batch_frames, batch_ts, results):
+                    with timer.frame("logic"):
+                        processed.append((cam, cam.process(frame, ts, result)))
+            elif not processed:
+                continue
+            total_frames += len(processed)
 
             # --- แสดงผล ---
-            if SHOW_VIDEO:
-                cv2.imshow("Drowning Detection - YOLOv11", annotated_frame)
-                key = cv2.waitKey(1) & 0xFF
+            if display is not None:
+                with timer.stage("display"):
+                    for cam, annotated_frame in processed:
+                        window_title = f"Drowning Detection - YOLOv11 [{cam.name}]" if multi_camera else "Drowning Detection - YOLOv11"
+                        display.show(window_title, annotated_frame)
+
+            # --- รายงาน throughput ---
+            now = time.time()
+            if now - last_stats_time >= STATS_INTERVAL_SEC:
+                last_stats_time = now
+                _print_throughput(cameras, now - run_started, batches, bot, timer, journal)
+
+            if max_frames and total_frames >= max_frames:
+                break
+
+            if display is not None:
+                key = display.wait_key()
                 if key == ord('q'):
                     break
                 elif key == ord('z'):
                     # กำหนดพื้นที่ใหม่
                     print("\n🔄 กำหนดพื้นที่ใหม่...")
-                    pool_zone, safe_zone = setup_zones(cap)
-                    if pool_zone:
-                        print(f"✅ อัปเดตพื้นที่สระเรียบร้อย ({len(pool_zone)} จุด)")
+                    for cam in cameras:
+                        pool_zone, safe_zone = setup_zones(cam.reader, cam.zones_file, window_name=f"Zone Setup - {cam.name}")
+                        cam.set_zones(pool_zone, safe_zone)
+                        if pool_zone:
+                            print(f"✅ [{cam.name}] อัปเดตพื้นที่สระเรียบร้อย ({len(pool_zone)} จุด)")
                 elif key == ord('s'):
                     # หยุดการแจ้งเตือนและรีเซ็ตคนจมน้ำ (ได้รับการช่วยเหลือแล้ว)
-                    rescued_count = 0
-                    rescued_ids = []
-                    tids_to_remove = []
-                    
-                    for tid, state in person_state.items():
-                        # เฉพาะคนที่กำลังแจ้งเตือนอยู่ (หายไปในสระ)
-                        if state.get("missing_alert_level", 0) > 0 or state.get("submerged_logged", False):
-                            display_id = state['display_id']
-                            rescued_ids.append(display_id)
-                            tids_to_remove.append(tid)
-                            rescued_count += 1
-                            
-                            # ลบออกจาก submerged_persons
-                            if display_id in submerged_persons:
-                                del submerged_persons[display_id]
-                            
-                            # ลด missing_in_pool_count ถ้าเคยนับว่าหายไป
-                            if state.get("counted_as_missing", False):
-                                missing_in_pool_count = max(0, missing_in_pool_count - 1)
-                            
-                            print(f"🟢 ID{display_id} ได้รับการช่วยเหลือแล้ว - รีเซ็ตสถานะ")
-                    
-                    # ลบ person_state ของคนที่ได้รับการช่วยเหลือ
-                    for tid in tids_to_remove:
-                        del person_state[tid]
-                    
-                    if rescued_count > 0:
-                        ids_str = ", ".join([f"ID{i}" for i in rescued_ids])
-                        bot.send_message(f"🟢 ยืนยันการช่วยเหลือ: {ids_str} ({rescued_count} คน) - หยุดการแจ้งเตือน")
-                        print(f"🟢 ช่วยเหลือเรียบร้อย {rescued_count} คน - หยุดการแจ้งเตือนและรีเซ็ตสถานะ")
-                    else:
-                        print("ℹ️ ไม่มีคนจมน้ำที่ต้องช่วยเหลือ")
+                    for cam in cameras:
+                        cam.acknowledge_rescue()
+                elif key == ord('p'):
+                    profiler.toggle()
 
     except KeyboardInterrupt:
         print("\n หยุดโดยผู้ใช้")
 
     finally:
-        cap.release()
-        if SHOW_VIDEO:
-            cv2.destroyAllWindows()
+        for cam in cameras:
+            cam.reader.release()
+            print(f" [{cam.name}] Capture: อ่านได้ {cam.reader.frames_captured} เฟรม, ทิ้ง {cam.reader.dropped_frames} เฟรม")
+        elapsed = time.time() - run_started
+        for cam in cameras:
+            cam.alert_manager.close()  # ส่งการแจ้งเตือนที่ยังพักอยู่ (ก่อน dvr.close / bot.close)
+        if metrics_server is not None:
+            metrics_server.stop()
+        if journal is not None:
+            journal.close()  # เขียนเหตุการณ์ที่ค้างในคิวให้หมด
+        for cam in cameras:
+            if cam.dvr is not None:
+                cam.dvr.close()  # ปิด segment สุดท้ายและดึงคลิปยาวที่รออยู่ (ส่งก่อน bot.close)
+        _print_throughput(cameras, elapsed, batches, bot, timer, journal)
+        if display is not None:
+            display.close()
         bot.send_message(" ระบบตรวจจับการจมน้ำหยุดทำงานแล้ว")
+        bot.close(timeout=10)  # ส่งข้อความที่ค้างในคิวให้หมดก่อนออก
         print("\n ระบบหยุดทำงานแล้ว")
 
+    return {"elapsed_sec": elapsed, "frames": total_frames, "batches": batches}
+
+
+def _print_throughput(cameras, elapsed: float, batches: int, bot=None, timer: StageTimer = None, journal=None):
+    """แสดง throughput ของแต่ละกล้องและรวมทั้งหมด"""
+    if elapsed <= 0:
+        return
+    total_frames = 0
+    print(f"📈 Throughput ({elapsed:.0f}s, {batches} batch, {batches / elapsed:.2f} batch/s):")
+    for cam in cameras:
+        total_frames += cam.frames_processed
+        print(f"   [{cam.name}] {cam.frames_processed} เฟรม | {cam.frames_processed / elapsed:.2f} FPS "
+              f"(detector {cam.frames_processed - cam.frames_predicted} เฟรม, ทำนาย {cam.frames_predicted} เฟรม)")
+        if isinstance(cam.reader.cap, CaptureSupervisor):
+            cs = cam.reader.cap.stats()
+            link = "เชื่อมต่อ" if cs["connected"] else f"ขาด {cs['outage_sec']:.0f}s"
+            print(f"   [{cam.name}] capture: {link} "
+                  f"| เชื่อมต่อใหม่ {cs['reconnects']} ครั้ง (กลับมา p50 {cs['recover_p50_sec']:.1f}s, "
+                  f"max {cs['recover_max_sec']:.1f}s) | glass-to-frame p50 {cs['latency_p50_ms']:.0f} ms")
+        buf = cam.video_buffer.stats()
+        print(f"   [{cam.name}] pre-buffer: {buf['frames']} เฟรม | {buf['bytes'] / (1024 * 1024):.1f} MB "
+              f"({buf['bytes_per_frame'] / 1024:.0f} KB/เฟรม) | encode {buf['encode_ms_per_frame']:.2f} ms/เฟรม")
+    print(f"   [รวม] {total_frames} เฟรม | {total_frames / elapsed:.2f} FPS")
+    if bot is not None:
+        tg = bot.stats()
+        print(f"   [Telegram] ส่งแล้ว {tg['sent']} | ล้มเหลว {tg['failed']} | ทิ้ง {tg['dropped']} | รอส่ง {tg['pending']} "
+              f"| latency p50 {tg['latency_p50_ms']:.0f} ms")
+        for priority, lat in bot.latency_by_priority().items():
+            print(f"   [Telegram priority {priority}] {lat['count']} งาน | ตรวจพบ -> ส่งสำเร็จ p50 {lat['p50_ms']:.0f} ms "
+                  f"| max {lat['max_ms']:.0f} ms")
+    if journal is not None:
+        js = journal.stats()
+        print(f"   [Journal] เขียนแล้ว {js['written']} | ทิ้ง {js['dropped']} | รอเขียน {js['pending']} "
+              f"| {js['batches']} batch ({js['write_ms_per_batch']:.1f} ms/batch, max {js['max_batch_ms']:.1f} ms) "
+              f"| ผิดพลาด {js['write_errors']}")
+    for cam in cameras:
+        if cam.dvr is not None:
+            dv = cam.dvr.stats()
+            print(f"   [{cam.name}] DVR: {dv['segments']} segment | {dv['bytes'] / (1024 * 1024):.1f} MB "
+                  f"| ย้อนหลังได้ {dv['span_sec']:.0f}s | ทิ้ง {dv['frames_dropped']} เฟรม | ลบ {dv['segments_evicted']} segment")
+    if timer is not None:
+        for stage, stats in timer.summary().items():
+            print(f"   [{stage}] p50 {stats['p50_ms']:.1f} ms | p95 {stats['p95_ms']:.1f} ms | p99 {stats['p99_ms']:.1f} ms")
+
+
+# --- โหมดวิเคราะห์คลิปย้อนหลัง (Offline) ---
+# แต่ละ process โหลดโมเดลครั้งเดียว (initializer) แล้ววิเคราะห์ไฟล์ที่ได้รับทีละไฟล์
+_offline_model = None
+
+
+def _init_offline_worker(torch_threads: int):
+    global _offline_model
+    if torch_threads > 0:
+        torch.set_num_threads(torch_threads)
+    _offline_model = _load_model()
+
+
+def _analyze_recording(path: str, events_dir: str) -> dict:
+    """
+    วิเคราะห์คลิปหนึ่งไฟล์เร็วที่สุดเท่าที่เครื่องทำได้ โดยนับเวลาตาม timestamp ของเฟรม (VideoClock)
+
+    ไม่ส่ง Telegram - ทุกการแจ้งเตือนที่ควรเกิดถูกบันทึกลง <events_dir>/<ชื่อไฟล์>.events.jsonl
+    zones: <ชื่อไฟล์>.zones.json ข้างคลิป (ถ้ามี) หรือ ZONES_FILE
+    """
+    if _offline_model is None:
+        return {"file": path, "error": "โหลดโมเดลไม่สำเร็จ"}
+    model, imgsz = _offline_model
+    device = "0" if torch.cuda.is_available() else "cpu"
+    name = os.path.splitext(os.path.basename(path))[0]
+
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        return {"file": path, "error": "เปิดไฟล์ไม่ได้"}
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    duration_sec = cap.get(cv2.CAP_PROP_FRAME_COUNT) / fps
+    # ไม่มีเวลาเริ่มบันทึกในไฟล์ -> ประมาณจากเวลาแก้ไขไฟล์ (= ตอนบันทึกเสร็จ) ลบความยาวคลิป
+    clock = VideoClock(origin=os.path.getmtime(path) - duration_sec, fps=fps)
+
+    zones_file = os.path.splitext(path)[0] + ".zones.json"
+    if not os.path.exists(zones_file):
+        zones_file = os.path.join(BASE_DIR, _get_env("ZONES_FILE", "zones.json"))
+    pool_zone, safe_zone = load_zones(zones_file)
+
+    detector, keyframes = _create_detector(model, imgsz, device)
+    event_log = AlertEventLog(os.path.join(events_dir, f"{name}.events.jsonl"), source=path, clock=clock)
+    alert_manager = AlertManager(
+        bot_obj=None,
+        alert_text=_get_env("ALERT_TEXT", "แจ้งเตือนพบคนจมน้ำ"),
+        send_message=False,
+        send_photo=False,
+        send_video=False,
+        snapshot_path="",
+        video_path="",
+        video_duration_sec=_get_env_float("VIDEO_DURATION_SEC", 3),
+        video_fps=_get_env_float("VIDEO_FPS", 30),
+        video_codec=_get_env("VIDEO_CODEC", "avc1"),
+        alert_cooldown_sec=_get_env_float("ALERT_COOLDOWN_SEC", 0),
+        coalesce_window_sec=_get_env_float("ALERT_COALESCE_SEC", 1.0),
+        urgent_level=_get_env_int("ALERT_URGENT_LEVEL", 5),
+        clock=clock,
+    )
+    cam = CameraPipeline(
+        name=name,
+        reader=None,
+        alert_manager=alert_manager,
+        bot_obj=None,
+        zones_file=zones_file,
+        pool_zone=pool_zone,
+        safe_zone=safe_zone,
+        video_buffer=deque(maxlen=1),  # ไม่ทำคลิปแจ้งเตือน -> ไม่ต้องเก็บ pre-event
+        missing_alert_sec=_get_env_float("MISSING_ALERT_SEC", 40),
+        repeat_alert_interval=10,
+        reidentify_distance_px=_get_env_float("REIDENTIFY_DISTANCE_PX", 150),
+        reidentify_time_sec=_get_env_float("REIDENTIFY_TIME_SEC", 60),
+        annotate=False,
+        roi_margin_px=_get_env_int("ROI_MARGIN_PX", 32) if _get_env_bool("INFERENCE_ROI", False) else None,
+        clock=clock,
+        event_log=event_log,
+    )
+    cam.started_at = clock.origin
+
+    started = time.time()
+    try:
+        while True:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            ts = clock.frame_time(cap)
+            if keyframes.is_keyframe(name, ts):
+                result = detector.track([frame], [name], rois=[cam.inference_roi(frame)])[0]
+                cam.process(frame, ts, result)
+            else:
+                cam.process_predicted(frame, ts)
+    finally:
+        cap.release()
+        event_log.close()
+    elapsed = time.time() - started
+    video_sec = clock.offset(clock.now())
+    return {
+        "file": path,
+        "events_file": event_log.path,
+        "frames": cam.frames_processed,
+        "video_sec": round(video_sec, 2),
+        "elapsed_sec": round(elapsed, 2),
+        "speedup": round(video_sec / elapsed, 2) if elapsed > 0 else None,
+        "events": event_log.events,
+    }
+
+
+def analyze_recordings(paths: list, events_dir: str, workers: int = 0) -> list:
+    """
+    วิเคราะห์คลิปย้อนหลังหลายไฟล์พร้อมกันด้วย process pool (1 ไฟล์ต่อ process ต่อครั้ง)
+
+    พารามิเตอร์:
+        paths (list): ไฟล์วิดีโอ.
+        events_dir (str): โฟลเดอร์ของ event log (.events.jsonl ต่อไฟล์ + summary.json).
+        workers (int): จำนวน process (0 = GPU: 1, CPU: ครึ่งหนึ่งของจำนวน core แต่ไม่เกินจำนวนไฟล์).
+    """
+    os.makedirs(events_dir, exist_ok=True)
+    cpu_count = os.cpu_count() or 1
+    if workers <= 0:
+        workers = 1 if torch.cuda.is_available() else max(1, cpu_count // 2)
+    workers = max(1, min(workers, len(paths)))
+    torch_threads = max(1, cpu_count // workers)
+    print(f"🗂️ วิเคราะห์ {len(paths)} ไฟล์ด้วย {workers} process ({torch_threads} thread/process) -> {events_dir}")
+
+    summaries = []
+    # spawn: ปลอดภัยกับ CUDA และเหมือนกันทุกระบบปฏิบัติการ
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_offline_worker, initargs=(torch_threads,)) as pool:
+        futures = {pool.submit(_analyze_recording, path, events_dir): path for path in paths}
+        for future in as_completed(futures):
+            try:
+                summary = future.result()
+            except Exception as e:
+                summary = {"file": futures[future], "error": str(e)}
+            summaries.append(summary)
+            if "error" in summary:
+                print(f"❌ {summary['file']}: {summary['error']}")
+            else:
+                print(f"✅ {summary['file']}: {summary['events']} การแจ้งเตือน | {summary['video_sec']:.0f}s ของคลิป "
+                      f"ใน {summary['elapsed_sec']:.0f}s (x{summary['speedup']})")
+
+    summaries.sort(key=lambda item: paths.index(item["file"]))
+    with open(os.path.join(events_dir, "summary.json"), "w", encoding="utf-8") as f:
+        json.dump(summaries, f, indent=2, ensure_ascii=False)
+    return summaries
+
 
 if __name__ == "__main__":
-    main()
+    # python main.py                                      -> กล้องสดตาม .env
+    # python main.py --offline a.mp4 b.mp4 [--workers 4]  -> วิเคราะห์คลิปย้อนหลัง (event log ต่อไฟล์)
+    parser = argparse.ArgumentParser(description="ระบบตรวจจับการจมน้ำ")
+    parser.add_argument("--offline", nargs="+", metavar="VIDEO", help="วิเคราะห์คลิปย้อนหลังเร็วกว่าเวลาจริง")
+    parser.add_argument("--workers", type=int, default=0, help="จำนวน process (0 = อัตโนมัติ)")
+    parser.add_argument("--events-dir", default=os.path.join(BASE_DIR, "offline_events"))
+    args = parser.parse_args()
+    if args.offline:
+        analyze_recordings(args.offline, args.events_dir, args.workers)
+    else:
+        main()
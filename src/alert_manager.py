@@ -2,14 +2,21 @@ import os
 import cv2
 import numpy as np
 import threading
+import itertools
+import tempfile
 from collections import deque
 import time
 from datetime import datetime
 from .telegram_utils import TelegramBot
+from .clip_writer import StreamingClipWriter, find_ffmpeg
+from .clock import WallClock
 
 class AlertManager:
     """
     คลาสสำหรับจัดการระบบแจ้งเตือนไปยัง Telegram แบบ Non-blocking.
+
+    trigger_alert เพิ่มการแจ้งเตือนเข้าคิว และ process_frame ส่งออกเป็นชุดหลังพักสั้นๆ: ID ที่หายไปพร้อมกันถูกรวมเป็นข้อความเดียว
+    ระดับสูงส่งก่อน ข้อความไม่รอรูป/คลิป และการแจ้งเตือนระหว่างบันทึกคลิปถูกแนบไปกับคลิปนั้น
     """
     def __init__(self,
                  bot_obj: TelegramBot,
@@ -22,7 +29,19 @@ class AlertManager:
                  video_duration_sec: float,
                  video_fps: float,
                  video_codec: str,
-                 alert_cooldown_sec: float):
+                 alert_cooldown_sec: float,
+                 coalesce_window_sec: float = 1.0,
+                 urgent_level: int = 5,
+                 timer=None,
+                 clock=None,
+                 clip_max_width: int = 0,
+                 clip_bitrate_kbps: float = 0,
+                 clip_max_mb: float = 0,
+                 ffmpeg_path: str = "ffmpeg",
+                 media_spool_mb: float = 8,
+                 dvr=None,
+                 dvr_pre_sec: float = 120,
+                 dvr_post_sec: float = 10):
         """
         เริ่มต้น AlertManager.
 
@@ -32,12 +51,31 @@ class AlertManager:
             send_message (bool): ส่งข้อความหรือไม่.
             send_photo (bool): ส่งรูปภาพหรือไม่.
             send_video (bool): ส่งวิดีโอหรือไม่.
-            snapshot_path (str): เส้นทางสำหรับบันทึกรูปภาพ snapshot.
-            video_path (str): เส้นทางสำหรับบันทึกวิดีโอ.
+            snapshot_path (str): ชื่อไฟล์ของรูป snapshot ที่ส่ง (รูปเข้ารหัสในหน่วยความจำ ไม่เขียนลงดิสก์
+                ยกเว้นใหญ่เกิน media_spool_mb).
+            video_path (str): ชื่อไฟล์ต้นแบบของคลิป - แต่ละการแจ้งเตือนใช้ไฟล์ของตัวเองในโฟลเดอร์เดียวกัน
+                (<ชื่อ>_<เวลา>_<ลำดับ>.mp4) และถูกลบหลังส่ง.
             video_duration_sec (float): ระยะเวลาของวิดีโอที่ต้องการบันทึก (วินาที).
             video_fps (float): เฟรมเรตของวิดีโอ.
             video_codec (str): Codec สำหรับบันทึกวิดีโอ.
-            alert_cooldown_sec (float): ระยะเวลา Cooldown ระหว่างการแจ้งเตือน (วินาที).
+            alert_cooldown_sec (float): ระยะเวลา Cooldown ระหว่างการแจ้งเตือน (วินาที) - การแจ้งเตือนระหว่างนั้น
+                ถูกรวมส่งเมื่อพ้น cooldown (ระดับที่สูงกว่าครั้งล่าสุดส่งทันที) - พ้น cooldown แล้วนับเป็นเหตุการณ์ใหม่.
+            coalesce_window_sec (float): พักการแจ้งเตือนของเหตุการณ์ใหม่ไว้นานเท่านี้นับจากรายการแรกที่รอ (วินาที)
+                เพื่อให้ ID ที่ถึง tier เดียวกันห่างกันไม่กี่เฟรมรวมเป็นข้อความเดียว (0 = ไม่พัก).
+            urgent_level (int): การแจ้งเตือนระดับนี้ขึ้นไปส่งทันทีโดยไม่พัก coalesce_window_sec.
+            timer (StageTimer): บันทึกเวลาเข้ารหัส snapshot / คลิป (None = ไม่วัด).
+            clock (WallClock / VideoClock): เวลาของ cooldown / การเลือกเฟรม pre-event / เวลาที่ประทับบนคลิป
+                (None = เวลาจริงของเครื่อง).
+            clip_max_width (int): ย่อคลิปให้กว้างไม่เกินนี้ก่อนเข้ารหัส (0 = ขนาดเดิม).
+            clip_bitrate_kbps (float): bitrate ของคลิป H.264 (0 = CRF).
+            clip_max_mb (float): ขนาดไฟล์เป้าหมายของคลิป (MB) - คำนวณเป็น bitrate จากความยาวคลิป
+                และใช้ค่าที่ต่ำกว่าระหว่างนี้กับ clip_bitrate_kbps (0 = ไม่จำกัด).
+            ffmpeg_path (str): ffmpeg สำหรับเข้ารหัส H.264 (ไม่พบ / None = cv2.VideoWriter ด้วย video_codec).
+            media_spool_mb (float): รูป/คลิปที่เล็กกว่านี้ส่งจากหน่วยความจำ ใหญ่กว่าใช้ไฟล์ชั่วคราว.
+            dvr (SegmentRecorder): DVR ของกล้องนี้ - ส่งคลิปยาว [เวลาแจ้งเตือน - dvr_pre_sec,
+                + dvr_post_sec] ตามหลังคลิปสั้น (None = ไม่ส่ง).
+            dvr_pre_sec (float): ความยาวย้อนหลังของคลิปยาว (วินาที).
+            dvr_post_sec (float): ความยาวหลังการแจ้งเตือนของคลิปยาว (วินาที).
         """
         self.bot = bot_obj
         self.alert_text = alert_text
@@ -50,46 +88,70 @@ class AlertManager:
         self.video_fps = video_fps
         self.video_codec = video_codec
         self.alert_cooldown_sec = alert_cooldown_sec
+        self.coalesce_window_sec = coalesce_window_sec
+        self.urgent_level = urgent_level
+        self.timer = timer
+        self.clock = clock or WallClock()
+        self.clip_max_width = clip_max_width
+        self.clip_bitrate_kbps = clip_bitrate_kbps
+        self.clip_max_mb = clip_max_mb
+        self.ffmpeg_path = find_ffmpeg(ffmpeg_path) if send_video else None
+        self.spool_max_bytes = int(media_spool_mb * 1024 * 1024)
+        self.dvr = dvr
+        self.dvr_pre_sec = dvr_pre_sec
+        self.dvr_post_sec = dvr_post_sec
+        self.dvr_covered_until = float("-inf")  # เวลาสิ้นสุดของคลิปยาวล่าสุดที่ขอไปแล้ว
+        self._media_seq = itertools.count(1)
 
         self.last_alert_time = 0.0
+        # ระดับสูงสุดของเหตุการณ์ที่กำลังอยู่ใน cooldown (ระดับที่สูงกว่าไม่ต้องรอ) - กลับเป็น 0 เมื่อพ้น cooldown
+        self.last_alert_level = 0
+        self.pending_alerts = []  # การแจ้งเตือนที่รอรวมเป็นข้อความเดียว (ส่งใน flush)
         self.alert_thread = None
+        self._closed = False  # หลัง close() การแจ้งเตือนใหม่ไม่เข้าคิว (trigger_alert คืน False)
+        self._snapshot_threads = []  # AlertSender ที่อาจยังไม่ได้ส่งรูปเข้าคิว (close() รอให้เสร็จ)
         self.alert_lock = threading.Lock() # ใช้สำหรับป้องกัน Race Condition
         
         # ตัวแปรสำหรับระบบบันทึกวิดีโอแบบต่อเนื่อง (Post-Event Recording)
+        # เฟรมถูกส่งเข้า StreamingClipWriter ทันที (ไม่สะสมใน RAM)
         self.recording = False
-        self.recording_frames = []
+        self.clip_writer = None
         self.frames_remaining = 0
+        self.clip_info = None  # คำอธิบาย / priority / เวลาตรวจพบของคลิปที่กำลังบันทึก
+        self.clip_frames = 0  # จำนวนเฟรมทั้งหมดของคลิปที่กำลังบันทึก (pre-event + post-event)
         self.current_alert_caption = self.alert_text
 
     def process_frame(self, frame):
         """
         รับเฟรมจาก Main Loop ตลอดเวลา
-        หากอยู่ในสถานะ Recording จะทำการเก็บเฟรมนี้เข้าวิดีโอ
+        หากอยู่ในสถานะ Recording จะส่งเฟรมนี้เข้า encoder thread (copy และประทับเวลาใน thread นั้น)
+        จากนั้นส่งการแจ้งเตือนที่รออยู่ (flush) - เรียกหลัง trigger_alert ของเฟรมเดียวกัน
         """
         with self.alert_lock:
             if self.recording:
-                # แก้ไข: ทำสำเนาเฟรมก่อนนำไปประมวลผล เพื่อป้องกันการแก้ไขข้อมูลต้นฉบับ
-                frame_to_record = frame.copy()
-                
-                # ประทับเวลา (Timestamp) ลงบนเฟรมเพื่อตรวจสอบว่าเป็นภาพใหม่จริง
-                timestamp_text = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-                cv2.putText(frame_to_record, timestamp_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2, cv2.LINE_AA)
-                
-                self.recording_frames.append(frame_to_record)
+                self.clip_writer.write(frame, stamp_time=datetime.fromtimestamp(self.clock.now()))
                 self.frames_remaining -= 1
-                
+
                 # เมื่อบันทึกครบตามจำนวนที่ต้องการแล้ว
                 if self.frames_remaining <= 0:
                     self.recording = False
-                    print(f" [AlertManager] บันทึกวิดีโอครบแล้ว ({len(self.recording_frames)} เฟรม) -> เริ่มส่งข้อมูล")
-                    # เริ่ม Thread สำหรับ Save และ Send
-                    threading.Thread(
-                        target=self._save_and_send_video_task,
-                        args=(self.recording_frames, self.current_alert_caption),
-                        daemon=True
-                    ).start()
-
-    def _extract_frames_from_prebuffer(self, pre_buffer: deque, now_ts: float) -> list:
+                    print(f" [AlertManager] บันทึกวิดีโอครบแล้ว -> ปิดไฟล์และเริ่มส่งข้อมูล")
+                    self.clip_writer.close()
+        self.flush()
+
+    def _extract_frames_from_prebuffer(self, pre_buffer, now_ts: float) -> list:
+        return [self._materialize(f) for f in self._select_prebuffer_frames(pre_buffer, now_ts)]
+
+    @staticmethod
+    def _materialize(item) -> np.ndarray:
+        # EncodedFrame -> decode, np.ndarray -> deep copy กันเฟรมถูกแก้ไขทีหลัง
+        return item.decode() if hasattr(item, "decode") else item.copy()
+
+    def _select_prebuffer_frames(self, pre_buffer, now_ts: float) -> list:
+        """
+        เลือกเฟรม pre-event ตามช่วงเวลาของคลิป โดยยังไม่ decode/copy
+        (CompressedFrameBuffer คืนค่า EncodedFrame, deque คืนค่า np.ndarray เดิม)
+        """
         if pre_buffer is None or len(pre_buffer) == 0:
             return []
 
@@ -97,20 +159,23 @@ class AlertManager:
         if target_frames <= 0:
             target_frames = 1
 
+        # CompressedFrameBuffer: เลือกเฟรมจาก timestamp ก่อน แล้ว decode เฉพาะเฟรมที่ใช้จริง
+        items = pre_buffer.entries() if hasattr(pre_buffer, "entries") else list(pre_buffer)
+
         # รองรับทั้ง 2 แบบ:
         # - deque[(ts, frame)]
         # - deque[frame]
-        first_item = pre_buffer[0]
+        first_item = items[0]
         has_ts = isinstance(first_item, tuple) and len(first_item) == 2
 
         if has_ts:
             start_ts = float(now_ts) - float(self.video_duration_sec)
-            window = [f for (t, f) in pre_buffer if float(t) >= start_ts]
+            window = [f for (t, f) in items if float(t) >= start_ts]
             if len(window) == 0:
-                window = [pre_buffer[-1][1]]
+                window = [items[-1][1]]
         else:
             # ไม่มี timestamp: ใช้จำนวนเฟรมย้อนหลังตาม target
-            window = list(pre_buffer)[-target_frames:]
+            window = items[-target_frames:]
 
         # Resample เฉพาะกรณีเฟรมเยอะเกิน (คุมความยาว)
         # ถ้าเฟรมไม่พอ: ไม่ pad ที่นี่ เพื่อหลีกเลี่ยงคลิปนิ่งจากการซ้ำเฟรมเดียว
@@ -120,8 +185,7 @@ class AlertManager:
         else:
             frames = list(window)
 
-        # deep copy กันเฟรมถูกแก้ไขทีหลัง
-        return [f.copy() for f in frames]
+        return frames
 
     def _read_video_frame_count(self, video_path: str, max_frames: int = 5) -> int:
         try:
@@ -137,129 +201,359 @@ class AlertManager:
         except Exception:
             return 0
 
-    def _save_and_send_video_task(self, frames: list, caption_text: str):
+    def _on_clip_finished(self, writer: StreamingClipWriter, caption_text: str, priority: int = 0,
+                          detected_at: float = None):
         """
-        ฟังก์ชัน Worker สำหรับบันทึกและส่งวิดีโอใน thread แยก
+        เรียกจาก encoder thread เมื่อปิดไฟล์คลิปแล้ว -> ตรวจสอบและส่งเข้า Telegram
         """
-        if not frames:
+        if writer.frames_written == 0:
             print(" [VideoThread] ไม่มีข้อมูลเฟรมภาพ")
+            if writer.output is not None:
+                writer.output.close()
+            self._remove_file(writer.video_path)
             return
 
         # ---- Verification: ตรวจสอบความแตกต่างของเฟรม ----
-        if len(frames) > 1:
+        if writer.frames_written > 1:
             # เปรียบเทียบข้อมูล pixel ของเฟรมแรกและเฟรมสุดท้าย
-            are_frames_identical = np.array_equal(frames[0], frames[-1])
+            are_frames_identical = np.array_equal(writer.first_frame, writer.last_frame)
             print(f" [VideoThread-Debug] Frame-Check: เฟรมแรกและเฟรมสุดท้าย 'เหมือนกัน': {are_frames_identical}")
             if are_frames_identical:
                 print(" [VideoThread-Warning] วิดีโออาจไม่มีการเคลื่อนไหว (Static Video)!")
         # ------------------------------------------------
+        writer.first_frame = writer.last_frame = None
+
+        if writer.frames_dropped:
+            print(f" [VideoThread-Warning] encoder ไม่ทัน - ทิ้งไป {writer.frames_dropped} เฟรม")
+
+        size_bytes = writer.size_bytes if writer.ok else 0
+        if size_bytes > 0:
+            size_mb = size_bytes / (1024 * 1024)
+            tail_ms = (writer.finished_at - writer.closed_at) * 1000.0
+            width, height = writer.frame_size
+            print(f" [VideoThread] บันทึกเสร็จสิ้น ({writer.frames_written} เฟรม, {width}x{height}, {writer.backend}, "
+                  f"{size_mb:.2f} MB, เข้ารหัส {writer.encode_sec:.2f}s, "
+                  f"พร้อมส่ง {tail_ms:.0f} ms หลังเฟรมสุดท้าย) -> กำลังส่งเข้า Telegram...")
+            if self.clip_max_mb and size_mb > self.clip_max_mb:
+                print(f" [VideoThread-Warning] คลิปใหญ่กว่าเป้าหมาย {self.clip_max_mb:g} MB "
+                      f"(ลด CLIP_MAX_WIDTH หรือติดตั้ง ffmpeg เพื่อคุม bitrate)")
+            self.bot.send_media(self._clip_media(writer, size_bytes), mode="video", caption=caption_text,
+                                priority=priority, detected_at=detected_at,
+                                filename=os.path.basename(self.video_path), delete_after=True)
+        else:
+            print(" [VideoThread] ผิดพลาด: ไฟล์วิดีโอมีขนาด 0 หรือไม่ถูกสร้าง")
+            if writer.output is not None:
+                writer.output.close()
+            self._remove_file(writer.video_path)
 
+    def _clip_media(self, writer: StreamingClipWriter, size_bytes: int):
+        """
+        คลิปที่จะส่ง: buffer ของ ffmpeg (SpooledTemporaryFile) หรือไฟล์ของ cv2.VideoWriter
+        ไฟล์ที่เล็กกว่า spool_max_bytes ถูกอ่านเข้าหน่วยความจำแล้วลบทันที ที่ใหญ่กว่าส่งจากไฟล์และลบหลังส่ง
+        """
+        if writer.output is not None:
+            return writer.output
+        if size_bytes > self.spool_max_bytes:
+            return writer.video_path
+        with open(writer.video_path, "rb") as f:
+            data = f.read()
+        self._remove_file(writer.video_path)
+        return data
+
+    @staticmethod
+    def _remove_file(path: str):
         try:
-            # 1. เตรียมพารามิเตอร์
-            height, width = frames[0].shape[:2]
-            fps = float(self.video_fps)
-            
-            # ลบไฟล์เดิมทิ้งก่อน
-            if os.path.exists(self.video_path):
-                try:
-                    os.remove(self.video_path)
-                except OSError:
-                    pass
-
-            print(f" [VideoThread] เริ่มบันทึกวิดีโอ... ({len(frames)} เฟรม, {width}x{height}, {fps} FPS)")
-
-            # 2. เลือก Codec ที่เหมาะสมที่สุดสำหรับ Telegram (mp4v)
-            selected_codec = 'mp4v'
-            fourcc = cv2.VideoWriter_fourcc(*selected_codec)
-            out = cv2.VideoWriter(self.video_path, fourcc, fps, (width, height), isColor=True)
-            if not out.isOpened():
-                print(f" [VideoThread] CRITICAL: ไม่สามารถสร้างไฟล์วิดีโอได้ (Codec '{selected_codec}' ใช้งานไม่ได้)")
+            if os.path.exists(path):
+                os.remove(path)
+        except OSError as e:
+            print(f" [AlertManager] ลบไฟล์ {path} ไม่สำเร็จ: {e}")
+
+    def _media_buffer(self, data: bytes):
+        """bytes ที่เล็กกว่า spool_max_bytes ส่งตรงจากหน่วยความจำ ที่ใหญ่กว่าย้ายไปไฟล์ชั่วคราว (ลบเมื่อปิด)"""
+        if len(data) <= self.spool_max_bytes:
+            return data
+        spooled = tempfile.TemporaryFile(dir=os.path.dirname(self.snapshot_path) or None)
+        spooled.write(data)
+        return spooled
+
+    def _unique_clip_path(self, tag: str = "") -> str:
+        """ไฟล์คลิปของการแจ้งเตือนนี้ (ไม่ชนกับคลิปอื่นที่ยังส่งไม่เสร็จ)"""
+        stem, ext = os.path.splitext(self.video_path)
+        return f"{stem}{tag}_{datetime.now():%Y%m%d_%H%M%S}_{next(self._media_seq)}{ext or '.mp4'}"
+
+    def _request_dvr_clip(self, current_time: float, caption_text: str, priority: int, detected_at: float):
+        """
+        ขอคลิปยาวจาก DVR (ดึงเมื่อ segment ที่ครอบเวลาหลังเหตุการณ์ถูกปิด - ใช้ไฟล์บนดิสก์ ไม่ใช้ RAM)
+        การแจ้งเตือนที่อยู่ในช่วงของคลิปยาวที่ขอไปแล้วไม่ขอซ้ำ
+        """
+        if current_time < self.dvr_covered_until:
+            return
+        t0, t1 = current_time - self.dvr_pre_sec, current_time + self.dvr_post_sec
+        self.dvr_covered_until = t1
+        caption = f"📼 ย้อนหลัง {self.dvr_pre_sec:.0f} วินาที\n{caption_text}"
+
+        def on_ready(path, ok):
+            if not ok:
+                print(" [DVR] ไม่มีภาพในช่วงของการแจ้งเตือน - ไม่ส่งคลิปยาว")
+                self._remove_file(path)
                 return
+            self.bot.send_media(path, mode="video", caption=caption, priority=priority, detected_at=detected_at,
+                                filename=os.path.basename(path), delete_after=True)
 
-            print(f" [VideoThread] ✔ เลือกใช้งาน Codec: '{selected_codec}'")
-
-            # 3. เขียนเฟรมลงไฟล์
-            for frame in frames:
-                out.write(frame)
-                time.sleep(0.0005) # ป้องกัน CPU 100%
-            
-            out.release()
+        self.dvr.request_clip(t0, t1, self._unique_clip_path("_dvr"), on_ready)
 
-            # 4. ตรวจสอบไฟล์และส่ง
-            if os.path.exists(self.video_path) and os.path.getsize(self.video_path) > 0:
-                size_mb = os.path.getsize(self.video_path) / (1024 * 1024)
-                print(f" [VideoThread] บันทึกเสร็จสิ้น ({size_mb:.2f} MB) -> กำลังส่งเข้า Telegram...")
-                self.bot.send_media(self.video_path, mode="video", caption=caption_text)
+    def _send_snapshot_task(self, snapshot_frame, caption_text: str, priority: int, detected_at: float):
+        """snapshot_frame: np.ndarray หรือ callable ที่วาดภาพ (โหมด headless - วาดใน thread นี้)"""
+        print(" [AlertThread] เริ่มเข้ารหัสและส่งรูปภาพ...")
+        try:
+            if callable(snapshot_frame):
+                snapshot_frame = snapshot_frame()
+            encode_start = time.perf_counter()
+            ok, encoded = cv2.imencode(os.path.splitext(self.snapshot_path)[1] or ".jpg", snapshot_frame)
+            if self.timer is not None:
+                self.timer.record("alert_encode_snapshot", time.perf_counter() - encode_start)
+            if ok and encoded.size > 0:
+                self.bot.send_media(self._media_buffer(encoded.tobytes()), mode="photo", caption=caption_text,
+                                    priority=priority, detected_at=detected_at,
+                                    filename=os.path.basename(self.snapshot_path))
+                print(" [AlertThread] เริ่มส่งรูปภาพ (non-blocking)")
             else:
-                print(" [VideoThread] ผิดพลาด: ไฟล์วิดีโอมีขนาด 0 หรือไม่ถูกสร้าง")
-
+                print(" [AlertThread] เข้ารหัสรูปภาพไม่สำเร็จ")
         except Exception as e:
-            print(f" [VideoThread] Exception: {e}")
+            print(f" [AlertThread] เกิดข้อผิดพลาดในการส่งรูปภาพ: {e}")
 
-    def _send_immediate_task(self, snapshot_frame: 'np.ndarray', caption_text: str):
-        print(" [AlertThread] เริ่มส่งข้อความและรูปภาพ...")
+    def trigger_alert(self, snapshot_frame, pre_buffer: deque, custom_text: str = None, level: int = 0,
+                      display_id=None, message_template: str = None, detected_ts: float = None,
+                      missing_sec: float = None) -> bool:
+        """
+        เพิ่มการแจ้งเตือนเข้าคิว - ส่งจริงใน flush() (process_frame ของเฟรมที่พ้นช่วงพัก coalesce_window_sec)
+        ไม่ถูกทิ้งเพราะ cooldown หรือการบันทึกคลิปอีกต่อไป
+
+        snapshot_frame: np.ndarray หรือ callable ที่คืนภาพ snapshot (เรียกเฉพาะเมื่อจะส่งรูป)
+        level: ระดับ tier - ระดับสูงส่งก่อน (priority = -level) และไม่ต้องรอ cooldown ของระดับที่ต่ำกว่า
+        message_template: ข้อความที่มี {id} (และ {seconds}) - การแจ้งเตือน template เดียวกันในรอบเดียวกันถูกรวมเป็น
+            ข้อความเดียว เช่น "ID2, ID5 หายไป 35 วินาที"
+        detected_ts: เวลาของเฟรมที่ตรวจพบ (ตาม clock) ใช้วัด latency ตรวจพบ -> ส่งสำเร็จ
+        missing_sec: เวลาที่ ID นี้หายไป (วินาที) - {seconds} ของข้อความรวมใช้ค่าที่นานที่สุดของกลุ่ม
+
+        คืนค่า:
+            bool: True = เข้าคิวแล้ว (อาจถูกรวม/พักก่อนส่ง), False = ถูกทิ้งเพราะ close() ไปแล้ว
+        """
+        now = self.clock.now()
+        if detected_ts is None:
+            detected_ts = now
+        with self.alert_lock:
+            if self._closed:
+                print(f" [AlertManager] ปิดแล้ว - ไม่ส่งการแจ้งเตือน: {custom_text or self.alert_text}")
+                return False
+            self.pending_alerts.append({
+                "snapshot": snapshot_frame,
+                "pre_buffer": pre_buffer,
+                "text": custom_text if custom_text else self.alert_text,
+                "template": message_template if display_id is not None else None,
+                "display_id": display_id,
+                "level": int(level or 0),
+                "missing_sec": missing_sec or 0.0,
+                "detected_ts": detected_ts,
+                # เวลาจริงของเครื่องที่ตรวจพบ (VideoClock: เวลาที่ประมวลผลเฟรมนั้น)
+                "detected_at": time.time() - max(0.0, now - detected_ts),
+            })
+        return True
+
+    @staticmethod
+    def _coalesce(alerts: list) -> list:
+        """
+        รวมการแจ้งเตือน template / ระดับเดียวกันเป็นข้อความเดียว -> [(level, text, detected_at)] ระดับสูงก่อน
 
-        try:
-            if self.send_message:
-                self.bot.send_message(f"{caption_text}")
-                print(" [AlertThread] เริ่มส่งข้อความ (non-blocking)")
-
-            if self.send_photo and snapshot_frame is not None:
-                try:
-                    cv2.imwrite(self.snapshot_path, snapshot_frame)
-                    if os.path.exists(self.snapshot_path) and os.path.getsize(self.snapshot_path) > 0:
-                        self.bot.send_media(self.snapshot_path, mode="photo", caption=caption_text)
-                        print(" [AlertThread] เริ่มส่งรูปภาพ (non-blocking)")
-                    else:
-                        print(" [AlertThread] ไฟล์รูปภาพไม่ถูกสร้าง หรือมีขนาดเป็น 0")
-                except Exception as e:
-                    print(f" [AlertThread] เกิดข้อผิดพลาดในการส่งรูปภาพ: {e}")
+        {seconds} ของข้อความรวม = missing_sec ที่นานที่สุดของกลุ่ม (ID เดียว = ข้อความล่าสุดของ ID นั้น)
+        """
+        groups = {}
+        for alert in alerts:
+            key = (alert["level"], alert["template"] or alert["text"])
+            group = groups.setdefault(key, {"ids": [], "text": alert["text"], "detected_at": alert["detected_at"],
+                                            "missing_sec": 0.0})
+            if alert["display_id"] is not None and alert["display_id"] not in group["ids"]:
+                group["ids"].append(alert["display_id"])
+            group["text"] = alert["text"]
+            group["detected_at"] = min(group["detected_at"], alert["detected_at"])
+            group["missing_sec"] = max(group["missing_sec"], alert.get("missing_sec") or 0.0)
+
+        messages = []
+        for (level, template), group in groups.items():
+            if len(group["ids"]) > 1:
+                text = template.format(id=", ID".join(str(i) for i in group["ids"]),
+                                       seconds=int(group["missing_sec"]))
+            else:
+                text = group["text"]
+            messages.append((level, text, group["detected_at"]))
+        messages.sort(key=lambda m: -m[0])
+        return messages
 
-        except Exception as e:
-            print(f" [AlertThread] เกิดข้อผิดพลาด: {e}")
+    def flush(self, force: bool = False) -> bool:
+        """
+        ส่งการแจ้งเตือนที่รออยู่ทั้งหมดเป็นชุดเดียว (ข้อความแยกตามระดับ + รูป 1 รูป + คลิป)
 
-    def trigger_alert(self, snapshot_frame: 'np.ndarray', pre_buffer: deque, custom_text: str = None) -> bool:
+        เหตุการณ์ใหม่ (พ้น cooldown แล้ว) พักไว้ coalesce_window_sec นับจากรายการแรกที่รอ ยกเว้นระดับ urgent_level
+        ขึ้นไป (ส่งทันที)
+        ภายใน cooldown เก็บไว้ส่งรวมกันเมื่อพ้น cooldown ยกเว้นมีระดับที่สูงกว่าครั้งล่าสุด (ยกระดับ -> ส่งทันที)
+        ข้อความเข้าช่อง text ของ TelegramBot ทันที รูป/คลิปตามไปทีหลังโดยไม่ขวางข้อความ
+        force: ส่งทันทีโดยไม่พัก / ไม่รอ cooldown (ใช้ตอนปิดโปรแกรม)
+        """
         with self.alert_lock:
-            current_time = time.time()
-            if (current_time - self.last_alert_time < self.alert_cooldown_sec) or self.recording:
+            if not self.pending_alerts:
+                return False
+            current_time = self.clock.now()
+            if current_time - self.last_alert_time >= self.alert_cooldown_sec:
+                self.last_alert_level = 0  # พ้น cooldown -> การแจ้งเตือนถัดไปเป็นเหตุการณ์ใหม่
+            top_level = max(alert["level"] for alert in self.pending_alerts)
+            if not force and self._holding(current_time, top_level):
                 return False
 
+            alerts, self.pending_alerts = self.pending_alerts, []
             self.last_alert_time = current_time
-            print(" !!! ตรวจพบ !!! -> เริ่มระบบแจ้งเตือนและบันทึกวิดีโอ")
-
-            text_to_send = custom_text if custom_text else self.alert_text
-            self.current_alert_caption = text_to_send
-
-            threading.Thread(
-                target=self._send_immediate_task,
-                args=(snapshot_frame.copy(), text_to_send),
+            self.last_alert_level = top_level
+            messages = self._coalesce(alerts)
+            priority = -top_level
+            detected_at = min(alert["detected_at"] for alert in alerts)
+            caption_text = "\n".join(text for _, text, _ in messages)
+            self.current_alert_caption = caption_text
+            print(f" !!! ตรวจพบ !!! -> แจ้งเตือน {len(alerts)} รายการ ({len(messages)} ข้อความ, ระดับสูงสุด {top_level})")
+
+            snapshot_frame = None
+            if self.send_photo:
+                # snapshot ของการแจ้งเตือนระดับสูงสุดล่าสุด (max คืนตัวแรกที่เท่ากัน -> ไล่จากท้าย)
+                snapshot_frame = max(reversed(alerts), key=lambda alert: alert["level"])["snapshot"]
+            if self.send_video and self.dvr is not None:
+                self._request_dvr_clip(current_time, caption_text, priority, detected_at)
+            start_clip = self.send_video and not self.recording
+            if self.send_video and self.recording:
+                self._extend_clip(caption_text, priority, detected_at)
+
+        # งานที่ช้าทำนอก alert_lock: ส่งข้อความ, วาด/เข้ารหัส snapshot, สร้าง encoder ของคลิป
+        if self.send_message:
+            for level, text, message_detected_at in messages:
+                self.bot.send_message(text, priority=-level, detected_at=message_detected_at)
+
+        if snapshot_frame is not None:
+            # ภาพที่วาดแล้ว copy ที่นี่ (Main Loop ยังวาด Status Panel ต่อ) ส่วน callable (โหมด headless)
+            # ถูกวาดใน AlertSender - Main Loop ไม่ต้องรอ
+            if not callable(snapshot_frame):
+                snapshot_frame = snapshot_frame.copy()
+            thread = threading.Thread(
+                target=self._send_snapshot_task,
+                args=(snapshot_frame, caption_text, priority, detected_at),
+                name="AlertSender",
                 daemon=True,
-            ).start()
-
-            if not self.send_video:
+            )
+            thread.start()
+            self._snapshot_threads = [t for t in self._snapshot_threads if t.is_alive()] + [thread]
+
+        if start_clip:
+            self._start_clip(alerts[-1]["pre_buffer"], current_time, caption_text, priority, detected_at)
+        return True
+
+    def _holding(self, current_time: float, top_level: int) -> bool:
+        """True = ยังไม่ส่งการแจ้งเตือนที่รออยู่ (เรียกภายใต้ alert_lock)"""
+        if self.last_alert_level > 0:
+            # อยู่ใน cooldown: ส่งเฉพาะเมื่อยกระดับ (ไม่ต้องพัก) ระดับเท่าเดิม/ต่ำกว่ารอพ้น cooldown
+            return top_level <= self.last_alert_level
+        if top_level >= self.urgent_level:
+            return False
+        oldest_ts = min(alert["detected_ts"] for alert in self.pending_alerts)
+        return current_time - oldest_ts < self.coalesce_window_sec
+
+    def close(self, timeout: float = 10.0):
+        """
+        ปิดโปรแกรม: ส่งการแจ้งเตือนที่ยังพักอยู่ทันที (ไม่รอ coalesce / cooldown) ปิดคลิปที่กำลังบันทึก
+        แล้วรอให้รูป/คลิปเข้าคิวของ TelegramBot (เรียกก่อน dvr.close และ bot.close)
+        """
+        with self.alert_lock:
+            self._closed = True
+        self.flush(force=True)
+        with self.alert_lock:
+            writer = self.clip_writer if self.recording else None
+            if writer is not None:
                 self.recording = False
-                self.recording_frames = []
-                self.frames_remaining = 0
-                return True
-
-            total_target = int(round(float(self.video_duration_sec) * float(self.video_fps)))
-            if total_target <= 0:
-                total_target = 1
-
-            # บังคับให้มี post-event frames อย่างน้อย 1 วินาที (กันคลิปนิ่งจาก prebuffer)
-            min_post_frames = int(round(float(self.video_fps) * 1.0))
-            if min_post_frames < 1:
-                min_post_frames = 1
-            if min_post_frames >= total_target:
-                min_post_frames = max(1, total_target - 1)
-
-            pre_frames = self._extract_frames_from_prebuffer(pre_buffer, current_time)
-            max_pre_frames = max(1, total_target - min_post_frames)
-            if len(pre_frames) > max_pre_frames:
-                pre_frames = pre_frames[-max_pre_frames:]
-
-            self.recording_frames = list(pre_frames)
-            self.frames_remaining = max(0, total_target - len(self.recording_frames))
-
-            self.recording = True
-            return True
\ No newline at end of file
+                writer.close()
+            threads = list(self._snapshot_threads)
+        if writer is not None:
+            writer.join(timeout)
+        for thread in threads:
+            thread.join(timeout)
+
+    def _post_event_frames(self, total_target: int) -> int:
+        # บังคับให้มี post-event frames อย่างน้อย 1 วินาที (กันคลิปนิ่งจาก prebuffer)
+        min_post_frames = int(round(float(self.video_fps) * 1.0))
+        if min_post_frames < 1:
+            min_post_frames = 1
+        if min_post_frames >= total_target:
+            min_post_frames = max(1, total_target - 1)
+        return min_post_frames
+
+    def _target_frames(self) -> int:
+        total_target = int(round(float(self.video_duration_sec) * float(self.video_fps)))
+        return total_target if total_target > 0 else 1
+
+    def _clip_bitrate_kbps(self, total_frames: int) -> float:
+        """bitrate ของคลิปจาก clip_bitrate_kbps และ clip_max_mb (เผื่อ container overhead 10%)"""
+        bitrate_kbps = float(self.clip_bitrate_kbps or 0)
+        if self.clip_max_mb and total_frames > 0:
+            duration_sec = total_frames / float(self.video_fps)
+            budget_kbps = self.clip_max_mb * 1024 * 1024 * 8 * 0.9 / duration_sec / 1000.0
+            bitrate_kbps = min(bitrate_kbps, budget_kbps) if bitrate_kbps else budget_kbps
+        return bitrate_kbps
+
+    def _extend_clip(self, caption_text: str, priority: int, detected_at: float):
+        """
+        การแจ้งเตือนระหว่างบันทึกคลิป: ใช้คลิปเดิม (แนบคำอธิบายเพิ่ม และต่อเวลาหลังเหตุการณ์
+        ให้ครบอย่างน้อย 1 วินาที แต่คลิปยาวไม่เกิน 2 เท่าของ video_duration_sec)
+        """
+        clip = self.clip_info
+        clip["captions"].append(caption_text)
+        clip["priority"] = min(clip["priority"], priority)
+        total_target = self._target_frames()
+        extra = min(self._post_event_frames(total_target) - self.frames_remaining,
+                    2 * total_target - self.clip_frames)
+        if extra > 0:
+            self.frames_remaining += extra
+            self.clip_frames += extra
+
+    def _start_clip(self, pre_buffer, current_time: float, caption_text: str, priority: int, detected_at: float):
+        total_target = self._target_frames()
+        min_post_frames = self._post_event_frames(total_target)
+
+        # เฟรม pre-event ถูก decode/เขียนใน encoder thread (ไม่บล็อก Main Loop)
+        pre_frames = self._select_prebuffer_frames(pre_buffer, current_time)
+        max_pre_frames = max(1, total_target - min_post_frames)
+        if len(pre_frames) > max_pre_frames:
+            pre_frames = pre_frames[-max_pre_frames:]
+        if not hasattr(pre_buffer, "entries"):
+            # deque[frame] ธรรมดา: copy ก่อน เพราะเฟรมอาจถูกแก้ไขภายหลัง
+            pre_frames = [self._materialize(f) for f in pre_frames]
+
+        # H.264 ผ่าน ffmpeg (คุม bitrate / ขนาดไฟล์) หรือ cv2.VideoWriter ด้วย video_codec เมื่อไม่มี ffmpeg
+        # encoder (ffmpeg Popen / VideoWriter) ถูกเปิดใน thread ของ writer เมื่อเขียนเฟรมแรก และสร้าง writer
+        # นอก alert_lock -> process_frame ของกล้องไม่ต้องรอ
+        # คำอธิบายของคลิปอ่านตอนปิดไฟล์ -> การแจ้งเตือนที่เกิดระหว่างบันทึกถูกแนบมาด้วย
+        clip = {"captions": [caption_text], "priority": priority, "detected_at": detected_at}
+        writer = StreamingClipWriter(
+            self._unique_clip_path(),
+            fps=float(self.video_fps),
+            codec=self.video_codec,
+            prelude=pre_frames,
+            timer=self.timer,
+            on_complete=lambda writer: self._on_clip_finished(
+                writer, "\n".join(clip["captions"]), clip["priority"], clip["detected_at"]),
+            max_width=self.clip_max_width,
+            bitrate_kbps=self._clip_bitrate_kbps(total_target),
+            ffmpeg_path=self.ffmpeg_path,
+            spool_max_bytes=self.spool_max_bytes,
+        )
+        with self.alert_lock:
+            self.clip_info = clip
+            self.clip_writer = writer
+            self.frames_remaining = max(0, total_target - len(pre_frames))
+            self.clip_frames = total_target
+            self.recording = self.frames_remaining > 0
+            if not self.recording:
+                writer.close()
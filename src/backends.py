@@ -0,0 +1,138 @@
+import os
+import shutil
+import cv2
+from ultralytics import YOLO
+from ultralytics.cfg import DEFAULT_CFG_DICT
+
+
+BACKENDS = ("pytorch", "onnx", "openvino")
+
+# ultralytics >= 8.4 ใช้ quantize=8 แทน int8=True
+_QUANTIZE_ARG = "quantize" if "quantize" in DEFAULT_CFG_DICT else "int8"
+_IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def _artifact_path(model_name: str, backend: str, imgsz: int, int8: bool, cache_dir: str) -> str:
+    """ชื่อไฟล์/โฟลเดอร์ที่ export แล้ว (ต้องลงท้ายด้วย .onnx / _openvino_model ให้ Ultralytics รู้จัก format)"""
+    stem = os.path.splitext(os.path.basename(model_name))[0]
+    name = f"{stem}_{imgsz}{'_int8' if int8 else ''}"
+    suffix = ".onnx" if backend == "onnx" else "_openvino_model"
+    return os.path.join(cache_dir, name + suffix)
+
+
+def _is_fresh(artifact: str, model_name: str) -> bool:
+    """artifact มีอยู่และไม่เก่ากว่าไฟล์โมเดลต้นฉบับ"""
+    if not os.path.exists(artifact):
+        return False
+    if os.path.exists(model_name):
+        return os.path.getmtime(artifact) >= os.path.getmtime(model_name)
+    return True
+
+
+def prepare_calibration_data(source: str, out_dir: str, num_images: int = 300) -> str:
+    """
+    สร้าง dataset สำหรับ INT8 calibration จากภาพของสระจริง
+
+    พารามิเตอร์:
+        source (str): คลิปวิดีโอ หรือโฟลเดอร์ภาพ (.jpg/.png).
+        out_dir (str): โฟลเดอร์ปลายทาง (images/ + data.yaml).
+        num_images (int): จำนวนภาพสูงสุด (สุ่มเฟรมกระจายทั่วคลิป).
+
+    คืนค่า:
+        str: path ของ data.yaml (ใช้เป็น data= ของ model.export)
+    """
+    images_dir = os.path.join(out_dir, "images")
+    os.makedirs(images_dir, exist_ok=True)
+
+    if os.path.isdir(source):
+        files = sorted(f for f in os.listdir(source) if f.lower().endswith(_IMAGE_EXTS))
+        step = max(1, len(files) // num_images)
+        for name in files[::step][:num_images]:
+            shutil.copy2(os.path.join(source, name), os.path.join(images_dir, name))
+    else:
+        cap = cv2.VideoCapture(source)
+        if not cap.isOpened():
+            raise RuntimeError(f"เปิดไฟล์สำหรับ calibration ไม่ได้: {source}")
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or num_images
+        step = max(1, total // num_images)
+        index = written = 0
+        while written < num_images:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            if index % step == 0:
+                cv2.imwrite(os.path.join(images_dir, f"calib_{written:05d}.jpg"), frame)
+                written += 1
+            index += 1
+        cap.release()
+
+    count = len(os.listdir(images_dir))
+    if count == 0:
+        raise RuntimeError(f"ไม่พบภาพสำหรับ calibration ใน {source}")
+
+    # ไม่มี label (ภาพพื้นหลัง) ก็ใช้ calibration ได้ - ต้องการเฉพาะการกระจายของ activation
+    data_yaml = os.path.join(out_dir, "data.yaml")
+    with open(data_yaml, "w", encoding="utf-8") as f:
+        f.write(f"path: {os.path.abspath(out_dir)}\ntrain: images\nval: images\nnames:\n  0: person\n")
+    print(f"📦 เตรียมภาพ calibration {count} ภาพ -> {out_dir}")
+    return data_yaml
+
+
+def load_detection_model(model_name: str,
+                         backend: str = "pytorch",
+                         int8: bool = False,
+                         calibration_source: str = None,
+                         imgsz: int = 640,
+                         cache_dir: str = "model_cache"):
+    """
+    โหลดโมเดลตาม backend - ONNX / OpenVINO ถูก export ครั้งแรกครั้งเดียวแล้ว cache ไว้บนดิสก์
+
+    โมเดลที่ได้เป็น YOLO เสมอ (predict() คืน Results แบบเดียวกัน) ส่วนอื่นของโปรแกรมจึงไม่ต้องเปลี่ยน
+
+    พารามิเตอร์:
+        model_name (str): โมเดล PyTorch ต้นฉบับ (เช่น "yolo11m.pt").
+        backend (str): "pytorch", "onnx" หรือ "openvino".
+        int8 (bool): quantize เป็น INT8 (ต้องมี calibration_source).
+        calibration_source (str): คลิป/โฟลเดอร์ภาพของสระสำหรับ INT8 calibration.
+        imgsz (int): ขนาด input ของโมเดลที่ export.
+        cache_dir (str): โฟลเดอร์เก็บโมเดลที่ export แล้ว.
+    """
+    backend = backend.lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"backend ไม่รองรับ: {backend} (รองรับ {', '.join(BACKENDS)})")
+    if backend == "pytorch":
+        if int8:
+            print("⚠️ INT8 ใช้ได้กับ backend onnx/openvino เท่านั้น - ใช้ PyTorch FP32")
+        return YOLO(model_name)
+
+    if int8 and backend == "onnx" and _QUANTIZE_ARG == "int8":
+        print("⚠️ Ultralytics เวอร์ชันนี้ไม่รองรับ INT8 สำหรับ ONNX - export เป็น FP32")
+        int8 = False
+    if int8 and not calibration_source:
+        raise ValueError("INT8 ต้องกำหนดคลิปหรือโฟลเดอร์ภาพสำหรับ calibration")
+
+    artifact = _artifact_path(model_name, backend, imgsz, int8, cache_dir)
+    if _is_fresh(artifact, model_name):
+        print(f"♻️ ใช้โมเดล {backend} ที่ export ไว้แล้ว: {artifact}")
+        return YOLO(artifact, task="detect")
+
+    os.makedirs(cache_dir, exist_ok=True)
+    export_args = {"format": backend, "imgsz": imgsz, "dynamic": True}
+    if int8:
+        calib_dir = os.path.join(cache_dir, "calibration_" + os.path.basename(artifact))
+        export_args["data"] = prepare_calibration_data(calibration_source, calib_dir)
+        export_args[_QUANTIZE_ARG] = 8 if _QUANTIZE_ARG == "quantize" else True
+
+    print(f"🔧 Export โมเดล {model_name} -> {backend}{' INT8' if int8 else ''} (ครั้งแรกเท่านั้น)...")
+    exported = YOLO(model_name).export(**export_args)
+    exported = str(exported).rstrip("/\\")
+
+    # ย้ายผล export (ซึ่งอยู่ข้างไฟล์ต้นฉบับ) เข้า cache
+    if os.path.abspath(exported) != os.path.abspath(artifact):
+        if os.path.isdir(artifact):
+            shutil.rmtree(artifact)
+        elif os.path.exists(artifact):
+            os.remove(artifact)
+        shutil.move(exported, artifact)
+    print(f"✅ Export สำเร็จ: {artifact}")
+    return YOLO(artifact, task="detect")
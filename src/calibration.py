@@ -0,0 +1,134 @@
+import os
+import json
+import time
+from datetime import datetime
+import numpy as np
+from .alert_manager import AlertManager
+from .camera_pipeline import CameraPipeline
+from .frame_buffer import CompressedFrameBuffer
+from .inference import BatchTracker
+from .zones import load_zones
+
+
+# ค่าที่ calibrate.py เขียนและ main() อ่านเป็นค่าเริ่มต้น (ตัวแปรใน .env ยังมีผลเหนือกว่า)
+CALIBRATION_KEYS = ("MODEL_NAME", "MODEL_IMGSZ", "INFERENCE_BACKEND")
+
+
+def load_calibration(path: str) -> dict:
+    """อ่านค่าที่ calibrate.py เลือกไว้ ({} เมื่อไม่มีไฟล์หรืออ่านไม่ได้)"""
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return {key: data["settings"][key] for key in CALIBRATION_KEYS if key in data.get("settings", {})}
+    except Exception as e:
+        print(f"⚠️ อ่าน {path} ไม่สำเร็จ: {e}")
+        return {}
+
+
+def save_calibration(path: str, settings: dict, report: dict):
+    data = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "settings": {key: settings[key] for key in CALIBRATION_KEYS if key in settings},
+        "report": report,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    print(f"✅ บันทึกผล calibration ลง {path}")
+
+
+def _calibration_camera(name: str, zones_file: str, annotate: bool, prebuffer: dict) -> CameraPipeline:
+    """CameraPipeline แบบเดียวกับ main() (pre-buffer / zone / state / annotation) แต่ไม่ส่ง Telegram"""
+    pool_zone, safe_zone = load_zones(zones_file) if zones_file else (None, None)
+    alert_manager = AlertManager(
+        bot_obj=None,
+        alert_text="calibration",
+        send_message=False,
+        send_photo=False,
+        send_video=False,
+        snapshot_path="",
+        video_path="",
+        video_duration_sec=3,
+        video_fps=30,
+        video_codec="mp4v",
+        alert_cooldown_sec=0,
+    )
+    return CameraPipeline(
+        name=name,
+        reader=None,
+        alert_manager=alert_manager,
+        bot_obj=None,
+        zones_file=zones_file or "",
+        pool_zone=pool_zone,
+        safe_zone=safe_zone,
+        video_buffer=CompressedFrameBuffer(**prebuffer),
+        missing_alert_sec=40,
+        repeat_alert_interval=10,
+        reidentify_distance_px=150,
+        reidentify_time_sec=60,
+        annotate=annotate,
+    )
+
+
+def measure_pipeline(model, device, imgsz: int, frames: list, cameras: int = 1, conf: float = 0.5,
+                     warmup: int = 3, iterations: int = 30, zones_file: str = None, annotate: bool = False,
+                     prebuffer: dict = None) -> dict:
+    """
+    วัดความเร็วแบบ end-to-end ต่อรอบของ Main Loop: detector + tracker แล้ว CameraPipeline.process ของทุกกล้อง
+    (เข้ารหัส pre-buffer, zone / state, annotation เมื่อ annotate, AlertManager.process_frame)
+
+    ทุกรอบส่งเฟรมของทุกกล้องเป็น batch เดียว (cameras เฟรม) เหมือน BatchTracker ใน main()
+    ทุกรอบรัน detector (ไม่ข้ามด้วย keyframe) และไม่รวมเวลาส่ง Telegram / เขียนคลิป (ทำใน thread แยก)
+
+    พารามิเตอร์:
+        zones_file (str): zones.json ของพื้นที่สระ (None = ติดตามทั้งเฟรม).
+        annotate (bool): วาดผลลัพธ์ทุกเฟรม (SHOW_VIDEO) หรือ headless.
+        prebuffer (dict): อาร์กิวเมนต์ของ CompressedFrameBuffer (None = ค่าเริ่มต้นของ main()).
+
+    คืนค่า:
+        dict: fps (ต่อกล้อง), latency_p50_ms, latency_p95_ms (ต่อ batch),
+            inference_p50_ms (detector + tracker อย่างเดียว), overhead_p50_ms (ส่วนที่เหลือของรอบ)
+    """
+    prebuffer = prebuffer or {"max_bytes": 64 * 1024 * 1024, "max_frames": 100}
+    detector = BatchTracker(model, device, conf, imgsz=imgsz)
+    pipelines = [_calibration_camera(f"CAM{i + 1}", zones_file, annotate, prebuffer) for i in range(cameras)]
+    keys = [cam.name for cam in pipelines]
+    latencies, inference = [], []
+    for index in range(warmup + iterations):
+        batch = [frames[(index * cameras + i) % len(frames)] for i in range(cameras)]
+        start = time.perf_counter()
+        ts = time.time()
+        results = detector.track(batch, keys, rois=[cam.inference_roi(frame) for cam, frame in zip(pipelines, batch)])
+        inference_end = time.perf_counter()
+        for cam, frame, result in zip(pipelines, batch, results):
+            cam.process(frame, ts, result)
+        if index >= warmup:
+            latencies.append(time.perf_counter() - start)
+            inference.append(inference_end - start)
+    latencies = np.array(latencies)
+    inference = np.array(inference)
+    return {
+        "fps": float(len(latencies) / latencies.sum()) if latencies.sum() > 0 else 0.0,
+        "latency_p50_ms": float(np.percentile(latencies, 50) * 1000.0),
+        "latency_p95_ms": float(np.percentile(latencies, 95) * 1000.0),
+        "inference_p50_ms": float(np.percentile(inference, 50) * 1000.0),
+        "overhead_p50_ms": float(np.percentile(latencies - inference, 50) * 1000.0),
+    }
+
+
+def choose_configuration(results: list, target_fps: float, max_latency_ms: float) -> tuple:
+    """
+    เลือกค่าที่ผ่านเป้าหมาย (fps >= target_fps และ p95 latency <= max_latency_ms)
+
+    results: [{"model": ..., "imgsz": ..., "size_rank": ..., "fps": ..., "latency_p95_ms": ...}]
+    ในบรรดาค่าที่ผ่าน เลือกโมเดลใหญ่ที่สุดแล้ว imgsz ใหญ่ที่สุด (แม่นที่สุดที่ยังรันทัน)
+    ถ้าไม่มีค่าใดผ่าน คืนค่าที่เร็วที่สุด
+
+    คืนค่า:
+        (result ที่เลือก, ผ่านเป้าหมายหรือไม่)
+    """
+    passing = [r for r in results if r["fps"] >= target_fps and r["latency_p95_ms"] <= max_latency_ms]
+    if passing:
+        return max(passing, key=lambda r: (r["size_rank"], r["imgsz"], r["fps"])), True
+    return max(results, key=lambda r: r["fps"]), False
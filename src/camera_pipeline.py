@@ -0,0 +1,675 @@
+import time
+import cv2
+import numpy as np
+from .zones import ZoneMask, zones_bounding_rect
+from .overlay import build_zone_layer, build_panel_layer
+from .detections import extract_detections
+from .tracking_state import PersonState, SubmergedRegistry
+from .motion import ConstantVelocityModel
+from .stage_timer import timed
+from .clock import WallClock
+
+
+# --- ระบบแจ้งเตือนแบบขั้นบันได (Tiered Missing Alerts) ---
+MISSING_ALERT_TIERS = [
+    {"seconds": 20, "message": "🏊 ID{id} ดำน้ำได้ 20 วินาทีแล้ว", "level": 1},
+    {"seconds": 25, "message": "🏊 ID{id} ดำน้ำได้ 25 วินาทีแล้ว", "level": 2},
+    {"seconds": 30, "message": "⚠️ ID{id} มีโอกาสเสี่ยงจมน้ำได้ 30 วินาทีแล้ว ให้รีบทำการตรวจสอบ", "level": 3},
+    {"seconds": 35, "message": "🚨 ID{id} มีโอกาสเสี่ยงจมน้ำได้ 35 วินาทีแล้ว ให้รีบทำการตรวจสอบโดยด่วน", "level": 4},
+    {"seconds": 40, "message": "🆘 ID{id} เสี่ยงจมน้ำสูงได้ 40 วินาทีแล้ว ให้รีบทำการตรวจสอบโดยด่วน", "level": 5},
+]
+
+# สีสำหรับแสดงผล
+COLORS = {
+    "normal": (0, 255, 0),        # เขียว - ปกติ
+    "outside": (128, 128, 128),   # เทา - นอกพื้นที่สระ
+    "missing": (0, 0, 255),       # แดง - หายไป/ดำน้ำ
+}
+
+
+class CameraPipeline:
+    """
+    สถานะและตรรกะการติดตามของกล้องหนึ่งตัว.
+
+    แต่ละกล้องมี zones, person_state, submerged_persons, video_buffer และ AlertManager
+    ของตัวเอง ส่วน inference ทำร่วมกันทุกกล้องใน Main Loop แล้วส่งผลลัพธ์มาที่ process()
+    """
+
+    def __init__(self,
+                 name: str,
+                 reader,
+                 alert_manager,
+                 bot_obj,
+                 zones_file: str,
+                 pool_zone,
+                 safe_zone,
+                 video_buffer,
+                 missing_alert_sec: float,
+                 repeat_alert_interval: float,
+                 reidentify_distance_px: float,
+                 reidentify_time_sec: float,
+                 message_prefix: str = "",
+                 annotate: bool = True,
+                 roi_margin_px: int = None,
+                 timer=None,
+                 clock=None,
+                 event_log=None,
+                 journal=None,
+                 dvr=None):
+        """
+        พารามิเตอร์:
+            name (str): ชื่อกล้อง (ใช้ในหน้าต่างแสดงผลและ log).
+            reader (LatestFrameReader): ตัวอ่านเฟรมของกล้องนี้.
+            alert_manager (AlertManager): ตัวจัดการแจ้งเตือนของกล้องนี้.
+            bot_obj (TelegramBot): ใช้ส่งข้อความยืนยันการช่วยเหลือ.
+            zones_file (str): ไฟล์ zones ของกล้องนี้.
+            pool_zone, safe_zone: polygon ของพื้นที่สระ/พื้นที่ปลอดภัย.
+            video_buffer (CompressedFrameBuffer): pre-event buffer ของกล้องนี้ (รับ (ts, frame)).
+            missing_alert_sec (float): เวลาหายไปก่อนนับว่าหายไปในสระ (วินาที).
+            repeat_alert_interval (float): ระยะห่างการแจ้งเตือนซ้ำหลัง 40 วินาที.
+            reidentify_distance_px (float): ระยะทางที่ถือว่าใกล้เคียง (พิกเซล).
+            reidentify_time_sec (float): เวลาที่รอ re-identify (วินาที).
+            message_prefix (str): ข้อความนำหน้าการแจ้งเตือน (เช่น "[CAM2] ").
+            annotate (bool): วาดผลลัพธ์ทุกเฟรม (False = headless: เก็บเฉพาะรายการกล่อง/สถานะ
+                และวาดภาพเมื่อการแจ้งเตือนต้องใช้ snapshot เท่านั้น).
+            roi_margin_px (int): ส่งเข้า detector เฉพาะกรอบที่ครอบพื้นที่ทั้งหมด + ขอบนี้ (None = ทั้งเฟรม).
+            timer (StageTimer): วัดเวลาของ prebuffer_encode / annotation / alert_trigger /
+                alert_process_frame (None = ไม่วัด).
+            clock (WallClock / VideoClock): นาฬิกาของกล้องนี้ - ต้องเป็นตัวเดียวกับของ reader และ AlertManager
+                (None = เวลาจริงของเครื่อง).
+            event_log (AlertEventLog): บันทึกทุกการแจ้งเตือนที่เกิดขึ้น (None = ไม่บันทึก).
+            journal (EventJournal): บันทึก track / การเปลี่ยนพื้นที่ / submerge / re-identify / แจ้งเตือน
+                (None = ไม่บันทึก).
+            dvr (SegmentRecorder): บันทึกภาพต่อเนื่องลงดิสก์ (None = ไม่บันทึก).
+        """
+        self.name = name
+        self.reader = reader
+        self.alert_manager = alert_manager
+        self.bot = bot_obj
+        self.zones_file = zones_file
+        self.pool_zone = pool_zone
+        self.safe_zone = safe_zone
+        self.zone_mask = None  # สร้างเมื่อรู้ขนาดเฟรม และสร้างใหม่เมื่อพื้นที่เปลี่ยน
+        self.zone_layer = None  # overlay ของพื้นที่ที่ render ไว้แล้ว (สร้างใหม่เมื่อพื้นที่/ขนาดเฟรมเปลี่ยน)
+        self.roi_margin_px = roi_margin_px
+        self._roi = None  # (frame_shape, กรอบ) - คำนวณใหม่เมื่อพื้นที่/ขนาดเฟรมเปลี่ยน
+        self.panel_layer = None
+        self.missing_alert_sec = missing_alert_sec
+        self.repeat_alert_interval = repeat_alert_interval
+        self.reidentify_distance_px = reidentify_distance_px
+        self.reidentify_time_sec = reidentify_time_sec
+        self.message_prefix = message_prefix
+        self.annotate = annotate
+        self.timer = timer
+        self.clock = clock or WallClock()
+        self.event_log = event_log
+        self.journal = journal
+        self.dvr = dvr
+        self.journal_zones = {}  # display_id -> สถานะพื้นที่ล่าสุดที่บันทึกใน journal
+        self.last_marks = []  # กล่อง/สถานะของเฟรมล่าสุด [(status, (x1, y1, x2, y2), center_x, display_id, conf, track_id)]
+
+        # --- ตัวแปรสำหรับ Tracking ---
+        self.video_buffer = video_buffer
+        self.track_id_to_display = {}  # แปลง track_id -> ID1, ID2, ...
+        self.next_display_id = 1
+        self.person_state = {}  # track_id -> PersonState
+
+        # --- ระบบจำกัด ID ตามจำนวนคนทั้งหมด ---
+        # จำนวน ID สูงสุด = จำนวนคนที่เคยเห็นพร้อมกัน (Pool + Safe)
+        self.max_total_count = 0  # จำนวนคนสูงสุดที่เคยเห็นทั้งหมด
+        self.max_pool_count = 0  # จำนวนคนสูงสุดที่เคยเห็นในสระ
+        self.active_pool_ids = set()  # ID ที่กำลังอยู่ในสระ
+        self.active_safe_ids = set()  # ID ที่กำลังอยู่ใน Safe Zone
+        self.ids_entered_from_safe = set()  # ID ที่เข้ามาจาก Safe Zone (สามารถสร้าง ID ใหม่ได้)
+
+        # --- Re-identification: ติดตามคนที่ดำน้ำแล้วโผล่ขึ้นมา ---
+        self.submerged_persons = SubmergedRegistry()  # display_id -> ตำแหน่ง/เวลา/สถานะ ณ ตอนที่หายไป
+
+        # --- นับจำนวนคนที่หายไปใน Pool Zone ---
+        self.missing_in_pool_count = 0  # จำนวนคนที่หายไปใน Pool Zone (อาจจมน้ำ)
+        self.exited_to_safe_ids = set()  # ID ที่ออกจาก pool ไป safe zone (ไม่นับว่าหายไป)
+        self.last_repeat_alert = 0  # รอบแจ้งเตือนซ้ำล่าสุดของกล้อง (ทุก ID ระดับ 5 ซ้ำพร้อมกัน -> รวมเป็นข้อความเดียว)
+
+        # --- Keyframe detection: ทำนายตำแหน่งระหว่างเฟรมที่ไม่ได้รัน detector ---
+        self.motion = ConstantVelocityModel()
+        self.keyframe_marks = []  # marks ของ keyframe ล่าสุด (ต้นแบบของกล่องที่ทำนาย)
+        self.keyframe_seen_track_ids = set()  # track ที่เห็นใน keyframe ล่าสุด
+
+        # --- สถิติ throughput ---
+        self.frames_processed = 0
+        self.frames_predicted = 0
+        self.started_at = self.clock.now()
+
+    def set_zones(self, pool_zone, safe_zone):
+        self.pool_zone = pool_zone
+        self.safe_zone = safe_zone
+        self.zone_mask = None
+        self.zone_layer = None
+        self._roi = None
+
+    def _get_zone_mask(self, frame) -> ZoneMask:
+        if self.zone_mask is None or not self.zone_mask.matches(frame.shape):
+            self.zone_mask = ZoneMask({"pool": self.pool_zone, "safe": self.safe_zone}, frame.shape)
+        return self.zone_mask
+
+    def _get_zone_layer(self, frame):
+        if self.zone_layer is None or not self.zone_layer.matches(frame.shape):
+            self.zone_layer = build_zone_layer(frame.shape, self.pool_zone, self.safe_zone)
+        return self.zone_layer
+
+    def inference_roi(self, frame):
+        """กรอบ (x0, y0, x1, y1) ที่ส่งเข้า detector หรือ None (ทั้งเฟรม / ไม่ได้เปิดใช้ / ไม่มีพื้นที่)"""
+        if self.roi_margin_px is None:
+            return None
+        shape = frame.shape[:2]
+        if self._roi is None or self._roi[0] != shape:
+            roi = zones_bounding_rect(shape, (self.pool_zone, self.safe_zone), self.roi_margin_px)
+            if roi == (0, 0, shape[1], shape[0]):
+                roi = None  # ครอบทั้งเฟรมอยู่แล้ว ไม่ต้อง crop
+            self._roi = (shape, roi)
+        return self._roi[1]
+
+    def _get_panel_layer(self, frame):
+        if self.panel_layer is None or not self.panel_layer.matches(frame.shape):
+            self.panel_layer = build_panel_layer(frame.shape)
+        return self.panel_layer
+
+    def _classify_points(self, zone_mask: ZoneMask, points):
+        """
+        ตรวจสอบพื้นที่ของทุกจุดในครั้งเดียว
+
+        คืนค่า:
+            (in_pool, in_safe) - bool array (ไม่มีพื้นที่สระ = ทุกจุดอยู่ในสระ)
+        """
+        flags = zone_mask.lookup(points)
+        if self.pool_zone:
+            in_pool = (flags & zone_mask.bits["pool"]) != 0
+        else:
+            in_pool = np.ones(len(flags), dtype=bool)
+        if self.safe_zone:
+            in_safe = (flags & zone_mask.bits["safe"]) != 0
+        else:
+            in_safe = np.zeros(len(flags), dtype=bool)
+        return in_pool, in_safe
+
+    def fps(self) -> float:
+        elapsed = self.clock.now() - self.started_at
+        return self.frames_processed / elapsed if elapsed > 0 else 0.0
+
+    def _trigger_alert(self, annotated_frame, ts, message_template, display_id=None, level=None, missing_sec=None):
+        """
+        annotated_frame เป็นภาพที่วาดแล้ว หรือ callable ที่วาดภาพเมื่อต้องใช้ snapshot จริง (headless)
+        message_template มี {id} (และ {seconds} = เวลาที่หายไป) - AlertManager รวมหลาย ID ของ template เดียวกัน
+        เป็นข้อความเดียว โดยใช้ {seconds} ที่นานที่สุดของกลุ่ม
+        """
+        msg = message_template.format(id=display_id, seconds=int(missing_sec or 0))
+        with timed(self.timer, "alert_trigger"):
+            fired = self.alert_manager.trigger_alert(
+                annotated_frame, self.video_buffer,
+                custom_text=f"{self.message_prefix}{msg}",
+                level=level or 0,
+                display_id=display_id,
+                message_template=f"{self.message_prefix}{message_template}",
+                detected_ts=ts,
+                missing_sec=missing_sec,
+            )
+        if self.event_log is not None:
+            self.event_log.record(self.name, self.clock.now(), msg, display_id=display_id, level=level, fired=fired)
+        self._journal("alert", ts, display_id, level=level, message=msg)
+
+    def _journal(self, kind: str, ts: float, display_id=None, level=None, **data):
+        if self.journal is not None:
+            self.journal.record(kind, ts, camera=self.name, display_id=display_id, level=level, **data)
+
+    def _journal_frame(self, ts, marks):
+        """สรุปกล่องของเฟรมนี้ + การเปลี่ยนพื้นที่ของแต่ละ ID ลง journal"""
+        tracks = []
+        zones = {}
+        for status, (x1, y1, x2, y2), _, display_id, conf_score, _ in marks:
+            if display_id is None:
+                continue
+            tracks.append([display_id, status, int(x1), int(y1), int(x2), int(y2), round(conf_score, 3)])
+            zones[display_id] = status
+        self.journal.record("track", ts, camera=self.name, tracks=tracks)
+        for display_id, status in zones.items():
+            previous = self.journal_zones.get(display_id)
+            if previous != status:
+                self._journal("zone", ts, display_id, from_zone=previous, to_zone=status)
+        self.journal_zones.update(zones)
+
+    def render_annotations(self, frame, marks):
+        """วาดพื้นที่และกล่องของทุกคนลงบนสำเนาของเฟรม (ไม่รวม Status Panel)"""
+        annotated_frame = frame.copy()
+
+        # --- วาดพื้นที่ (Zones) --- ผสม overlay ที่ render ไว้แล้ว เฉพาะบริเวณของพื้นที่
+        self._get_zone_layer(annotated_frame).apply(annotated_frame)
+
+        for status, (x1, y1, x2, y2), center_x, display_id, conf_score, _ in marks:
+            if status == "UNKNOWN":
+                # มีคนครบแล้ว แต่ไม่มีใครหายไป (รอ re-identify)
+                cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), (0, 255, 255), 2)
+                cv2.putText(annotated_frame, "UNKNOWN (waiting re-id)", (x1, max(0, y1 - 10)),
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 2)
+            elif status == "SAFE":
+                # วาด bounding box สีเขียวเข้ม (Safe Zone)
+                safe_color = (0, 200, 100)  # สีเขียวเข้ม
+                cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), safe_color, 2)
+                cv2.circle(annotated_frame, (center_x, y1), 8, safe_color, -1)
+                cv2.putText(annotated_frame, f"ID{display_id} SAFE", (x1, max(0, y1 - 10)),
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.6, safe_color, 2)
+            elif status == "OUTSIDE":
+                # วาด bounding box สีเทา (นอกพื้นที่)
+                cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), COLORS["outside"], 2)
+                cv2.putText(annotated_frame, f"ID{display_id} OUTSIDE", (x1, max(0, y1 - 10)),
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.6, COLORS["outside"], 2)
+            else:
+                # คนในสระปกติ
+                color = COLORS["normal"]
+
+                # วาด bounding box
+                cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), color, 2)
+
+                # วาด ID บนศีรษะ
+                cv2.circle(annotated_frame, (center_x, y1), 8, color, -1)
+                label = f"ID{display_id} {status} {conf_score:.0%}"
+                cv2.putText(annotated_frame, label, (x1, max(0, y1 - 10)),
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+        return annotated_frame
+
+    def process(self, frame, ts, result):
+        """
+        ประมวลผลผลลัพธ์การติดตามของเฟรมหนึ่ง (zone / re-id / tiered alerts) และวาดผลลัพธ์
+
+        พารามิเตอร์:
+            frame (np.ndarray): เฟรมดิบจากกล้อง.
+            ts (float): เวลาที่อ่านเฟรมได้.
+            result: ผลลัพธ์ของ YOLO สำหรับเฟรมนี้ (หรือ None).
+
+        คืนค่า:
+            np.ndarray: เฟรมที่วาดผลลัพธ์แล้ว (โหมด headless คืนเฟรมดิบ)
+        """
+        pool_zone, safe_zone = self.pool_zone, self.safe_zone
+        person_state = self.person_state
+        submerged_persons = self.submerged_persons
+        track_id_to_display = self.track_id_to_display
+
+        # buffer เข้ารหัส/คัดลอกเฟรมเอง จึงไม่ต้อง frame.copy()
+        with timed(self.timer, "prebuffer_encode"):
+            self.video_buffer.append((ts, frame))
+        if self.dvr is not None:
+            self.dvr.append(ts, frame)
+        self.clock.advance(ts)
+
+        # กล่อง/สถานะที่ต้องวาดของเฟรมนี้ (วาดทีหลังใน render_annotations)
+        marks = []
+        seen_track_ids = set()
+
+        # รีเซ็ต active IDs สำหรับเฟรมนี้
+        current_frame_pool_ids = set()
+        current_frame_safe_ids = set()
+
+        zone_mask = self._get_zone_mask(frame)
+
+        # --- ประมวลผลผลลัพธ์ ---
+        # ดึง xyxy / conf / id ออกจาก tensor ครั้งเดียวต่อเฟรม (ตัดกล่องที่ไม่มี track id ออก)
+        detections = extract_detections(result).tracked()
+        self.motion.update(detections.track_ids, detections.xyxy, ts)
+
+        # --- ตรวจสอบว่าอยู่ในพื้นที่ไหน (ก่อน assign ID) - ทุกกล่องในครั้งเดียว ---
+        boxes_in_pool, boxes_in_safe = self._classify_points(zone_mask, detections.centers)
+
+        # --- Re-identification: จับคู่คนใหม่ใน Pool Zone ทุกคนกับคนที่หายไปในครั้งเดียว ---
+        reid_matches = {}
+        if len(submerged_persons):
+            is_new = np.fromiter((tid not in track_id_to_display for tid in detections.track_ids.tolist()),
+                                 dtype=bool, count=len(detections))
+            new_in_pool = np.flatnonzero(is_new & boxes_in_pool & ~boxes_in_safe)
+            for row, sub_display_id, dist in submerged_persons.match(
+                    detections.centers[new_in_pool], ts, self.reidentify_time_sec):
+                reid_matches[int(new_in_pool[row])] = (sub_display_id, dist)
+
+        for box_index, ((x1, y1, x2, y2), (center_x, center_y), conf_score, track_id, in_pool, in_safe) in enumerate(zip(
+                detections.xyxy.tolist(), detections.centers.tolist(), detections.conf.tolist(),
+                detections.track_ids.tolist(), boxes_in_pool.tolist(), boxes_in_safe.tolist())):
+            current_pos = (center_x, center_y)
+
+            # --- Re-identification & ID Assignment ---
+            reidentified_display_id = None
+            is_new_from_safe = False
+
+            if track_id not in track_id_to_display:
+                # === กรณี 1: คนใหม่โผล่ใน Pool Zone โดยตรง ===
+                if in_pool and not in_safe:
+                    # ต้อง Re-identify เป็น ID ที่หายไปก่อนหน้า (ถ้ามี) - ใช้ผลการจับคู่ของทั้งเฟรม
+                    best_match_id, best_match_dist = reid_matches.get(box_index, (None, 0.0))
+                    sub_state = submerged_persons.pop(best_match_id) if best_match_id is not None else None
+
+                    # ถ้ามีคนหายไปอยู่ → บังคับ re-identify (ไม่สร้าง ID ใหม่)
+                    if sub_state is not None:
+                        reidentified_display_id = best_match_id
+                        # กู้คืนสถานะเดิม
+                        state = sub_state.copy()
+                        state.last_seen = ts
+                        state.last_position = current_pos
+                        state.counted_as_missing = False
+                        person_state[track_id] = state
+                        # ลดจำนวนคนหายไป
+                        if self.missing_in_pool_count > 0:
+                            self.missing_in_pool_count -= 1
+                        print(f"🔄 [{self.name}] Re-identified: ID{best_match_id} โผล่ขึ้นมาใน Pool Zone (dist={best_match_dist:.1f}px)")
+                        self._journal("reidentified", ts, best_match_id, distance_px=round(best_match_dist, 1))
+                        track_id_to_display[track_id] = reidentified_display_id
+                    else:
+                        # ไม่มีคนหายไป → สร้าง ID ใหม่ได้ถ้าจำนวนคนเพิ่มขึ้น
+                        # ตรวจสอบจำนวนคนปัจจุบัน (รวม Pool + Safe)
+                        current_total = len(current_frame_pool_ids) + len(current_frame_safe_ids)
+                        if self.max_total_count == 0 or current_total < self.max_total_count or self.next_display_id <= self.max_total_count:
+                            track_id_to_display[track_id] = self.next_display_id
+                            print(f"👤 [{self.name}] คนใหม่ใน Pool Zone: ID{self.next_display_id}")
+                            self.next_display_id += 1
+                        else:
+                            # มีคนครบแล้ว แต่ไม่มีใครหายไป → ข้ามคนนี้
+                            marks.append(("UNKNOWN", (x1, y1, x2, y2), center_x, None, conf_score, track_id))
+                            continue
+
+                # === กรณี 2: คนใหม่เข้ามาจาก Safe Zone ===
+                elif in_safe:
+                    # สามารถสร้าง ID ใหม่ได้
+                    track_id_to_display[track_id] = self.next_display_id
+                    self.ids_entered_from_safe.add(self.next_display_id)
+                    print(f"🚶 [{self.name}] คนใหม่เข้ามาจาก Safe Zone: ID{self.next_display_id}")
+                    self.next_display_id += 1
+                    is_new_from_safe = True
+
+                # === กรณี 3: นอกพื้นที่ทั้งหมด ===
+                else:
+                    track_id_to_display[track_id] = self.next_display_id
+                    self.next_display_id += 1
+
+            display_id = track_id_to_display[track_id]
+            seen_track_ids.add(track_id)
+
+            # ถ้าอยู่ในพื้นที่ปลอดภัย = ติดแท็ก ID แต่ไม่ติดตามความเสี่ยง
+            if in_safe:
+                # บันทึกว่า ID นี้ออกจาก Pool ไป Safe Zone (ไม่นับว่าหายไป)
+                self.exited_to_safe_ids.add(display_id)
+                current_frame_safe_ids.add(display_id)  # เพิ่มเข้า Safe Zone ในเฟรมนี้
+                # ลบออกจาก submerged_persons ถ้ามี (เพราะโผล่ขึ้นมาแล้ว)
+                if submerged_persons.pop(display_id) is not None:
+                    if self.missing_in_pool_count > 0:
+                        self.missing_in_pool_count -= 1
+                marks.append(("SAFE", (x1, y1, x2, y2), center_x, display_id, conf_score, track_id))
+                continue
+
+            # ถ้าไม่อยู่ในพื้นที่สระ (และมีการกำหนดพื้นที่สระ) = ไม่ติดตาม
+            if not in_pool and pool_zone:
+                self.active_pool_ids.discard(display_id)
+                marks.append(("OUTSIDE", (x1, y1, x2, y2), center_x, display_id, conf_score, track_id))
+                continue
+
+            # === อยู่ในพื้นที่สระว่ายน้ำ - เปิดการติดตาม ===
+
+            # เพิ่ม ID เข้า current_frame_pool_ids
+            current_frame_pool_ids.add(display_id)
+
+            # สร้างหรืออัพเดทสถานะ
+            state = person_state.get(track_id)
+            if state is None:
+                state = person_state[track_id] = PersonState(display_id, ts, current_pos)
+
+            # อัพเดทสถานะ - คนโผล่ขึ้นมาแล้ว รีเซ็ตทุกอย่าง
+            state.mark_seen(ts, current_pos)
+
+            # label - คนในสระปกติ
+            marks.append(("IN POOL", (x1, y1, x2, y2), center_x, display_id, conf_score, track_id))
+
+        self.last_marks = self.keyframe_marks = marks
+        self.keyframe_seen_track_ids = seen_track_ids
+        if self.journal is not None:
+            with timed(self.timer, "journal"):
+                self._journal_frame(ts, marks)
+        with timed(self.timer, "annotation"):
+            annotated_frame = self._annotated_frame(frame, marks)
+
+        # --- อัปเดต active IDs หลังจบ loop ---
+        self.active_pool_ids = current_frame_pool_ids.copy()
+        self.active_safe_ids = current_frame_safe_ids.copy()
+        active_pool_ids, active_safe_ids = self.active_pool_ids, self.active_safe_ids
+
+        # อัปเดตจำนวนคนทั้งหมดและในสระ
+        total_visible = len(active_pool_ids) + len(active_safe_ids)
+        if total_visible > self.max_total_count:
+            self.max_total_count = total_visible
+            print(f"📊 [{self.name}] อัปเดตจำนวนคนทั้งหมดสูงสุด: {self.max_total_count} คน (Pool: {len(active_pool_ids)}, Safe: {len(active_safe_ids)})")
+        if len(active_pool_ids) > self.max_pool_count:
+            self.max_pool_count = len(active_pool_ids)
+            print(f"📊 [{self.name}] อัปเดตจำนวนคนในสระสูงสุด: {self.max_pool_count} คน")
+
+        self._check_missing(ts, seen_track_ids, zone_mask, annotated_frame)
+
+        # --- Alert Manager ---
+        with timed(self.timer, "alert_process_frame"):
+            self.alert_manager.process_frame(frame)
+
+        self.frames_processed += 1
+        if not self.annotate:
+            return frame
+        with timed(self.timer, "annotation"):
+            self.draw_status_panel(annotated_frame, ts)
+        return annotated_frame
+
+    def process_predicted(self, frame, ts):
+        """
+        ประมวลผลเฟรมที่ไม่ได้รัน detector (ระหว่าง keyframe)
+
+        กล่องของแต่ละ track ถูกเลื่อนตาม motion model จาก keyframe ล่าสุดเพื่อการแสดงผลเท่านั้น
+        เฟรมที่ทำนายไม่นับว่า "เห็น" ใคร (ไม่แตะ last_seen / สถานะ) ส่วนคนที่หายไปตั้งแต่ keyframe
+        ล่าสุดยังถูกตรวจเวลาและแจ้งเตือนตามเวลาจริงของเฟรมนี้
+
+        คืนค่า:
+            np.ndarray: เฟรมที่วาดผลลัพธ์แล้ว (โหมด headless คืนเฟรมดิบ)
+        """
+        with timed(self.timer, "prebuffer_encode"):
+            self.video_buffer.append((ts, frame))
+        if self.dvr is not None:
+            self.dvr.append(ts, frame)
+        self.clock.advance(ts)
+
+        marks = self.keyframe_marks
+        if marks:
+            predicted = self.motion.predict([mark[5] for mark in marks], ts)
+            height, width = frame.shape[:2]
+            predicted_marks = []
+            for mark, box in zip(marks, predicted.tolist()):
+                if box[0] == box[0]:  # ไม่ใช่ NaN (track ที่ motion model รู้จัก)
+                    x1, y1, x2, y2 = (int(v) for v in box)
+                    x1, x2 = min(max(x1, 0), width - 1), min(max(x2, 0), width - 1)
+                    y1, y2 = min(max(y1, 0), height - 1), min(max(y2, 0), height - 1)
+                    mark = (mark[0], (x1, y1, x2, y2), (x1 + x2) // 2) + mark[3:]
+                predicted_marks.append(mark)
+            marks = predicted_marks
+        self.last_marks = marks
+        with timed(self.timer, "annotation"):
+            annotated_frame = self._annotated_frame(frame, marks)
+
+        self._check_missing(ts, self.keyframe_seen_track_ids, self._get_zone_mask(frame), annotated_frame)
+
+        # --- Alert Manager ---
+        with timed(self.timer, "alert_process_frame"):
+            self.alert_manager.process_frame(frame)
+
+        self.frames_processed += 1
+        self.frames_predicted += 1
+        if not self.annotate:
+            return frame
+        with timed(self.timer, "annotation"):
+            self.draw_status_panel(annotated_frame, ts)
+        return annotated_frame
+
+    def _annotated_frame(self, frame, marks):
+        """ภาพที่วาดแล้ว หรือ (headless) callable ที่วาดเมื่อ AlertManager ต้องใช้ snapshot (ครั้งเดียวต่อเฟรม)"""
+        if self.annotate:
+            return self.render_annotations(frame, marks)
+
+        rendered = []
+
+        def annotated_frame():
+            if not rendered:
+                rendered.append(self.render_annotations(frame, marks))
+            return rendered[0]
+        return annotated_frame
+
+    def _check_missing(self, ts, seen_track_ids, zone_mask, annotated_frame):
+        """ตรวจสอบคนที่หายไป (ไม่อยู่ใน seen_track_ids) - re-id, นับจำนวน และแจ้งเตือนแบบขั้นบันได"""
+        person_state = self.person_state
+        submerged_persons = self.submerged_persons
+
+        missing_items = [(tid, state) for tid, state in person_state.items() if tid not in seen_track_ids]
+        # ตรวจสอบตำแหน่งล่าสุดของทุกคนที่หายไปในครั้งเดียว (ไม่มีตำแหน่ง = ถือว่าอยู่ในสระ)
+        last_positions = [state.last_position or (-1, -1) for _, state in missing_items]
+        missing_in_pool, _ = self._classify_points(zone_mask, last_positions)
+        repeat_due = ts - self.last_repeat_alert >= self.repeat_alert_interval
+        repeated = False
+
+        for missing_index, (tid, state) in enumerate(missing_items):
+            time_missing = ts - state.last_seen
+            display_id = state.display_id
+            last_pos = state.last_position
+
+            # ตรวจสอบว่าหายไปใน Pool Zone หรือไม่ (ไม่ใช่ออกไป Safe Zone)
+            was_in_pool = bool(missing_in_pool[missing_index]) if last_pos else True
+            exited_safely = display_id in self.exited_to_safe_ids
+
+            # --- บันทึกลง submerged_persons สำหรับ Re-identification ---
+            if was_in_pool and not exited_safely and display_id not in submerged_persons:
+                if time_missing >= 1.0 and not state.submerged_logged:  # หายไปอย่างน้อย 1 วินาที
+                    submerged_persons.add(display_id, last_pos, state.last_seen, state.copy())
+                    state.submerged_logged = True  # ป้องกัน print ซ้ำ
+                    print(f" [{self.name}] ID{display_id} หายไปใน Pool Zone (อาจดำน้ำ) - รอ re-identify")
+                    self._journal("submerged", ts, display_id, last_seen=state.last_seen, position=last_pos)
+
+            # --- นับจำนวนคนที่หายไปใน Pool Zone ---
+            if was_in_pool and not exited_safely:
+                if time_missing >= self.missing_alert_sec and not state.counted_as_missing:
+                    self.missing_in_pool_count += 1
+                    state.counted_as_missing = True
+                    print(f"⚠️ [{self.name}] ID{display_id} หายไปใน Pool Zone นานกว่า {self.missing_alert_sec}s - นับว่าหายไป (รวม: {self.missing_in_pool_count})")
+                    self._journal("missing", ts, display_id, missing_sec=round(time_missing, 1))
+
+            # --- แจ้งเตือนแบบขั้นบันได (Tiered Alerts) ---
+            # แจ้งเตือนทุกคนที่หายไปใน Pool Zone (ถ้ายังไม่กด S หยุด)
+            if was_in_pool and not exited_safely and not state.acknowledged:
+                current_alert_level = state.missing_alert_level
+
+                for tier in MISSING_ALERT_TIERS:
+                    tier_seconds = tier["seconds"]
+                    tier_level = tier["level"]
+                    tier_message = tier["message"]
+
+                    # ถ้าหายไปครบเวลาตาม tier และยังไม่เคยแจ้งเตือนระดับนี้
+                    if time_missing >= tier_seconds and current_alert_level < tier_level:
+                        print(f"📢 [{self.name}] แจ้งเตือนระดับ {tier_level}: {tier_message.format(id=display_id)}")
+                        self._trigger_alert(annotated_frame, ts, tier_message, display_id=display_id, level=tier_level,
+                                            missing_sec=time_missing)
+                        state.missing_alert_level = tier_level
+                        state.missing_alerted = True
+                        state.last_repeat_alert = ts
+                        if tier_level >= 5 and ts - self.last_repeat_alert >= self.repeat_alert_interval:
+                            self.last_repeat_alert = ts  # เริ่มรอบซ้ำของกล้องจาก ID แรกที่ถึงระดับ 5
+                        break  # แจ้งเตือนทีละระดับ
+
+                # --- แจ้งเตือนซ้ำทุก repeat_alert_interval วินาที เมื่อเกิน 40 วินาที ---
+                # รอบซ้ำเป็นของกล้อง (ไม่ใช่ของแต่ละ ID) -> ID ที่ซ้ำในรอบเดียวกันรวมเป็นข้อความเดียว
+                # ({seconds} ของข้อความรวม = ID ที่หายไปนานที่สุด) ID ที่เพิ่งถึงระดับ 5 ไม่ถึงครึ่ง interval รอรอบถัดไป
+                if time_missing >= 40 and current_alert_level >= 5 and repeat_due:
+                    if ts - state.last_repeat_alert >= self.repeat_alert_interval / 2:
+                        template = "🆘🆘 ID{id} หายไปนานกว่า {seconds} วินาที! กด 'S' เพื่อหยุดแจ้งเตือน"
+                        print(f"🔁 [{self.name}] แจ้งเตือนซ้ำ: {template.format(id=display_id, seconds=int(time_missing))}")
+                        self._trigger_alert(annotated_frame, ts, template, display_id=display_id,
+                                            level=current_alert_level, missing_sec=time_missing)
+                        state.last_repeat_alert = ts
+                        repeated = True
+
+        if repeated:
+            self.last_repeat_alert = ts
+
+        # --- ลบ submerged_persons ที่หมดเวลา (ครั้งเดียวต่อเฟรม) ---
+        submerged_persons.expire(ts, self.reidentify_time_sec)
+
+    def draw_status_panel(self, annotated_frame, ts):
+        """วาด Status Panel มุมซ้ายบน"""
+        active_pool_ids, active_safe_ids = self.active_pool_ids, self.active_safe_ids
+        missing_in_pool_count = self.missing_in_pool_count
+
+        # พื้นหลังโปร่งแสง - ผสมเฉพาะกรอบของ panel แทนการ copy/ผสมทั้งเฟรม
+        self._get_panel_layer(annotated_frame).apply(annotated_frame)
+
+        now = self.clock.now()
+        current_time_str = time.strftime("%H:%M:%S", time.localtime(now))
+        status_color = (0, 0, 255) if missing_in_pool_count > 0 else (0, 255, 0)
+        status_text = "MISSING DETECTED!" if missing_in_pool_count > 0 else "MONITORING"
+
+        cv2.putText(annotated_frame, f"[{self.name}] Status: {status_text}", (20, 35),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, status_color, 2)
+
+        # แสดงจำนวนคนทั้งหมด (Pool + Safe)
+        total_current = len(active_pool_ids) + len(active_safe_ids)
+        cv2.putText(annotated_frame, f"Total: {total_current}/{self.max_total_count} | Missing: {missing_in_pool_count} | FPS: {self.fps():.1f}", (20, 60),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+        capture_lag_ms = (now - ts) * 1000.0
+        dropped = self.reader.dropped_frames if self.reader is not None else 0  # reader=None: วิเคราะห์คลิป / calibration
+        cv2.putText(annotated_frame, f"Time: {current_time_str} | Lag: {capture_lag_ms:.0f}ms | Dropped: {dropped}", (20, 85),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+
+        # แสดงจำนวนคนใน Pool Zone และ Safe Zone
+        pool_info_color = (255, 200, 100)
+        cv2.putText(annotated_frame, f"Pool: {len(active_pool_ids)} | Safe: {len(active_safe_ids)} | Submerged: {len(self.submerged_persons)}", (20, 110),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, pool_info_color, 1)
+
+        # แสดงจำนวนคนที่หายไปใน Pool Zone
+        missing_color = (0, 0, 255) if missing_in_pool_count > 0 else (255, 255, 255)
+        cv2.putText(annotated_frame, f"Missing in Pool: {missing_in_pool_count}", (20, 135),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, missing_color, 1)
+
+        # แสดง ID ที่ใช้อยู่
+        all_visible_ids = sorted(list(active_pool_ids | active_safe_ids))
+        ids_str = ", ".join([f"ID{i}" for i in all_visible_ids]) if all_visible_ids else "None"
+        cv2.putText(annotated_frame, f"IDs: {ids_str}", (20, 160),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.4, (200, 200, 200), 1)
+        cv2.putText(annotated_frame, "'z'=zones | 'q'=quit | 's'=stop alert", (20, 175),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.4, (200, 200, 200), 1)
+
+    def acknowledge_rescue(self):
+        """หยุดการแจ้งเตือนและรีเซ็ตคนจมน้ำ (ได้รับการช่วยเหลือแล้ว) - ปุ่ม 's'"""
+        rescued_count = 0
+        rescued_ids = []
+        tids_to_remove = []
+
+        for tid, state in self.person_state.items():
+            # เฉพาะคนที่กำลังแจ้งเตือนอยู่ (หายไปในสระ)
+            if state.missing_alert_level > 0 or state.submerged_logged:
+                display_id = state.display_id
+                rescued_ids.append(display_id)
+                tids_to_remove.append(tid)
+                rescued_count += 1
+
+                # ลบออกจาก submerged_persons
+                self.submerged_persons.pop(display_id)
+
+                # ลด missing_in_pool_count ถ้าเคยนับว่าหายไป
+                if state.counted_as_missing:
+                    self.missing_in_pool_count = max(0, self.missing_in_pool_count - 1)
+
+                print(f"🟢 [{self.name}] ID{display_id} ได้รับการช่วยเหลือแล้ว - รีเซ็ตสถานะ")
+                self._journal("rescued", self.clock.now(), display_id, level=state.missing_alert_level)
+
+        # ลบ person_state ของคนที่ได้รับการช่วยเหลือ
+        for tid in tids_to_remove:
+            del self.person_state[tid]
+
+        if rescued_count > 0:
+            ids_str = ", ".join([f"ID{i}" for i in rescued_ids])
+            self.bot.send_message(f"{self.message_prefix}🟢 ยืนยันการช่วยเหลือ: {ids_str} ({rescued_count} คน) - หยุดการแจ้งเตือน")
+            print(f"🟢 [{self.name}] ช่วยเหลือเรียบร้อย {rescued_count} คน - หยุดการแจ้งเตือนและรีเซ็ตสถานะ")
+        else:
+            print(f"ℹ️ [{self.name}] ไม่มีคนจมน้ำที่ต้องช่วยเหลือ")
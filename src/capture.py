@@ -0,0 +1,447 @@
+import os
+import threading
+import time
+from collections import deque
+import cv2
+import numpy as np
+from .clock import WallClock
+
+# OpenCV อ่าน FFmpeg options จาก environment ตอนเปิด source เท่านั้น - lock ให้เปิดทีละ source
+_FFMPEG_OPTIONS_ENV = "OPENCV_FFMPEG_CAPTURE_OPTIONS"
+_ffmpeg_options_lock = threading.Lock()
+
+
+def is_live_source(source) -> bool:
+    """ตรวจสอบว่า source เป็นกล้องสด (webcam / RTSP / HTTP) หรือไฟล์วิดีโอ"""
+    if isinstance(source, int):
+        return True
+    text = str(source).strip().lower()
+    if text.isnumeric():
+        return True
+    return text.startswith(("rtsp://", "rtmp://", "http://", "https://", "udp://", "tcp://"))
+
+
+def default_ffmpeg_options(source) -> list:
+    """ชุด FFmpeg options ที่ลองตามลำดับ: RTSP ลอง TCP ก่อน แล้วค่อย UDP"""
+    if isinstance(source, str) and source.strip().lower().startswith("rtsp://"):
+        return ["rtsp_transport;tcp", "rtsp_transport;udp"]
+    return [""]
+
+
+def open_capture(source, ffmpeg_options: str = "", open_timeout_ms: int = 5000, read_timeout_ms: int = 5000):
+    """
+    เปิด video source - สตรีมเครือข่ายใช้ FFmpeg options ของ source นี้เท่านั้น
+
+    ค่า OPENCV_FFMPEG_CAPTURE_OPTIONS ถูกตั้งเฉพาะระหว่างเปิดแล้วคืนค่าเดิม (ไม่กระทบกล้องอื่น)
+    timeout ของการเปิด/อ่านกำหนดต่อ capture ทำให้สตรีมที่ค้างคืน read() = False แทนการบล็อกไม่มีกำหนด
+
+    พารามิเตอร์:
+        source: index ของ webcam, URL หรือ path ของไฟล์.
+        ffmpeg_options (str): รูปแบบ "key;value|key;value" เช่น "rtsp_transport;tcp|buffer_size;1024000".
+        open_timeout_ms (int): เวลารอเปิดสตรีมสูงสุด.
+        read_timeout_ms (int): เวลารอเฟรมสูงสุดต่อ read().
+    """
+    if isinstance(source, int) or str(source).strip().isnumeric() or not is_live_source(source):
+        return cv2.VideoCapture(source)  # webcam / ไฟล์: backend ตามค่าเริ่มต้นของ OpenCV
+    params = [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, int(open_timeout_ms), cv2.CAP_PROP_READ_TIMEOUT_MSEC, int(read_timeout_ms)]
+    with _ffmpeg_options_lock:
+        previous = os.environ.get(_FFMPEG_OPTIONS_ENV)
+        if ffmpeg_options:
+            os.environ[_FFMPEG_OPTIONS_ENV] = ffmpeg_options
+        else:
+            os.environ.pop(_FFMPEG_OPTIONS_ENV, None)
+        try:
+            return cv2.VideoCapture(source, cv2.CAP_FFMPEG, params)
+        finally:
+            if previous is None:
+                os.environ.pop(_FFMPEG_OPTIONS_ENV, None)
+            else:
+                os.environ[_FFMPEG_OPTIONS_ENV] = previous
+
+
+class CaptureSupervisor:
+    """
+    ดูแลการเชื่อมต่อกล้องสด: เชื่อมต่อใหม่อัตโนมัติเมื่อสัญญาณขาดหรือภาพค้าง
+
+    ใช้แทน cv2.VideoCapture ใน LatestFrameReader ได้ (read(), isOpened(), get(), release())
+    ระหว่างสัญญาณขาด read() คืน False และลองเปิดใหม่โดยรอเพิ่มขึ้นเท่าตัว
+    (backoff_initial_sec, x2, ... ไม่เกิน backoff_max_sec) - กลับมาได้แล้วเริ่มนับใหม่
+
+    ถือว่าขาดการเชื่อมต่อเมื่อ:
+        - read() ไม่สำเร็จติดกัน max_read_failures ครั้ง (รวม read timeout ของ open_capture)
+        - ภาพค้าง: timestamp ของสตรีมไม่เดิน หรือเฟรม (พิกเซลทุก 16 จุด) เหมือนเดิมทุกไบต์ นาน stale_sec
+          (ไม่ใช้เกณฑ์ "ต่างกันน้อย" - สระที่นิ่งตอนกลางคืนให้ภาพแทบเหมือนเดิมทั้งที่กล้องปกติ)
+        ภาพค้างยังส่งเฟรมให้ pipeline ระหว่างเชื่อมต่อใหม่ (ไม่ปิดตา detector) และถือว่ากลับมาเมื่อภาพ/timestamp เดินต่อ
+
+    glass-to-frame latency (เวลาที่ได้เฟรม - เวลาที่กล้องถ่าย) บันทึกเป็น glass_to_frame ของ timer:
+        - timestamp_fn(frame) -> epoch ที่กล้องถ่าย (เช่น เวลาที่ฝังในภาพ) = latency จริง
+        - ไม่กำหนด = ดีเลย์ที่สะสมเพิ่มจากเฟรมที่มาเร็วที่สุดหลังเชื่อมต่อ (คิดจาก timestamp ของสตรีม
+          ไม่รวมดีเลย์คงที่ของกล้อง/เครือข่าย) ใช้ดู buffer ที่พอกขึ้นจนภาพช้ากว่าความจริง
+    """
+
+    def __init__(self,
+                 source,
+                 name: str = "",
+                 ffmpeg_options=None,
+                 bot_obj=None,
+                 message_prefix: str = "",
+                 open_timeout_ms: int = 5000,
+                 read_timeout_ms: int = 5000,
+                 backoff_initial_sec: float = 0.5,
+                 backoff_max_sec: float = 30.0,
+                 max_read_failures: int = 3,
+                 stale_sec: float = 10.0,
+                 outage_notice_sec: float = 5.0,
+                 timestamp_fn=None,
+                 timer=None,
+                 cap=None):
+        """
+        พารามิเตอร์:
+            source: URL / index ของกล้อง.
+            name (str): ชื่อกล้องใน log.
+            ffmpeg_options (str / list): options ของ source นี้ (list = ลองตามลำดับ, None = default_ffmpeg_options).
+            bot_obj (TelegramBot): แจ้งเมื่อขาดการเชื่อมต่อและเมื่อกลับมา (None = ไม่แจ้ง).
+            message_prefix (str): ข้อความนำหน้าการแจ้งเตือน (เช่น "[CAM1] ").
+            open_timeout_ms (int): เวลารอเปิดสตรีมสูงสุดต่อครั้ง.
+            read_timeout_ms (int): เวลารอเฟรมสูงสุดต่อ read().
+            backoff_initial_sec (float): เวลารอก่อนเชื่อมต่อใหม่ครั้งที่สอง (ครั้งแรกลองทันที).
+            backoff_max_sec (float): เวลารอสูงสุดระหว่างการเชื่อมต่อใหม่.
+            max_read_failures (int): จำนวน read() ที่ไม่สำเร็จติดกันก่อนเชื่อมต่อใหม่.
+            stale_sec (float): ภาพ/timestamp ไม่เปลี่ยนนานเท่านี้ = ภาพค้าง (0 = ไม่ตรวจ).
+            outage_notice_sec (float): แจ้ง Telegram เมื่อขาดนานเท่านี้ (ขาดสั้น ๆ แล้วกลับมาเองไม่แจ้ง).
+            timestamp_fn (callable): frame -> epoch ที่กล้องถ่ายภาพ (None = ประมาณจาก timestamp ของสตรีม).
+            timer (StageTimer): บันทึก glass_to_frame (None = ไม่วัด).
+            cap: capture ที่เปิดแล้ว (None = เปิดตอน read() ครั้งแรก).
+        """
+        self.source = source
+        self.name = name
+        if ffmpeg_options is None:
+            ffmpeg_options = default_ffmpeg_options(source)
+        self.ffmpeg_options = [ffmpeg_options] if isinstance(ffmpeg_options, str) else list(ffmpeg_options)
+        self.bot = bot_obj
+        self.message_prefix = message_prefix
+        self.open_timeout_ms = open_timeout_ms
+        self.read_timeout_ms = read_timeout_ms
+        self.backoff_initial_sec = backoff_initial_sec
+        self.backoff_max_sec = backoff_max_sec
+        self.max_read_failures = max_read_failures
+        self.stale_sec = stale_sec
+        self.outage_notice_sec = outage_notice_sec
+        self.timestamp_fn = timestamp_fn
+        self.timer = timer
+        self.cap = cap
+        self._closed = threading.Event()
+        self._next_delay = 0.0
+        self._read_failures = 0
+
+        # สถานะการขาดการเชื่อมต่อ
+        self.outage_started = None  # เวลาที่เริ่มขาด (None = เชื่อมต่ออยู่)
+        self.outage_reason = ""
+        self._outage_stale = False  # ขาดเพราะภาพค้าง (ยังได้เฟรม) - กลับมาเมื่อภาพเดินต่อ
+        self._outage_attempts = 0
+        self._outage_notified = False
+        self._reset_stream_state(time.time())
+
+        # สถิติ
+        self.reconnects = 0          # เชื่อมต่อใหม่สำเร็จ
+        self.connect_attempts = 0    # ลองเปิดทั้งหมด (รวมที่ไม่สำเร็จ)
+        self.outages = deque(maxlen=100)  # [(เริ่มขาด, วินาทีที่ใช้กลับมา, สาเหตุ, จำนวนครั้งที่ลอง)]
+        self.latencies = deque(maxlen=200)
+
+    def _reset_stream_state(self, now: float):
+        self._thumbnail = None  # ภาพย่อของเฟรมก่อนหน้า
+        self._last_change = now
+        self._last_pts = None
+        self._last_pts_change = now
+        self._pts_offset_min = None
+
+    def _connect(self) -> bool:
+        """เปิด source ใหม่หลังรอ backoff - False = ยังเปิดไม่ได้ (หรือถูกปิดระหว่างรอ)"""
+        if self._next_delay > 0:
+            self._notify_outage(time.time())
+            if self._closed.wait(self._next_delay):
+                return False
+        self._next_delay = min(max(self.backoff_initial_sec, self._next_delay * 2), self.backoff_max_sec)
+        for options in self.ffmpeg_options:
+            if self._closed.is_set():
+                return False
+            self.connect_attempts += 1
+            self._outage_attempts += 1
+            cap = open_capture(self.source, options, self.open_timeout_ms, self.read_timeout_ms)
+            if cap.isOpened() and self._closed.is_set():  # release() ระหว่างเปิด
+                cap.release()
+                return False
+            if cap.isOpened():
+                self.cap = cap
+                self._reset_stream_state(time.time())
+                self._read_failures = 0
+                print(f"🔌 [{self.name}] เปิดสตรีมใหม่สำเร็จ{f' ({options})' if options else ''} - รอเฟรมแรก")
+                return True
+            cap.release()
+        print(f"⚠️ [{self.name}] เปิดสตรีมไม่สำเร็จ - ลองใหม่ใน {self._next_delay:.1f}s")
+        return False
+
+    def _lost(self, reason: str, stale: bool = False):
+        """ปิด capture ปัจจุบัน (read() ครั้งถัดไปเชื่อมต่อใหม่)"""
+        now = time.time()
+        if self.outage_started is None:
+            self.outage_started = now
+            self.outage_reason = reason
+            self._outage_stale = stale
+            self._outage_attempts = 0
+            self._outage_notified = False
+            print(f"📵 [{self.name}] ขาดการเชื่อมต่อกล้อง: {reason}")
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+    def _notify_outage(self, now: float):
+        if (self.outage_started is None or self._outage_notified
+                or now - self.outage_started < self.outage_notice_sec):
+            return
+        self._outage_notified = True
+        if self.bot is not None:
+            self.bot.send_message(
+                f"{self.message_prefix}📵 ขาดการเชื่อมต่อกล้อง ({self.outage_reason}) นาน "
+                f"{now - self.outage_started:.0f} วินาที - สระไม่ได้ถูกเฝ้าระวัง กำลังเชื่อมต่อใหม่",
+                detected_at=self.outage_started)
+
+    def _recovered(self, now: float):
+        recover_sec = now - self.outage_started
+        self.outages.append((self.outage_started, recover_sec, self.outage_reason, self._outage_attempts))
+        self.reconnects += 1
+        print(f"✅ [{self.name}] กล้องกลับมาแล้ว (ขาดไป {recover_sec:.1f}s, ลองเปิด {self._outage_attempts} ครั้ง)")
+        if self._outage_notified and self.bot is not None:
+            self.bot.send_message(f"{self.message_prefix}✅ กล้องกลับมาแล้ว (ขาดไป {recover_sec:.0f} วินาที) "
+                                  f"- กลับมาเฝ้าระวังตามปกติ")
+        self.outage_started = None
+        self._next_delay = 0.0
+
+    def _advanced(self, frame, now: float) -> bool:
+        """อัปเดตสถานะของสตรีม - True เมื่อภาพต่างจากเฟรมก่อนหน้าและ timestamp เดิน (ถ้าสตรีมมี timestamp)"""
+        thumbnail = frame[::16, ::16].copy()
+        previous, self._thumbnail = self._thumbnail, thumbnail
+        changed = previous is not None and not np.array_equal(previous, thumbnail)
+        if changed:
+            self._last_change = now
+        pts = self.cap.get(cv2.CAP_PROP_POS_MSEC)
+        pts_advanced = pts != self._last_pts
+        if pts_advanced:
+            self._last_pts = pts
+            self._last_pts_change = now
+        return changed and (pts <= 0 or pts_advanced)
+
+    def _stale_reason(self, now: float):
+        """สาเหตุที่ถือว่าภาพค้าง หรือ None"""
+        if not self.stale_sec:
+            return None
+        if self._last_pts and self._last_pts > 0 and now - self._last_pts_change >= self.stale_sec:
+            return f"timestamp ของสตรีมไม่เดิน {now - self._last_pts_change:.0f} วินาที"
+        if now - self._last_change >= self.stale_sec:
+            return f"ภาพค้าง (เฟรมเหมือนเดิมนาน {now - self._last_change:.0f} วินาที)"
+        return None
+
+    def _measure_latency(self, frame, now: float):
+        if self.timestamp_fn is not None:
+            captured_at = self.timestamp_fn(frame)
+            if not captured_at:
+                return
+            latency = now - captured_at
+        else:
+            if not self._last_pts or self._last_pts <= 0:
+                return
+            offset = now - self._last_pts / 1000.0
+            if self._pts_offset_min is None or offset < self._pts_offset_min:
+                self._pts_offset_min = offset
+            latency = offset - self._pts_offset_min
+        self.latencies.append(latency)
+        if self.timer is not None:
+            self.timer.record("glass_to_frame", max(0.0, latency))
+
+    def read(self):
+        """อินเทอร์เฟซเดียวกับ cv2.VideoCapture.read() - (False, None) ระหว่างขาดการเชื่อมต่อ (ภาพค้างยังคืนเฟรม)"""
+        if self._closed.is_set():
+            return False, None
+        if self.outage_started is not None:
+            self._notify_outage(time.time())
+        if self.cap is None and not self._connect():
+            return False, None
+
+        ok, frame = self.cap.read()
+        now = time.time()
+        if not ok:
+            self._read_failures += 1
+            if self._read_failures >= self.max_read_failures:
+                self._lost("อ่านเฟรมไม่ได้")
+            return False, None
+        self._read_failures = 0
+
+        advanced = self._advanced(frame, now)
+        reason = self._stale_reason(now)
+        if reason is not None:
+            self._lost(reason, stale=True)  # เชื่อมต่อใหม่ใน read() ครั้งถัดไป - เฟรมนี้ยังส่งให้ pipeline
+        elif self.outage_started is not None and (advanced or not self._outage_stale):
+            self._recovered(now)
+        self._measure_latency(frame, now)
+        return True, frame
+
+    def isOpened(self) -> bool:
+        """True จนกว่าจะ release() (ระหว่างขาดการเชื่อมต่อยังพยายามเชื่อมต่อใหม่)"""
+        return not self._closed.is_set()
+
+    def get(self, prop_id):
+        cap = self.cap
+        return cap.get(prop_id) if cap is not None else 0.0
+
+    @property
+    def connected(self) -> bool:
+        """False ระหว่างขาดการเชื่อมต่อ / ภาพค้าง"""
+        return self.outage_started is None
+
+    def stats(self) -> dict:
+        latencies = sorted(self.latencies)
+        recover = sorted(recover_sec for _, recover_sec, _, _ in self.outages)
+        return {
+            "connected": self.connected,
+            "reconnects": self.reconnects,
+            "connect_attempts": self.connect_attempts,
+            "outage_sec": time.time() - self.outage_started if self.outage_started is not None else 0.0,
+            "recover_p50_sec": recover[len(recover) // 2] if recover else 0.0,
+            "recover_max_sec": recover[-1] if recover else 0.0,
+            "latency_p50_ms": latencies[len(latencies) // 2] * 1000.0 if latencies else 0.0,
+            "latency_max_ms": latencies[-1] * 1000.0 if latencies else 0.0,
+        }
+
+    def release(self):
+        self._closed.set()
+        cap, self.cap = self.cap, None
+        if cap is not None:
+            cap.release()
+
+
+class LatestFrameReader:
+    """
+    อ่านเฟรมจากกล้องใน thread แยก เพื่อไม่ให้ cap.read() ถูกบล็อกโดย model.track().
+
+    ใช้ช่องเก็บเฟรมเดียวแบบ latest-wins: ถ้า Main Loop ยังไม่ได้หยิบเฟรมก่อนหน้า
+    เฟรมเก่าจะถูกทิ้ง (นับใน dropped_frames) เพื่อให้ inference ทำงานกับภาพล่าสุดเสมอ
+    และ buffer ของ RTSP/FFmpeg ไม่สะสมจนภาพช้ากว่าความจริงหลายวินาที
+
+    ใช้แทน cv2.VideoCapture ได้ (มี read(), isOpened(), release())
+    """
+
+    def __init__(self, cap, drop_frames: bool = True, retry_delay_sec: float = 0.05, stop_at_eof: bool = False,
+                 clock=None):
+        """
+        พารามิเตอร์:
+            cap (cv2.VideoCapture): video source ที่เปิดแล้ว.
+            drop_frames (bool): True = ทิ้งเฟรมเก่า (กล้องสด),
+                False = รอให้ Main Loop หยิบเฟรมก่อนอ่านเฟรมถัดไป (ไฟล์วิดีโอ).
+            retry_delay_sec (float): เวลารอเมื่ออ่านเฟรมไม่สำเร็จ (วินาที).
+            stop_at_eof (bool): หยุดอ่านเมื่ออ่านเฟรมไม่สำเร็จครั้งแรก (ไฟล์วิดีโอจบ) แทนการลองใหม่
+                - isOpened() เป็น False หลัง Main Loop หยิบเฟรมสุดท้ายไปแล้ว.
+            clock (WallClock / VideoClock): ให้เวลาของแต่ละเฟรม (None = เวลาจริงของเครื่อง).
+        """
+        self.cap = cap
+        self.drop_frames = drop_frames
+        self.retry_delay_sec = retry_delay_sec
+        self.stop_at_eof = stop_at_eof
+        self.clock = clock or WallClock()
+        self.eof = False
+
+        self._cond = threading.Condition()
+        self._frame = None
+        self._frame_ts = 0.0
+        self._seq = 0           # ลำดับเฟรมล่าสุดที่อ่านได้
+        self._consumed_seq = 0  # ลำดับเฟรมล่าสุดที่ Main Loop หยิบไปแล้ว
+        self._running = False
+        self._thread = None
+
+        # สถิติ
+        self.frames_captured = 0
+        self.dropped_frames = 0
+        self.read_failures = 0
+
+    def start(self):
+        if self._running:
+            return self
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="LatestFrameReader", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while self._running:
+            ok, frame = self.cap.read()
+            if not ok:
+                self.read_failures += 1
+                if self.stop_at_eof:
+                    with self._cond:
+                        self.eof = True
+                        self._running = False
+                        self._cond.notify_all()
+                    break
+                time.sleep(self.retry_delay_sec)
+                continue
+            capture_ts = self.clock.frame_time(self.cap)
+
+            with self._cond:
+                if not self.drop_frames:
+                    # โหมดไฟล์: รอให้ Main Loop หยิบเฟรมก่อนหน้าไปก่อน (ไม่ทิ้งเฟรม)
+                    while self._running and self._seq != self._consumed_seq:
+                        self._cond.wait(timeout=0.1)
+                elif self._seq != self._consumed_seq:
+                    # เฟรมก่อนหน้ายังไม่ถูกใช้ -> ถูกเขียนทับ
+                    self.dropped_frames += 1
+
+                self._frame = frame
+                self._frame_ts = capture_ts
+                self._seq += 1
+                self.frames_captured += 1
+                self._cond.notify_all()
+
+    def read_latest(self, timeout: float = 1.0):
+        """
+        รอและคืนค่าเฟรมใหม่ล่าสุดที่ยังไม่เคยถูกหยิบ
+
+        คืนค่า:
+            (ok, frame, capture_ts) - ok=False เมื่อไม่มีเฟรมใหม่ภายใน timeout
+        """
+        deadline = time.time() + timeout
+        with self._cond:
+            while self._seq == self._consumed_seq:
+                remaining = deadline - time.time()
+                if remaining <= 0 or not self._running:
+                    return False, None, 0.0
+                self._cond.wait(timeout=remaining)
+
+            self._consumed_seq = self._seq
+            frame, capture_ts = self._frame, self._frame_ts
+            self._frame = None
+            self._cond.notify_all()
+        return True, frame, capture_ts
+
+    def read(self):
+        """อินเทอร์เฟซเดียวกับ cv2.VideoCapture.read()"""
+        ok, frame, _ = self.read_latest()
+        return ok, frame
+
+    def isOpened(self) -> bool:
+        if self.eof and self._seq == self._consumed_seq:
+            return False
+        return self.cap.isOpened()
+
+    def get(self, prop_id):
+        return self.cap.get(prop_id)
+
+    def stop(self):
+        self._running = False
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+
+    def release(self):
+        self.stop()
+        self.cap.release()
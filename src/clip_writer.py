@@ -0,0 +1,351 @@
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from collections import deque
+from datetime import datetime
+import cv2
+import numpy as np
+
+
+_STOP = object()
+
+
+_ffmpeg_probed = {}  # path -> เข้ารหัส libx264 ได้หรือไม่ (ตรวจครั้งเดียวต่อ path)
+_ffmpeg_probe_lock = threading.Lock()
+
+
+def find_ffmpeg(ffmpeg_path: str = "ffmpeg"):
+    """
+    path ของ ffmpeg ที่เรียกใช้ได้และเข้ารหัส libx264 ได้ หรือ None (ไม่มีในเครื่อง / build ไม่มี libx264)
+
+    ตรวจด้วยการเข้ารหัสเฟรมทดสอบ 1 เฟรม - ffmpeg ที่ Popen ได้แต่ปิดตัวทันทีเมื่อเริ่มเข้ารหัส
+    ทำให้ isOpened() ผ่านแต่คลิปหาย ผู้เรียกได้ None และใช้ OpenCV แทนตั้งแต่แรก
+    """
+    if not ffmpeg_path:
+        return None
+    path = shutil.which(ffmpeg_path)
+    if path is None:
+        return None
+    with _ffmpeg_probe_lock:
+        if path not in _ffmpeg_probed:
+            _ffmpeg_probed[path] = _probe_libx264(path)
+    return path if _ffmpeg_probed[path] else None
+
+
+def _probe_libx264(path: str) -> bool:
+    """เข้ารหัสเฟรมดำ 16x16 ด้วย input / codec / pix_fmt ชุดเดียวกับ FFmpegPipeWriter"""
+    command = [
+        path, "-hide_banner", "-loglevel", "error",
+        "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", "16x16", "-r", "1", "-i", "-",
+        "-an", "-c:v", "libx264", "-pix_fmt", "yuv420p", "-f", "null", "-",
+    ]
+    try:
+        result = subprocess.run(command, input=bytes(16 * 16 * 3), stdout=subprocess.DEVNULL,
+                                stderr=subprocess.PIPE, timeout=30)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        print(f" [ClipWriter] ทดสอบ ffmpeg ({path}) ไม่สำเร็จ: {e} -> ใช้ OpenCV แทน")
+        return False
+    if result.returncode != 0:
+        error = result.stderr.decode("utf-8", "replace").strip()[-300:]
+        print(f" [ClipWriter] ffmpeg ({path}) เข้ารหัส libx264 ไม่ได้: {error} -> ใช้ OpenCV แทน")
+        return False
+    return True
+
+
+class FFmpegPipeWriter:
+    """
+    เข้ารหัส H.264 (libx264) ด้วย ffmpeg subprocess - เฟรม BGR ส่งผ่าน stdin แบบ rawvideo
+
+    interface เดียวกับ cv2.VideoWriter (isOpened / write / release) เพื่อใช้แทนกันใน StreamingClipWriter
+    bitrate_kbps > 0 คุมขนาดไฟล์ (ABR + maxrate), 0 = คุณภาพคงที่ (CRF)
+    output (file-like): เขียนผลลัพธ์ลง buffer แทนไฟล์ (fragmented MP4 ทาง stdout - ไม่ต้อง seek)
+    gop (int): ระยะห่างของ keyframe (เฟรม, None = ค่าเริ่มต้นของ libx264)
+    """
+
+    def __init__(self, ffmpeg_path: str, video_path: str, fps: float, size: tuple, bitrate_kbps: float = 0,
+                 preset: str = "veryfast", output=None, gop: int = None):
+        width, height = size
+        rate_args = ["-crf", "28"]
+        if bitrate_kbps > 0:
+            kbps = max(1, int(bitrate_kbps))
+            rate_args = ["-b:v", f"{kbps}k", "-maxrate", f"{kbps}k", "-bufsize", f"{kbps * 2}k"]
+        if gop:
+            # keyframe ทุก gop เฟรม - จุดตัดของการต่อไฟล์แบบ -c copy ละเอียดเท่านี้
+            rate_args += ["-g", str(int(gop))]
+        if output is None:
+            # moov ต้นไฟล์: Telegram เล่นได้ทันทีระหว่างโหลด
+            output_args = ["-movflags", "+faststart", video_path]
+        else:
+            output_args = ["-movflags", "frag_keyframe+empty_moov+default_base_moof", "-f", "mp4", "pipe:1"]
+        command = [
+            ffmpeg_path, "-hide_banner", "-loglevel", "error", "-y",
+            "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{width}x{height}", "-r", f"{fps:g}", "-i", "-",
+            "-an", "-c:v", "libx264", "-preset", preset, *rate_args, "-pix_fmt", "yuv420p",
+            *output_args,
+        ]
+        self._drain = None
+        self._stderr_tail = deque(maxlen=20)  # บรรทัดท้าย ๆ ของ stderr สำหรับข้อความผิดพลาด
+        try:
+            self._process = subprocess.Popen(command, stdin=subprocess.PIPE,
+                                             stdout=subprocess.PIPE if output is not None else subprocess.DEVNULL,
+                                             stderr=subprocess.PIPE)
+        except OSError as e:
+            print(f" [ClipWriter] เรียก ffmpeg ไม่สำเร็จ: {e}")
+            self._process = None
+            return
+        if output is not None:
+            # อ่าน stdout พร้อมกับการเขียน stdin (กัน pipe เต็มแล้วค้างทั้งคู่)
+            self._drain = threading.Thread(target=shutil.copyfileobj, args=(self._process.stdout, output),
+                                           name="FFmpegDrain", daemon=True)
+            self._drain.start()
+        # อ่าน stderr ตลอดการเข้ารหัส - ถ้ารออ่านตอน release แล้ว ffmpeg เขียน log จน pipe เต็ม
+        # ffmpeg จะหยุดรอ และ write() ของเราค้างตาม
+        self._stderr_reader = threading.Thread(target=self._read_stderr, name="FFmpegStderr", daemon=True)
+        self._stderr_reader.start()
+
+    def _read_stderr(self):
+        for line in self._process.stderr:
+            self._stderr_tail.append(line.decode("utf-8", "replace").rstrip())
+
+    def isOpened(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    def write(self, frame: np.ndarray):
+        self._process.stdin.write(np.ascontiguousarray(frame).tobytes())
+
+    def release(self):
+        if self._process is None:
+            return
+        try:
+            self._process.stdin.close()
+        except OSError:
+            pass
+        if self._drain is not None:
+            self._drain.join()
+        self._stderr_reader.join()
+        error = "\n".join(self._stderr_tail).strip()
+        if self._process.wait() != 0:
+            raise RuntimeError(f"ffmpeg ผิดพลาด (exit {self._process.returncode}): {error[-300:]}")
+
+
+class StreamingClipWriter:
+    """
+    เขียนคลิปวิดีโอแบบ streaming ใน thread แยก.
+
+    เฟรม pre-event (prelude) ถูกเขียนก่อน ตามด้วยเฟรม live ที่ส่งเข้ามาทาง write() ผ่าน queue
+    ที่จำกัดขนาด หน่วยความจำสูงสุดจึงคงที่ (ไม่ขึ้นกับความยาวคลิป) และไฟล์พร้อมส่งทันที
+    หลังเฟรมสุดท้ายถูกเขียน
+    """
+
+    def __init__(self,
+                 video_path: str,
+                 fps: float,
+                 codec: str = "mp4v",
+                 prelude: list = None,
+                 queue_size: int = 32,
+                 on_complete=None,
+                 timer=None,
+                 max_width: int = 0,
+                 bitrate_kbps: float = 0,
+                 ffmpeg_path: str = None,
+                 spool_max_bytes: int = None):
+        """
+        พารามิเตอร์:
+            video_path (str): ไฟล์ปลายทาง.
+            fps (float): เฟรมเรตของคลิป.
+            codec (str): FourCC ของ cv2.VideoWriter (ใช้เมื่อไม่มี ffmpeg - เปิดไม่ได้จะลอง mp4v).
+            prelude (list): เฟรม pre-event (np.ndarray หรือ EncodedFrame ที่ decode ใน thread นี้).
+            queue_size (int): จำนวนเฟรม live สูงสุดที่รอเขียน.
+            on_complete (callable): เรียก on_complete(writer) เมื่อปิดไฟล์เรียบร้อย (ใน thread นี้).
+            timer (StageTimer): บันทึกเวลาเข้ารหัสต่อเฟรม (decode + ประทับเวลา + เขียน) เป็น alert_encode_clip.
+            max_width (int): ย่อเฟรมที่กว้างกว่านี้ (คงอัตราส่วน, 0 = ขนาดเดิม).
+            bitrate_kbps (float): bitrate เป้าหมายของ ffmpeg (0 = CRF) - OpenCV ไม่รองรับ ใช้การย่อขนาดแทน.
+            ffmpeg_path (str): ffmpeg ที่ใช้เข้ารหัส H.264 (None = ใช้ cv2.VideoWriter).
+            spool_max_bytes (int): ffmpeg เขียนคลิปลงหน่วยความจำ (output) แทน video_path - ใหญ่เกินนี้
+                ย้ายไปไฟล์ชั่วคราวในโฟลเดอร์เดียวกับ video_path (None = เขียนไฟล์ video_path เสมอ).
+        """
+        self.video_path = video_path
+        self.fps = float(fps)
+        self.codec = codec
+        self.on_complete = on_complete
+        self.timer = timer
+        self.max_width = int(max_width or 0)
+        self.bitrate_kbps = float(bitrate_kbps or 0)
+        self.ffmpeg_path = ffmpeg_path
+        self.spool_max_bytes = spool_max_bytes
+        self._prelude = list(prelude or [])
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._closed = False
+        self._stop = threading.Event()  # close() แล้ว: encoder เขียนเฟรมที่ค้างจนคิวว่างแล้วปิดไฟล์
+
+        # สถิติ / ผลลัพธ์
+        self.frames_written = 0
+        self.frames_dropped = 0
+        self.ok = False
+        self.first_frame = None
+        self.last_frame = None
+        self.closed_at = 0.0
+        self.finished_at = 0.0
+        self.backend = None  # "ffmpeg/libx264" หรือ "opencv/<fourcc>"
+        self.frame_size = None  # (กว้าง, สูง) ที่เขียนจริง
+        self.encode_sec = 0.0  # เวลาเข้ารหัสรวม (decode + ย่อ + ประทับเวลา + เขียน)
+        self.output = None  # SpooledTemporaryFile ของคลิป (ffmpeg + spool_max_bytes) - None = อยู่ที่ video_path
+
+        self._thread = threading.Thread(target=self._run, name="StreamingClipWriter", daemon=True)
+        self._thread.start()
+
+    def write(self, frame: np.ndarray, stamp_time: datetime = None) -> bool:
+        """
+        ส่งเฟรม live เข้าคิว (ไม่บล็อก, ไม่ต้อง copy ก่อน - ถ้ามี stamp_time จะ copy และประทับเวลาใน thread นี้)
+
+        คืนค่า:
+            bool: False เมื่อคิวเต็ม (encoder ตามไม่ทัน - เฟรมถูกทิ้งและนับใน frames_dropped)
+        """
+        if self._closed:
+            return False
+        try:
+            self._queue.put_nowait((frame, stamp_time))
+            return True
+        except queue.Full:
+            self.frames_dropped += 1
+            return False
+
+    def close(self):
+        """
+        ปิดคลิป (ไม่บล็อกเสมอ - แม้ encoder thread ตายไปแล้วและคิวเต็ม)
+        เฟรมที่ค้างในคิวจะถูกเขียนจนหมดก่อนเรียก on_complete
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self.closed_at = time.time()
+        self._stop.set()
+        try:
+            self._queue.put_nowait((_STOP, None))  # ปลุก encoder ทันที (คิวเต็ม = encoder เห็น _stop เมื่อคิวว่าง)
+        except queue.Full:
+            pass
+
+    def join(self, timeout: float = None):
+        self._thread.join(timeout)
+
+    @property
+    def size_bytes(self) -> int:
+        """ขนาดคลิปที่เขียนแล้ว (ใน buffer หรือไฟล์)"""
+        if self.output is not None:
+            self.output.seek(0, os.SEEK_END)
+            return self.output.tell()
+        return os.path.getsize(self.video_path) if os.path.exists(self.video_path) else 0
+
+    def _run(self):
+        out = None
+        try:
+            if os.path.exists(self.video_path):
+                try:
+                    os.remove(self.video_path)
+                except OSError:
+                    pass
+
+            for item in self._prelude:
+                encode_start = time.perf_counter()
+                frame = item.decode() if hasattr(item, "decode") else item
+                out = self._write_frame(out, frame)
+                self._record_encode(encode_start)
+            self._prelude = []
+
+            while True:
+                try:
+                    frame, stamp_time = self._queue.get(timeout=0.1)
+                except queue.Empty:
+                    if self._stop.is_set():
+                        break
+                    continue
+                if frame is _STOP:
+                    break
+                encode_start = time.perf_counter()
+                if stamp_time is not None:
+                    # ประทับเวลา (Timestamp) ลงบนเฟรมเพื่อตรวจสอบว่าเป็นภาพใหม่จริง
+                    frame = frame.copy()
+                    timestamp_text = stamp_time.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+                    cv2.putText(frame, timestamp_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2, cv2.LINE_AA)
+                out = self._write_frame(out, frame)
+                self._record_encode(encode_start)
+
+            self.ok = out is not None and self.frames_written > 0
+        except Exception as e:
+            print(f" [ClipWriter] Exception: {e}")
+            self.ok = False
+            self._closed = True  # ไม่รับเฟรมเพิ่ม (กัน Main Loop รอคิวที่ไม่มีใครอ่าน)
+        finally:
+            if out is not None:
+                try:
+                    release_start = time.perf_counter()
+                    out.release()  # ffmpeg: รอเข้ารหัสเฟรมที่ค้างและเขียน moov จนเสร็จ
+                    self.encode_sec += time.perf_counter() - release_start
+                except Exception as e:
+                    print(f" [ClipWriter] ปิดไฟล์ไม่สำเร็จ: {e}")
+                    self.ok = False
+            self.finished_at = time.time()
+
+        if self.on_complete is not None:
+            try:
+                self.on_complete(self)
+            except Exception as e:
+                print(f" [ClipWriter] on_complete ผิดพลาด: {e}")
+
+    def _record_encode(self, start: float):
+        elapsed = time.perf_counter() - start
+        self.encode_sec += elapsed
+        if self.timer is not None:
+            self.timer.record("alert_encode_clip", elapsed)
+
+    def _output_size(self, frame) -> tuple:
+        height, width = frame.shape[:2]
+        if self.max_width and width > self.max_width:
+            height = int(round(height * self.max_width / width))
+            width = self.max_width
+        # H.264 (yuv420p) ต้องการความกว้าง/สูงเป็นเลขคู่
+        return max(2, width - width % 2), max(2, height - height % 2)
+
+    def _open_writer(self, size: tuple):
+        width, height = size
+        if self.ffmpeg_path:
+            output = None
+            if self.spool_max_bytes is not None:
+                output = tempfile.SpooledTemporaryFile(max_size=self.spool_max_bytes,
+                                                       dir=os.path.dirname(self.video_path) or None)
+            out = FFmpegPipeWriter(self.ffmpeg_path, self.video_path, self.fps, size, self.bitrate_kbps,
+                                   output=output)
+            if out.isOpened():
+                self.backend = "ffmpeg/libx264"
+                self.output = output
+                return out
+            if output is not None:
+                output.close()
+            print(" [ClipWriter] ffmpeg ใช้งานไม่ได้ -> ใช้ OpenCV แทน")
+        for codec in dict.fromkeys((self.codec, "mp4v")):
+            out = cv2.VideoWriter(self.video_path, cv2.VideoWriter_fourcc(*codec), self.fps, (width, height), isColor=True)
+            if out.isOpened():
+                self.backend = f"opencv/{codec}"
+                return out
+            print(f" [ClipWriter] Codec '{codec}' ใช้งานไม่ได้")
+        raise RuntimeError(f"ไม่สามารถสร้างไฟล์วิดีโอได้ (Codec '{self.codec}' ใช้งานไม่ได้)")
+
+    def _write_frame(self, out, frame):
+        if out is None:
+            self.frame_size = self._output_size(frame)
+            out = self._open_writer(self.frame_size)
+            width, height = self.frame_size
+            print(f" [ClipWriter] เริ่มเขียนวิดีโอ ({width}x{height}, {self.fps} FPS, {self.backend}"
+                  f"{f', {self.bitrate_kbps:.0f} kbps' if self.bitrate_kbps and self.backend.startswith('ffmpeg') else ''})")
+        if frame.shape[1::-1] != self.frame_size:
+            frame = cv2.resize(frame, self.frame_size, interpolation=cv2.INTER_AREA)
+        if self.first_frame is None:
+            self.first_frame = frame
+        out.write(frame)
+        self.last_frame = frame
+        self.frames_written += 1
+        return out
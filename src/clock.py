@@ -0,0 +1,54 @@
+import time
+import cv2
+
+
+class WallClock:
+    """เวลาจริงของเครื่อง (กล้องสด) - เวลาของเฟรมคือเวลาที่อ่านเฟรมได้"""
+
+    def now(self) -> float:
+        return time.time()
+
+    def frame_time(self, cap) -> float:
+        return time.time()
+
+    def advance(self, ts: float):
+        pass
+
+
+class VideoClock:
+    """
+    เวลาตาม timestamp ของเฟรมในไฟล์วิดีโอ (วิเคราะห์คลิปย้อนหลังเร็วกว่าเวลาจริง)
+
+    now() คือเวลาของเฟรมล่าสุดที่ pipeline ประมวลผล (advance) ไม่ใช่เวลาของเครื่อง
+    เกณฑ์ 20-40 วินาที / re-identify / cooldown จึงนับตามเวลาในคลิปเสมอ ไม่ว่าจะประมวลผลเร็วแค่ไหน
+    """
+
+    def __init__(self, origin: float = 0.0, fps: float = 30.0):
+        """
+        พารามิเตอร์:
+            origin (float): epoch ของเฟรมแรก (เช่น เวลาเริ่มบันทึกคลิป).
+            fps (float): ใช้คำนวณเวลาเมื่อ backend ไม่รายงานตำแหน่งของเฟรม (CAP_PROP_POS_MSEC = 0).
+        """
+        self.origin = float(origin)
+        self.fps = float(fps) if fps and fps > 0 else 30.0
+        self.frames_read = 0
+        self._last_frame_time = self.origin
+        self._now = self.origin
+
+    def frame_time(self, cap) -> float:
+        """เวลาของเฟรมที่เพิ่งอ่านจาก cap (เรียกหลัง cap.read() สำเร็จ)"""
+        self.frames_read += 1
+        position_ms = cap.get(cv2.CAP_PROP_POS_MSEC)
+        offset = position_ms / 1000.0 if position_ms > 0 else (self.frames_read - 1) / self.fps
+        self._last_frame_time = max(self._last_frame_time, self.origin + offset)
+        return self._last_frame_time
+
+    def advance(self, ts: float):
+        self._now = max(self._now, ts)
+
+    def now(self) -> float:
+        return self._now
+
+    def offset(self, ts: float) -> float:
+        """วินาทีนับจากต้นคลิป"""
+        return ts - self.origin
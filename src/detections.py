@@ -0,0 +1,67 @@
+import numpy as np
+
+
+class Detections:
+    """
+    ผลการตรวจจับของเฟรมหนึ่งในรูปแบบ NumPy array ต่อเนื่อง (contiguous).
+
+    แปลงจาก tensor ของ YOLO เพียงครั้งเดียวต่อเฟรม แทนการเรียก box.xyxy[0], box.conf[0],
+    box.id[0] ทีละกล่อง (ซึ่งบน CUDA คือการ sync กับ GPU ทุกครั้ง)
+    """
+
+    __slots__ = ("xyxy", "conf", "track_ids", "centers")
+
+    def __init__(self, xyxy: np.ndarray, conf: np.ndarray, track_ids: np.ndarray):
+        """
+        พารามิเตอร์:
+            xyxy (np.ndarray): พิกัดกล่อง (N, 4) int32.
+            conf (np.ndarray): confidence (N,) float32.
+            track_ids (np.ndarray): track id (N,) int64 (-1 = ไม่มี id).
+        """
+        self.xyxy = xyxy
+        self.conf = conf
+        self.track_ids = track_ids
+        # ตำแหน่งกึ่งกลางของกล่อง (N, 2) int32
+        self.centers = np.stack([(xyxy[:, 0] + xyxy[:, 2]) // 2,
+                                 (xyxy[:, 1] + xyxy[:, 3]) // 2], axis=1)
+
+    def __len__(self) -> int:
+        return len(self.conf)
+
+    def tracked(self) -> "Detections":
+        """คืนค่าเฉพาะกล่องที่มี track id"""
+        keep = self.track_ids >= 0
+        if keep.all():
+            return self
+        return Detections(self.xyxy[keep], self.conf[keep], self.track_ids[keep])
+
+    @classmethod
+    def empty(cls) -> "Detections":
+        return cls(np.zeros((0, 4), dtype=np.int32), np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64))
+
+
+def extract_detections(result) -> Detections:
+    """
+    ดึง xyxy / conf / id ออกจากผลลัพธ์ของ YOLO ในครั้งเดียว (ย้ายข้อมูลจาก device ครั้งเดียว)
+
+    boxes.data มีคอลัมน์ [x1, y1, x2, y2, (id), conf, cls] - มี id เมื่อ tracking สำเร็จ
+    """
+    if result is None or result.boxes is None:
+        return Detections.empty()
+
+    data = result.boxes.data
+    if hasattr(data, "cpu"):
+        data = data.cpu().numpy()
+    data = np.asarray(data, dtype=np.float32)
+    if data.shape[0] == 0:
+        return Detections.empty()
+
+    # int() ใน path เดิมตัดทศนิยมทิ้ง (truncate) -> ใช้ astype แบบเดียวกัน
+    xyxy = np.ascontiguousarray(data[:, :4]).astype(np.int32)
+    if data.shape[1] == 7:
+        track_ids = data[:, 4].astype(np.int64)
+        conf = np.ascontiguousarray(data[:, 5])
+    else:
+        track_ids = np.full(data.shape[0], -1, dtype=np.int64)
+        conf = np.ascontiguousarray(data[:, 4])
+    return Detections(xyxy, conf, track_ids)
@@ -0,0 +1,393 @@
+import os
+import glob
+import queue
+import subprocess
+import threading
+import time
+from collections import deque
+import cv2
+from .clip_writer import FFmpegPipeWriter
+
+_STOP = object()
+
+
+class Segment:
+    """ไฟล์ช่วงหนึ่งของ DVR - start/end เป็นเวลาตาม clock ของกล้อง (end = start + เฟรม / fps)"""
+
+    __slots__ = ("path", "start", "end", "frames", "bytes")
+
+    def __init__(self, path: str, start: float):
+        self.path = path
+        self.start = start
+        self.end = start
+        self.frames = 0
+        self.bytes = 0
+
+
+class SegmentRecorder:
+    """
+    DVR แบบวงแหวนบนดิสก์: บันทึกภาพต่อเนื่องเป็นไฟล์สั้น ๆ (segment_sec) จำกัดพื้นที่รวม max_bytes
+
+    เฟรมถูกเข้ารหัสใน thread แยก (ffmpeg H.264 หรือ cv2.VideoWriter เมื่อไม่มี ffmpeg) ที่ fps คงที่:
+    เฟรมที่มาเร็วกว่า fps ถูกข้าม ช่องว่างสั้น (ไม่เกิน max_gap_sec) เติมด้วยเฟรมก่อนหน้า ช่องว่างที่ยาวกว่า
+    (กล้องหลุด/ค้าง) ปิด segment และเริ่มใหม่ที่เวลาของเฟรม - เวลาในไฟล์จึงตรงกับเวลาจริงของกล้อง
+    extract() ต่อ segment ที่ครอบ [t0, t1] ด้วย ffmpeg concat แบบ -c copy (ไม่เข้ารหัสใหม่ ไม่โหลดภาพเข้า RAM)
+    ความละเอียดของจุดตัดเท่ากับระยะห่าง keyframe (1 วินาที)
+    """
+
+    def __init__(self,
+                 out_dir: str,
+                 fps: float = 10.0,
+                 segment_sec: float = 10.0,
+                 max_bytes: int = 2 * 1024 ** 3,
+                 max_width: int = 960,
+                 bitrate_kbps: float = 600,
+                 ffmpeg_path: str = None,
+                 codec: str = "mp4v",
+                 queue_size: int = 64,
+                 max_gap_sec: float = 1.0,
+                 timer=None):
+        """
+        พารามิเตอร์:
+            out_dir (str): โฟลเดอร์ของ segment (ไฟล์ seg_*.mp4 เดิมถูกนำกลับมาใช้ตอนเริ่ม - ยังดึงคลิปย้อนหลังได้
+                หลังรีสตาร์ท และนับรวมใน max_bytes).
+            fps (float): เฟรมเรตของไฟล์ที่บันทึก.
+            segment_sec (float): ความยาวของแต่ละ segment.
+            max_bytes (int): พื้นที่ดิสก์สูงสุดของ segment ทั้งหมด (เกินแล้วลบ segment เก่าสุด).
+            max_width (int): ย่อภาพให้กว้างไม่เกินนี้ (0 = ขนาดเดิม).
+            bitrate_kbps (float): bitrate ของ ffmpeg (0 = CRF).
+            ffmpeg_path (str): ffmpeg สำหรับเข้ารหัสและต่อไฟล์ (None = cv2.VideoWriter + ต่อไฟล์แบบเข้ารหัสใหม่).
+            codec (str): FourCC ของ cv2.VideoWriter เมื่อไม่มี ffmpeg.
+            queue_size (int): จำนวนเฟรมสูงสุดที่รอเข้ารหัส (เต็ม = ทิ้งเฟรม ช่องว่างเติมด้วยเฟรมก่อนหน้า).
+            max_gap_sec (float): ช่องว่างระหว่างเฟรมที่ยาวเกินนี้ไม่เติมเฟรมซ้ำ แต่ปิด segment และเริ่มใหม่ (วินาที).
+            timer (StageTimer): บันทึกเวลาเข้ารหัสต่อเฟรมเป็น dvr_encode (None = ไม่วัด).
+        """
+        self.out_dir = out_dir
+        self.fps = float(fps)
+        self.segment_sec = float(segment_sec)
+        self.max_bytes = int(max_bytes)
+        self.max_width = int(max_width or 0)
+        self.bitrate_kbps = bitrate_kbps
+        self.ffmpeg_path = ffmpeg_path
+        self.codec = codec
+        self.max_gap_sec = float(max_gap_sec)
+        self.timer = timer
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._segments = deque()  # Segment ที่ปิดแล้ว เรียงตามเวลา
+        self._requests = []  # [(t0, t1, output_path, on_ready)] ที่รอ segment ครอบ t1
+        self._extracting = []  # คำขอที่กำลังต่อไฟล์ (segment ในช่วงยังห้ามลบ)
+        self._extract_threads = []
+        self.total_bytes = 0
+
+        # สถิติ
+        self.frames_received = 0
+        self.frames_dropped = 0
+        self.segments_evicted = 0
+
+        os.makedirs(out_dir, exist_ok=True)
+        self._load_segments()
+
+        self._thread = threading.Thread(target=self._run, name="SegmentRecorder", daemon=True)
+        self._thread.start()
+
+    # ------------------------------------------------------------------
+    # บันทึก
+    # ------------------------------------------------------------------
+    def append(self, ts: float, frame) -> bool:
+        """ส่งเฟรมเข้าคิว (ไม่ copy, ไม่บล็อก) - False เมื่อคิวเต็ม"""
+        try:
+            self._queue.put_nowait((ts, frame))
+            self.frames_received += 1
+            return True
+        except queue.Full:
+            self.frames_dropped += 1
+            return False
+
+    def _run(self):
+        current, writer, last_frame = None, None, None
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            ts, frame = item
+            try:
+                # ครบความยาว segment หรือขาดหายนานเกิน max_gap_sec (ไม่เติมเฟรมค้างยาว ๆ ลงไฟล์)
+                if current is not None and (ts - current.start >= self.segment_sec
+                                            or ts - current.end > self.max_gap_sec):
+                    self._finish_segment(current, writer)
+                    current, writer = None, None
+                if current is None:
+                    self._drop_segments_after(ts)
+                    current = Segment(os.path.join(self.out_dir, f"seg_{int(ts * 1000)}.mp4"), ts)
+                    frame = self._resize(frame)
+                    writer = self._open_writer(current.path, frame.shape[1::-1])
+                    last_frame = None
+                else:
+                    frame = self._resize(frame)
+
+                encode_start = time.perf_counter()
+                ticks = int((ts - current.start) * self.fps) + 1  # จำนวนเฟรมที่ควรมีถึงเวลานี้
+                while last_frame is not None and current.frames < ticks - 1:
+                    writer.write(last_frame)
+                    current.frames += 1
+                if current.frames < ticks:
+                    writer.write(frame)
+                    current.frames += 1
+                    last_frame = frame
+                current.end = current.start + current.frames / self.fps
+                if self.timer is not None:
+                    self.timer.record("dvr_encode", time.perf_counter() - encode_start)
+            except Exception as e:
+                print(f" [DVR] Exception: {e}")
+                if writer is not None:
+                    try:
+                        writer.release()
+                    except Exception:
+                        pass
+                current, writer = None, None
+        if current is not None:
+            try:
+                self._finish_segment(current, writer)
+            except Exception as e:
+                print(f" [DVR] Exception: {e}")
+        self._serve_requests(final=True)
+
+    def _load_segments(self):
+        """นำ seg_*.mp4 ที่มีอยู่แล้วกลับเข้า _segments (เวลาเริ่มจากชื่อไฟล์ ขนาดจากดิสก์) แล้วลบส่วนเกิน max_bytes"""
+        found = []
+        for path in glob.glob(os.path.join(self.out_dir, "seg_*.mp4")):
+            try:
+                start = int(os.path.basename(path)[4:-4]) / 1000.0
+            except ValueError:
+                continue
+            cap = cv2.VideoCapture(path)
+            frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) if cap.isOpened() else 0
+            cap.release()
+            if frames <= 0:
+                # ไฟล์ที่เขียนค้างตอนโปรแกรมหยุด (ไม่มี index) เปิดไม่ได้ -> ลบทิ้ง
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            segment = Segment(path, start)
+            segment.frames = frames
+            segment.end = start + frames / self.fps
+            segment.bytes = os.path.getsize(path)
+            found.append(segment)
+        found.sort(key=lambda segment: segment.start)
+        with self._lock:
+            for segment in found:
+                self._segments.append(segment)
+                self.total_bytes += segment.bytes
+            self._evict()
+        if found:
+            found_mb = sum(segment.bytes for segment in found) / (1024 * 1024)
+            print(f" [DVR] พบ segment เดิม {len(found)} ไฟล์ ({found_mb:.1f} MB) - เก็บไว้ {len(self._segments)} ไฟล์")
+
+    def _drop_segments_after(self, ts: float):
+        """เวลาของกล้องย้อนกลับ (เช่นเล่นไฟล์วิดีโอซ้ำ) -> segment เดิมที่อยู่หลัง ts ทับเวลาใหม่ ลบทิ้ง"""
+        with self._lock:
+            while self._segments and self._segments[-1].end > ts:
+                segment = self._segments.pop()
+                self.total_bytes -= segment.bytes
+                try:
+                    os.remove(segment.path)
+                except OSError:
+                    pass
+
+    def _resize(self, frame):
+        height, width = frame.shape[:2]
+        if self.max_width and width > self.max_width:
+            height = int(round(height * self.max_width / width))
+            width = self.max_width
+        size = (max(2, width - width % 2), max(2, height - height % 2))
+        if size != (frame.shape[1], frame.shape[0]):
+            frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        return frame
+
+    def _open_writer(self, path: str, size: tuple):
+        if self.ffmpeg_path:
+            writer = FFmpegPipeWriter(self.ffmpeg_path, path, self.fps, size, self.bitrate_kbps,
+                                      gop=max(1, int(round(self.fps))))
+            if writer.isOpened():
+                return writer
+            print(" [DVR] ffmpeg ใช้งานไม่ได้ -> ใช้ OpenCV แทน")
+            self.ffmpeg_path = None
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*self.codec), self.fps, size, isColor=True)
+        if not writer.isOpened():
+            raise RuntimeError(f"ไม่สามารถสร้างไฟล์ DVR ได้ (Codec '{self.codec}' ใช้งานไม่ได้)")
+        return writer
+
+    def _finish_segment(self, segment: Segment, writer):
+        writer.release()
+        if not os.path.exists(segment.path):
+            return
+        segment.bytes = os.path.getsize(segment.path)
+        with self._lock:
+            self._segments.append(segment)
+            self.total_bytes += segment.bytes
+            self._evict()
+        self._serve_requests()
+
+    def _evict(self):
+        """ลบ segment เก่าสุดจนพื้นที่รวมไม่เกิน max_bytes (ยกเว้น segment ที่คำขอคลิปยังรอใช้)"""
+        pinned_from = min((t0 for t0, _, _, _ in self._requests + self._extracting), default=float("inf"))
+        while self.total_bytes > self.max_bytes and len(self._segments) > 1:
+            oldest = self._segments[0]
+            if oldest.end > pinned_from:
+                break
+            self._segments.popleft()
+            self.total_bytes -= oldest.bytes
+            self.segments_evicted += 1
+            try:
+                os.remove(oldest.path)
+            except OSError:
+                pass
+
+    # ------------------------------------------------------------------
+    # ดึงคลิป
+    # ------------------------------------------------------------------
+    @property
+    def recorded_until(self) -> float:
+        with self._lock:
+            return self._segments[-1].end if self._segments else float("-inf")
+
+    def segments(self, t0: float, t1: float) -> list:
+        """segment ที่ปิดแล้วและคาบเกี่ยวกับ [t0, t1]"""
+        with self._lock:
+            return [s for s in self._segments if s.end > t0 and s.start < t1]
+
+    def extract(self, t0: float, t1: float, output_path: str) -> bool:
+        """
+        เขียนคลิปช่วง [t0, t1] ลง output_path จาก segment ที่ปิดแล้ว
+
+        คืนค่า:
+            bool: False เมื่อไม่มี segment ในช่วงนั้นหรือต่อไฟล์ไม่สำเร็จ
+        """
+        segments = self.segments(t0, t1)
+        if not segments:
+            return False
+        start = time.perf_counter()
+        if self.ffmpeg_path:
+            ok = self._extract_ffmpeg(segments, t0, t1, output_path)
+        else:
+            ok = self._extract_opencv(segments, t0, t1, output_path)
+        if ok:
+            size_mb = os.path.getsize(output_path) / (1024 * 1024)
+            covered = sum(min(t1, segment.end) - max(t0, segment.start) for segment in segments)
+            print(f" [DVR] ดึงคลิป {covered:.0f}s จาก {len(segments)} segment ({size_mb:.2f} MB, "
+                  f"{(time.perf_counter() - start) * 1000:.0f} ms)")
+        return ok
+
+    def _extract_ffmpeg(self, segments: list, t0: float, t1: float, output_path: str) -> bool:
+        list_path = f"{output_path}.concat.txt"
+        with open(list_path, "w", encoding="utf-8") as f:
+            for index, segment in enumerate(segments):
+                f.write(f"file '{os.path.abspath(segment.path)}'\n")
+                if index == 0 and t0 > segment.start:
+                    f.write(f"inpoint {t0 - segment.start:.3f}\n")
+                if index == len(segments) - 1 and t1 < segment.end:
+                    f.write(f"outpoint {t1 - segment.start:.3f}\n")
+        command = [self.ffmpeg_path, "-hide_banner", "-loglevel", "error", "-y", "-f", "concat", "-safe", "0",
+                   "-i", list_path, "-c", "copy", "-movflags", "+faststart", output_path]
+        try:
+            result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=120)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            print(f" [DVR] ต่อไฟล์ไม่สำเร็จ: {e}")
+            return False
+        finally:
+            os.remove(list_path)
+        if result.returncode != 0:
+            print(f" [DVR] ต่อไฟล์ไม่สำเร็จ: {result.stderr.decode('utf-8', 'replace').strip()[-300:]}")
+            return False
+        return os.path.exists(output_path) and os.path.getsize(output_path) > 0
+
+    def _extract_opencv(self, segments: list, t0: float, t1: float, output_path: str) -> bool:
+        """ไม่มี ffmpeg: อ่านและเข้ารหัสใหม่ทีละเฟรม (ช้ากว่า แต่ยังไม่โหลดทั้งคลิปเข้า RAM)"""
+        out = None
+        try:
+            for segment in segments:
+                cap = cv2.VideoCapture(segment.path)
+                index = 0
+                while True:
+                    ok, frame = cap.read()
+                    if not ok:
+                        break
+                    frame_ts = segment.start + index / self.fps
+                    index += 1
+                    if frame_ts < t0 or frame_ts > t1:
+                        continue
+                    if out is None:
+                        out = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*self.codec), self.fps,
+                                              frame.shape[1::-1], isColor=True)
+                    out.write(frame)
+                cap.release()
+        finally:
+            if out is not None:
+                out.release()
+        return out is not None and os.path.getsize(output_path) > 0
+
+    def request_clip(self, t0: float, t1: float, output_path: str, on_ready):
+        """
+        ดึงคลิป [t0, t1] เมื่อ segment ที่ครอบ t1 ถูกปิดแล้ว (ไม่บล็อก)
+
+        on_ready(output_path, ok) ถูกเรียกใน thread แยก - segment ในช่วงนี้ไม่ถูกลบระหว่างรอ
+        """
+        with self._lock:
+            self._requests.append((t0, t1, output_path, on_ready))
+        self._serve_requests()
+
+    def _serve_requests(self, final: bool = False):
+        recorded_until = self.recorded_until
+        with self._lock:
+            ready = [r for r in self._requests if final or r[1] <= recorded_until]
+            self._requests = [r for r in self._requests if r not in ready]
+            self._extracting += ready
+        for t0, t1, output_path, on_ready in ready:
+            thread = threading.Thread(target=self._extract_request, args=(t0, t1, output_path, on_ready),
+                                      name="DvrExtract", daemon=True)
+            thread.start()
+            with self._lock:
+                self._extract_threads = [t for t in self._extract_threads if t.is_alive()] + [thread]
+
+    def _extract_request(self, t0: float, t1: float, output_path: str, on_ready):
+        ok = False
+        try:
+            ok = self.extract(t0, t1, output_path)
+        except Exception as e:
+            print(f" [DVR] Exception: {e}")
+        finally:
+            with self._lock:
+                self._extracting = [r for r in self._extracting if r[2] != output_path]
+        try:
+            on_ready(output_path, ok)
+        except Exception as e:
+            print(f" [DVR] on_ready ผิดพลาด: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            segments = len(self._segments)
+            span = self._segments[-1].end - self._segments[0].start if self._segments else 0.0
+        return {
+            "segments": segments,
+            "bytes": self.total_bytes,
+            "span_sec": span,
+            "frames_dropped": self.frames_dropped,
+            "segments_evicted": self.segments_evicted,
+        }
+
+    def close(self, timeout: float = 10.0):
+        """ปิด segment ปัจจุบันและดึงคลิปที่ค้างอยู่ให้เสร็จ (ไฟล์ segment ยังอยู่บนดิสก์)"""
+        if self._thread.is_alive():
+            try:
+                self._queue.put(_STOP, timeout=timeout)
+            except queue.Full:
+                return
+            self._thread.join(timeout)
+        with self._lock:
+            threads = list(self._extract_threads)
+        for thread in threads:
+            thread.join(timeout)
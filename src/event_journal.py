@@ -0,0 +1,241 @@
+import json
+import queue
+import sqlite3
+import threading
+import time
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    camera TEXT,
+    kind TEXT NOT NULL,
+    display_id INTEGER,
+    level INTEGER,
+    data TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_events_ts ON events (ts);
+CREATE INDEX IF NOT EXISTS idx_events_display ON events (display_id, ts);
+"""
+
+_STOP = object()
+
+
+class EventJournal:
+    """
+    บันทึกเหตุการณ์แบบ append-only ลง SQLite (WAL) สำหรับตรวจสอบเหตุการณ์ย้อนหลัง
+
+    kind ที่ CameraPipeline บันทึก:
+        track        - สรุปกล่องของทุกคนในเฟรมที่รัน detector ({"tracks": [[id, สถานะ, x, y, conf], ...]})
+        zone         - คนเปลี่ยนพื้นที่ ({"from": ..., "to": ...} - from=None คือ ID ใหม่)
+        submerged / reidentified / missing / alert / rescued
+
+    record() แค่ใส่คิว (ไม่แตะดิสก์) - writer thread รวมเป็น batch และเขียนใน transaction เดียว
+    (ครบ batch_size หรือทุก flush_interval_sec) synchronous=NORMAL ของ WAL จึง fsync เฉพาะตอน checkpoint
+    ซึ่งสั่งทุก checkpoint_interval_sec คิวเต็ม (ดิสก์ช้ากว่าเหตุการณ์) = ทิ้งเหตุการณ์ใหม่ ไม่บล็อก Main Loop
+
+    SQLite ผิดพลาด (database is locked / ดิสก์เต็ม) ไม่ทำให้ writer thread หยุด: ปิด connection แล้วเขียน batch เดิมซ้ำ
+    ด้วย connection ใหม่ (รอ retry_sec, 2 เท่าทุกครั้งจนถึง retry_max_sec) ครบ max_retries = ทิ้ง batch นั้น
+    นับใน stats() เป็น write_errors / dropped
+    """
+
+    def __init__(self,
+                 path: str,
+                 batch_size: int = 500,
+                 flush_interval_sec: float = 1.0,
+                 checkpoint_interval_sec: float = 30.0,
+                 queue_size: int = 20000,
+                 retry_sec: float = 0.5,
+                 retry_max_sec: float = 30.0,
+                 max_retries: int = 5,
+                 timer=None):
+        """
+        พารามิเตอร์:
+            path (str): ไฟล์ฐานข้อมูล SQLite (เขียนต่อท้ายถ้ามีอยู่แล้ว).
+            batch_size (int): จำนวนเหตุการณ์สูงสุดต่อ transaction.
+            flush_interval_sec (float): เวลารอสูงสุดก่อนเขียนเหตุการณ์ที่ค้างอยู่.
+            checkpoint_interval_sec (float): ระยะห่างของ WAL checkpoint (fsync ลงไฟล์หลัก).
+            queue_size (int): จำนวนเหตุการณ์สูงสุดที่รอเขียน.
+            retry_sec (float): เวลารอก่อนเขียนซ้ำครั้งแรกหลังเขียนไม่สำเร็จ (เพิ่ม 2 เท่าทุกครั้ง).
+            retry_max_sec (float): เวลารอสูงสุดระหว่างการเขียนซ้ำ.
+            max_retries (int): จำนวนครั้งที่เขียน batch เดียวกันไม่สำเร็จก่อนทิ้ง batch นั้น.
+            timer (StageTimer): บันทึกเวลาเขียนต่อ batch เป็น journal_write (None = ไม่วัด).
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval_sec = flush_interval_sec
+        self.checkpoint_interval_sec = checkpoint_interval_sec
+        self.retry_sec = retry_sec
+        self.retry_max_sec = retry_max_sec
+        self.max_retries = max(1, max_retries)
+        self.timer = timer
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stopping = threading.Event()  # ตัดการรอ backoff ตอน close()
+
+        # สถิติ
+        self.events_written = 0
+        self.events_dropped = 0
+        self.batches = 0
+        self.write_sec = 0.0
+        self.max_batch_sec = 0.0
+        self.write_errors = 0
+        self.last_error = None
+
+        # สร้างตาราง/เปิด WAL ก่อนเริ่ม thread (ผิดพลาดจะแจ้งทันทีที่ main)
+        connection = self._connect()
+        connection.executescript(_SCHEMA)
+        connection.close()
+        self._thread = threading.Thread(target=self._run, name="EventJournal", daemon=True)
+        self._thread.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=10.0)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def record(self, kind: str, ts: float, camera: str = None, display_id=None, level=None, **data) -> bool:
+        """
+        เพิ่มเหตุการณ์เข้าคิว (ไม่บล็อก) - data ถูกแปลงเป็น JSON ใน writer thread
+
+        คืนค่า:
+            bool: False เมื่อคิวเต็ม (เหตุการณ์ถูกทิ้ง)
+        """
+        try:
+            self._queue.put_nowait((ts, camera, kind, display_id, level, data or None))
+            return True
+        except queue.Full:
+            self.events_dropped += 1
+            return False
+
+    def _run(self):
+        connection = None
+        last_checkpoint = time.monotonic()
+        batch, attempts = [], 0
+        stopping = False
+        while batch or not stopping:
+            if not batch:
+                batch, stopping = self._collect()
+            if batch:
+                try:
+                    if connection is None:
+                        connection = self._connect()
+                    self._write_batch(connection, batch)
+                    batch, attempts = [], 0
+                except Exception as e:
+                    connection = self._on_error(connection, e)
+                    attempts += 1
+                    if attempts >= self.max_retries:
+                        print(f"⚠️ [EventJournal] เขียนไม่สำเร็จ {attempts} ครั้ง - ทิ้ง {len(batch)} เหตุการณ์")
+                        self.events_dropped += len(batch)
+                        batch, attempts = [], 0
+                    else:
+                        self._stopping.wait(min(self.retry_max_sec, self.retry_sec * 2 ** (attempts - 1)))
+                    continue
+            if connection is not None and (stopping or time.monotonic() - last_checkpoint >= self.checkpoint_interval_sec):
+                try:
+                    connection.execute("PRAGMA wal_checkpoint(PASSIVE)")
+                except Exception as e:
+                    connection = self._on_error(connection, e)  # checkpoint รอบหน้าค่อยลองใหม่
+                last_checkpoint = time.monotonic()
+        if connection is not None:
+            connection.close()
+
+    def _collect(self):
+        """รอเหตุการณ์จากคิวจนครบ batch_size หรือ flush_interval_sec - คืนค่า (batch, เจอ _STOP)"""
+        batch = []
+        try:
+            item = self._queue.get(timeout=self.flush_interval_sec)
+            deadline = time.monotonic() + self.flush_interval_sec
+            while True:
+                if item is _STOP:
+                    return batch, True
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+        except queue.Empty:
+            pass
+        return batch, False
+
+    def _on_error(self, connection, error):
+        """นับข้อผิดพลาดและปิด connection (เชื่อมต่อใหม่ตอนเขียนครั้งถัดไป) - คืนค่า None"""
+        self.write_errors += 1
+        self.last_error = str(error)
+        print(f"⚠️ [EventJournal] SQLite ผิดพลาด ({self.write_errors} ครั้ง): {error}")
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception:
+                pass
+        return None
+
+    def _write_batch(self, connection: sqlite3.Connection, batch: list):
+        start = time.perf_counter()
+        rows = [(ts, camera, kind, display_id, level,
+                 json.dumps(data, ensure_ascii=False, separators=(",", ":")) if data else None)
+                for ts, camera, kind, display_id, level, data in batch]
+        with connection:
+            connection.executemany(
+                "INSERT INTO events (ts, camera, kind, display_id, level, data) VALUES (?, ?, ?, ?, ?, ?)", rows)
+        elapsed = time.perf_counter() - start
+        self.events_written += len(rows)
+        self.batches += 1
+        self.write_sec += elapsed
+        self.max_batch_sec = max(self.max_batch_sec, elapsed)
+        if self.timer is not None:
+            self.timer.record("journal_write", elapsed)
+
+    def query(self, t0: float = None, t1: float = None, display_id=None, kind: str = None, camera: str = None,
+              limit: int = 1000) -> list:
+        """
+        ค้นเหตุการณ์ที่เขียนลงไฟล์แล้ว (ใช้ index ของ ts / display_id) - อ่านพร้อมกับการเขียนได้ (WAL)
+
+        คืนค่า:
+            list[dict]: เรียงตามเวลา {ts, camera, kind, display_id, level, data}
+        """
+        conditions, params = [], []
+        for column, operator, value in (("ts", ">=", t0), ("ts", "<=", t1), ("display_id", "=", display_id),
+                                        ("kind", "=", kind), ("camera", "=", camera)):
+            if value is not None:
+                conditions.append(f"{column} {operator} ?")
+                params.append(value)
+        sql = "SELECT ts, camera, kind, display_id, level, data FROM events"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY ts, id"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+
+        connection = sqlite3.connect(self.path, timeout=10.0)
+        try:
+            rows = connection.execute(sql, params).fetchall()
+        finally:
+            connection.close()
+        return [{"ts": ts, "camera": camera, "kind": kind, "display_id": display_id, "level": level,
+                 "data": json.loads(data) if data else None}
+                for ts, camera, kind, display_id, level, data in rows]
+
+    def stats(self) -> dict:
+        return {
+            "written": self.events_written,
+            "dropped": self.events_dropped,
+            "pending": self._queue.qsize(),
+            "batches": self.batches,
+            "write_ms_per_batch": self.write_sec / self.batches * 1000.0 if self.batches else 0.0,
+            "max_batch_ms": self.max_batch_sec * 1000.0,
+            "write_errors": self.write_errors,
+            "last_error": self.last_error,
+        }
+
+    def close(self, timeout: float = 10.0):
+        """เขียนเหตุการณ์ที่ค้างในคิวให้หมด (รอไม่เกิน timeout) แล้วปิดไฟล์"""
+        if not self._thread.is_alive():
+            return
+        self._stopping.set()
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
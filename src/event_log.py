@@ -0,0 +1,47 @@
+import json
+import threading
+from datetime import datetime
+
+
+class AlertEventLog:
+    """
+    บันทึกการแจ้งเตือนเป็น JSON Lines (1 บรรทัดต่อการแจ้งเตือน)
+
+    ใช้ในโหมดวิเคราะห์คลิปย้อนหลัง: ทุกระดับที่ "ควรแจ้งเตือน" ถูกบันทึก พร้อม fired
+    (True = AlertManager รับเข้าคิวแล้ว - อาจถูกรวมกับ ID อื่นหรือรอพ้น cooldown ก่อนส่ง,
+    False = ถูกทิ้งเพราะ AlertManager ปิดไปแล้ว)
+    """
+
+    def __init__(self, path: str, source: str = None, clock=None):
+        """
+        พารามิเตอร์:
+            path (str): ไฟล์ .jsonl ปลายทาง (เขียนทับ).
+            source (str): ไฟล์วิดีโอ / กล้องต้นทาง (บันทึกในทุกบรรทัด).
+            clock (VideoClock): ใช้คำนวณเวลานับจากต้นคลิป (offset_sec).
+        """
+        self.path = path
+        self.source = source
+        self.clock = clock
+        self.events = 0
+        self._lock = threading.Lock()
+        self._file = open(path, "w", encoding="utf-8")
+
+    def record(self, camera: str, ts: float, message: str, display_id=None, level=None, fired: bool = True):
+        event = {
+            "source": self.source,
+            "camera": camera,
+            "time": datetime.fromtimestamp(ts).isoformat(timespec="milliseconds"),
+            "offset_sec": round(self.clock.offset(ts), 3) if hasattr(self.clock, "offset") else None,
+            "display_id": display_id,
+            "level": level,
+            "fired": bool(fired),
+            "message": message,
+        }
+        with self._lock:
+            self._file.write(json.dumps(event, ensure_ascii=False) + "\n")
+            self.events += 1
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
@@ -0,0 +1,133 @@
+import time
+import cv2
+import numpy as np
+from collections import deque
+
+
+class EncodedFrame:
+    """เฟรมที่เข้ารหัสแล้ว (JPEG หรือ raw ที่ย่อขนาด) - decode เมื่อเรียก decode() เท่านั้น"""
+
+    __slots__ = ("data", "shape", "encoding")
+
+    def __init__(self, data: np.ndarray, shape: tuple, encoding: str):
+        self.data = data
+        self.shape = shape  # shape ของเฟรมต้นฉบับ (h, w, c)
+        self.encoding = encoding
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.data.nbytes)
+
+    def decode(self) -> np.ndarray:
+        if self.encoding == "jpeg":
+            frame = cv2.imdecode(self.data, cv2.IMREAD_COLOR)
+        else:
+            frame = self.data.copy()
+        height, width = self.shape[:2]
+        if frame.shape[0] != height or frame.shape[1] != width:
+            # ขยายกลับเป็นขนาดเดิม เพื่อให้ต่อกับเฟรม post-event ใน VideoWriter ได้
+            frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_LINEAR)
+        return frame
+
+
+class CompressedFrameBuffer:
+    """
+    Pre-event ring buffer ที่จำกัดหน่วยความจำเป็นจำนวน byte.
+
+    เก็บเฟรมแบบเข้ารหัส JPEG (หรือ raw ที่ย่อขนาด) พร้อม timestamp แทน frame.copy() เต็มขนาด
+    และ decode เฉพาะเฟรมที่ถูกเลือกไปทำคลิปเท่านั้น
+
+    ใช้แทน deque[(ts, frame)] ได้: append((ts, frame)), len(), buffer[i] และการวนลูป
+    จะได้ (ts, frame) ที่ decode แล้ว
+    """
+
+    def __init__(self,
+                 max_bytes: int,
+                 max_frames: int = None,
+                 encoding: str = "jpeg",
+                 jpeg_quality: int = 85,
+                 scale: float = 1.0):
+        """
+        พารามิเตอร์:
+            max_bytes (int): หน่วยความจำสูงสุดของข้อมูลเฟรมที่เก็บไว้ (byte).
+            max_frames (int): จำนวนเฟรมสูงสุด (None = จำกัดด้วย max_bytes อย่างเดียว).
+            encoding (str): "jpeg" หรือ "raw".
+            jpeg_quality (int): คุณภาพ JPEG (0-100).
+            scale (float): อัตราย่อขนาดก่อนเก็บ (1.0 = ขนาดเดิม).
+        """
+        if encoding not in ("jpeg", "raw"):
+            raise ValueError(f"encoding ไม่รองรับ: {encoding}")
+        self.max_bytes = int(max_bytes)
+        self.max_frames = max_frames
+        self.encoding = encoding
+        self.jpeg_quality = int(jpeg_quality)
+        self.scale = float(scale)
+
+        self._entries = deque()  # [(ts, EncodedFrame)]
+        self.total_bytes = 0
+
+        # สถิติ
+        self.frames_encoded = 0
+        self.frames_evicted = 0
+        self.encode_time_total = 0.0
+
+    def _encode(self, frame: np.ndarray) -> EncodedFrame:
+        small = frame
+        if self.scale < 1.0:
+            small = cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        if self.encoding == "jpeg":
+            ok, data = cv2.imencode(".jpg", small, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+            if not ok:
+                raise RuntimeError("cv2.imencode ล้มเหลว")
+        else:
+            data = small.copy() if small is frame else small
+        return EncodedFrame(data, frame.shape, self.encoding)
+
+    def append(self, item):
+        """เพิ่ม (ts, frame) - เฟรมถูกเข้ารหัส/คัดลอกทันที จึงไม่ต้อง copy ก่อนส่งเข้ามา"""
+        ts, frame = item
+        start = time.perf_counter()
+        encoded = self._encode(frame)
+        self.encode_time_total += time.perf_counter() - start
+        self.frames_encoded += 1
+
+        self._entries.append((float(ts), encoded))
+        self.total_bytes += encoded.nbytes
+
+        # ลบเฟรมเก่าที่สุดจนกว่าจะอยู่ในงบหน่วยความจำ (เก็บอย่างน้อย 1 เฟรม)
+        while len(self._entries) > 1 and (
+            self.total_bytes > self.max_bytes
+            or (self.max_frames is not None and len(self._entries) > self.max_frames)
+        ):
+            _, old = self._entries.popleft()
+            self.total_bytes -= old.nbytes
+            self.frames_evicted += 1
+
+    def entries(self) -> list:
+        """snapshot ของ [(ts, EncodedFrame)] ที่ยังไม่ decode"""
+        return list(self._entries)
+
+    def clear(self):
+        self._entries.clear()
+        self.total_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __getitem__(self, index):
+        ts, encoded = self._entries[index]
+        return ts, encoded.decode()
+
+    def __iter__(self):
+        for ts, encoded in list(self._entries):
+            yield ts, encoded.decode()
+
+    def stats(self) -> dict:
+        frames = len(self._entries)
+        return {
+            "frames": frames,
+            "bytes": self.total_bytes,
+            "bytes_per_frame": self.total_bytes / frames if frames else 0.0,
+            "encode_ms_per_frame": (self.encode_time_total / self.frames_encoded * 1000.0) if self.frames_encoded else 0.0,
+            "frames_evicted": self.frames_evicted,
+        }
@@ -0,0 +1,235 @@
+import numpy as np
+import torch
+from torchvision.ops import batched_nms
+from ultralytics.trackers.track import TRACKER_MAP
+from ultralytics.utils import IterableSimpleNamespace
+from ultralytics.utils.checks import check_yaml
+
+try:
+    from ultralytics.utils import YAML
+    _yaml_load = YAML.load
+except ImportError:  # ultralytics < 8.3.100
+    from ultralytics.utils import yaml_load as _yaml_load
+
+
+class BatchTracker:
+    """
+    รัน YOLO หนึ่งโมเดลกับเฟรมจากหลายกล้องใน batch เดียว แล้วติดตาม (tracking) แยกตามกล้อง.
+
+    model.track() ของ Ultralytics ใช้ tracker ตัวเดียวร่วมกันเมื่อส่ง list ของภาพ
+    จึงแยกเป็น model.predict() แบบ batch + tracker หนึ่งตัวต่อกล้อง
+    (ขั้นตอนเดียวกับ callback on_predict_postprocess_end ของ Ultralytics)
+    """
+
+    def __init__(self,
+                 model,
+                 device,
+                 conf: float,
+                 tracker_cfg: str = "botsort.yaml",
+                 classes=(0,),
+                 tile_size: int = 0,
+                 tile_overlap: float = 0.2,
+                 tile_nms_iou: float = 0.5,
+                 imgsz: int = None):
+        """
+        พารามิเตอร์:
+            model (YOLO): โมเดลที่โหลดแล้ว (ใช้ร่วมกันทุกกล้อง).
+            device (str): "0" (CUDA) หรือ "cpu".
+            conf (float): confidence threshold.
+            tracker_cfg (str): ไฟล์ตั้งค่า tracker ของ Ultralytics (ค่าเริ่มต้นเดียวกับ model.track).
+            classes (tuple): class ที่ต้องการตรวจจับ (0 = person).
+            tile_size (int): ขนาด tile (px) สำหรับกล้องความละเอียดสูง (0 = ไม่แบ่ง tile).
+            tile_overlap (float): สัดส่วนการซ้อนทับของ tile ที่อยู่ติดกัน (0 - 0.9).
+            tile_nms_iou (float): IoU threshold ของ NMS ที่รวมกล่องข้าม tile.
+            imgsz (int): ขนาด input ของโมเดล (None = ค่าเริ่มต้นของโมเดล).
+        """
+        self.model = model
+        self.device = device
+        self.conf = conf
+        self.classes = list(classes)
+        self.tile_size = int(tile_size)
+        self.tile_overlap = min(max(float(tile_overlap), 0.0), 0.9)
+        self.tile_nms_iou = float(tile_nms_iou)
+        self.imgsz = imgsz
+        self.tracker_args = IterableSimpleNamespace(**_yaml_load(check_yaml(tracker_cfg)))
+        self.trackers = {}  # camera key -> tracker
+
+    def _get_tracker(self, key):
+        tracker = self.trackers.get(key)
+        if tracker is None:
+            tracker = TRACKER_MAP[self.tracker_args.tracker_type](args=self.tracker_args)
+            self.trackers[key] = tracker
+        return tracker
+
+    def reset(self, key):
+        self.trackers.pop(key, None)
+
+    def _input_rects(self, frame, roi) -> list:
+        """กรอบที่ส่งเข้าโมเดลของเฟรมหนึ่ง: ROI (หรือทั้งเฟรม) หรือ tile ที่ซ้อนทับกันภายใน ROI"""
+        height, width = frame.shape[:2]
+        region = roi if roi is not None else (0, 0, width, height)
+        if self.tile_size <= 0:
+            return [region]
+        return tile_rects(region, self.tile_size, self.tile_overlap)
+
+    def detect(self, frames: list, rois: list = None) -> list:
+        """
+        ตรวจจับคนในหลายเฟรมด้วย model.predict() ครั้งเดียว (ไม่ tracking)
+
+        ภาพที่ crop (ROI) และ tile ของทุกเฟรมอยู่ใน batch เดียวกัน แล้วรวมกล่องกลับเป็นพิกัดของเฟรมเต็ม
+        (ตัดกล่องซ้ำข้าม tile ด้วย NMS)
+
+        คืนค่า:
+            list: ผลลัพธ์ของ YOLO ต่อเฟรม (orig_img = เฟรมเต็ม)
+        """
+        rois = rois or [None] * len(frames)
+        inputs, owners, offsets = [], [], []
+        for index, (frame, roi) in enumerate(zip(frames, rois)):
+            height, width = frame.shape[:2]
+            for x0, y0, x1, y1 in self._input_rects(frame, roi):
+                if (x0, y0, x1, y1) == (0, 0, width, height):
+                    inputs.append(frame)
+                else:
+                    inputs.append(np.ascontiguousarray(frame[y0:y1, x0:x1]))
+                owners.append(index)
+                offsets.append((x0, y0))
+
+        predict_args = {"imgsz": self.imgsz} if self.imgsz else {}
+        results = self.model.predict(
+            inputs,
+            device=self.device,
+            conf=self.conf,
+            verbose=False,
+            classes=self.classes,
+            **predict_args,
+        )
+
+        parts = [[] for _ in frames]
+        for owner, offset, result in zip(owners, offsets, results):
+            parts[owner].append((offset, result))
+        return [_merge_results(frame, frame_parts, self.tile_nms_iou) for frame, frame_parts in zip(frames, parts)]
+
+    def track(self, frames: list, keys: list, rois: list = None) -> list:
+        """
+        ตรวจจับและติดตามคนในหลายเฟรมพร้อมกัน
+
+        พารามิเตอร์:
+            frames (list[np.ndarray]): เฟรมจากแต่ละกล้อง.
+            keys (list): ชื่อกล้องของแต่ละเฟรม (ใช้เลือก tracker).
+            rois (list): กรอบ (x0, y0, x1, y1) ที่จะ crop ก่อนส่งเข้าโมเดลของแต่ละเฟรม
+                (None = ทั้งเฟรม) - กล่องที่ได้ถูกแปลงกลับเป็นพิกัดของเฟรมเต็มก่อน tracking.
+
+        คืนค่า:
+            list: ผลลัพธ์ของ YOLO ต่อเฟรม (boxes มี id เมื่อ tracking สำเร็จ)
+        """
+        results = self.detect(frames, rois)
+
+        tracked = []
+        for key, result in zip(keys, results):
+            try:
+                tracker = self._get_tracker(key)
+                det = result.boxes.cpu().numpy()
+                tracks = tracker.update(det, result.orig_img)
+                if len(tracks) == 0:
+                    # ยังไม่มี track ที่ยืนยันแล้ว -> ไม่มีกล่องที่มี ID
+                    tracked.append(result[:0])
+                    continue
+                idx = tracks[:, -1].astype(int)
+                result = result[idx]
+                result.update(boxes=torch.as_tensor(tracks[:, :-1], device=result.boxes.data.device))
+            except Exception as e:
+                # tracking ล้มเหลว -> ใช้ผล predict (ไม่มี ID)
+                print(f"⚠️ Tracking ล้มเหลว ({key}): {e}")
+            tracked.append(result)
+        return tracked
+
+
+def tile_rects(region, tile_size: int, overlap: float) -> list:
+    """
+    แบ่ง region (x0, y0, x1, y1) เป็น tile ขนาด tile_size ที่ซ้อนทับกัน (tile แรก/สุดท้ายชิดขอบ region)
+
+    region ที่เล็กกว่า tile ในแกนใด จะใช้ tile เดียวเต็มแกนนั้น
+    """
+    x0, y0, x1, y1 = region
+    stride = max(1, int(tile_size * (1.0 - overlap)))
+
+    def starts(begin, end):
+        if end - begin <= tile_size:
+            return [(begin, end)]
+        # จำนวน tile น้อยที่สุดที่ซ้อนทับอย่างน้อย overlap แล้วกระจายตำแหน่งให้เท่ากัน
+        count = int(np.ceil((end - begin - tile_size) / stride)) + 1
+        positions = np.linspace(begin, end - tile_size, count).round().astype(int).tolist()
+        return [(p, p + tile_size) for p in positions]
+
+    return [(tx0, ty0, tx1, ty1) for ty0, ty1 in starts(y0, y1) for tx0, tx1 in starts(x0, x1)]
+
+
+def _merge_results(frame, parts, nms_iou: float):
+    """
+    รวมผลลัพธ์ของภาพย่อย (ROI / tile) ของเฟรมเดียวกลับเป็นพิกัดของเฟรมเต็ม
+
+    parts: [((x0, y0), result)] - หลาย tile จะตัดกล่องซ้ำบริเวณที่ซ้อนทับด้วย NMS แยกตาม class
+    """
+    (x0, y0), result = parts[0]
+    if len(parts) == 1 and x0 == 0 and y0 == 0 and result.orig_img is frame:
+        return result
+
+    boxes = []
+    for (x0, y0), part in parts:
+        data = part.boxes.data.clone()
+        data[:, [0, 2]] += x0
+        data[:, [1, 3]] += y0
+        boxes.append(data)
+    data = torch.cat(boxes)
+    if len(parts) > 1 and len(data):
+        keep = batched_nms(data[:, :4], data[:, -2], data[:, -1].long(), nms_iou)
+        data = data[keep]
+
+    result.orig_img = frame
+    result.orig_shape = frame.shape[:2]
+    result.update(boxes=data)
+    return result
+
+
+class KeyframeScheduler:
+    """
+    เลือกเฟรมที่ต้องรัน detector (keyframe) แยกตามกล้อง - เฟรมอื่นใช้การทำนายตำแหน่งแทน
+
+    keyframe คือเฟรมที่ครบทุก every_n เฟรม หรือห่างจาก keyframe ก่อนหน้าอย่างน้อย
+    1 / target_fps วินาที (เงื่อนไขใดครบก่อน) ค่าเริ่มต้น (every_n=1) = รัน detector ทุกเฟรม
+    """
+
+    def __init__(self, every_n: int = 1, target_fps: float = 0.0):
+        """
+        พารามิเตอร์:
+            every_n (int): รัน detector ทุก N เฟรม (1 = ทุกเฟรม).
+            target_fps (float): อัตราการรัน detector เป้าหมายต่อกล้อง (0 = ไม่ใช้).
+        """
+        self.every_n = max(1, int(every_n))
+        self.min_interval_sec = 1.0 / target_fps if target_fps > 0 else None
+        self._frames_since = {}  # key -> จำนวนเฟรมตั้งแต่ keyframe ล่าสุด
+        self._last_keyframe_ts = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.every_n > 1 or self.min_interval_sec is not None
+
+    def is_keyframe(self, key, ts: float) -> bool:
+        """ตัดสินว่าเฟรมนี้ของกล้อง key ต้องรัน detector หรือไม่ (และนับเฟรม)"""
+        frames_since = self._frames_since.get(key)
+        last_ts = self._last_keyframe_ts.get(key)
+        due = frames_since is None or not self.enabled
+        if not due and self.every_n > 1:
+            due = frames_since + 1 >= self.every_n
+        if not due and self.min_interval_sec is not None:
+            due = ts - last_ts >= self.min_interval_sec
+        if due:
+            self._frames_since[key] = 0
+            self._last_keyframe_ts[key] = ts
+        else:
+            self._frames_since[key] = frames_since + 1
+        return due
+
+    def reset(self, key):
+        self._frames_since.pop(key, None)
+        self._last_keyframe_ts.pop(key, None)
@@ -0,0 +1,174 @@
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from .stage_timer import LATENCY_BUCKETS
+
+# ชื่อ thread ที่นับเป็นงานแจ้งเตือนที่กำลังทำงาน (AlertManager / StreamingClipWriter)
+ALERT_THREAD_NAMES = ("AlertSender", "StreamingClipWriter")
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+class MetricsServer:
+    """
+    HTTP endpoint /metrics (Prometheus text format 0.0.4) สำหรับดูว่าเครื่องประมวลผลทันหรือไม่
+
+    ค่าทั้งหมดอ่านจากอ็อบเจกต์ที่มีอยู่แล้ว (CameraPipeline / StageTimer / TelegramBot) ตอนถูก scrape
+    Main Loop จึงไม่มีงานเพิ่ม - FPS คิดจากช่วงระหว่างการ scrape สองครั้ง (ครั้งแรก: ตั้งแต่เริ่มทำงาน)
+    """
+
+    def __init__(self, cameras: list, timer=None, bot=None, host: str = "127.0.0.1", port: int = 9108):
+        """
+        พารามิเตอร์:
+            cameras (list): CameraPipeline ของทุกกล้อง.
+            timer (StageTimer): latency ของแต่ละขั้นตอน.
+            bot (TelegramBot): สถิติการส่ง Telegram.
+            host (str): ค่าเริ่มต้นเปิดเฉพาะในเครื่อง (0.0.0.0 = ให้ Prometheus เครื่องอื่น scrape ได้).
+            port (int): พอร์ตของ endpoint.
+        """
+        self.cameras = cameras
+        self.timer = timer
+        self.bot = bot
+        self.started_at = time.time()
+        self._last_scrape = {}  # camera -> (เวลา, captured, processed)
+        self._lock = threading.Lock()
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="MetricsServer", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _rates(self, cam, now: float) -> tuple:
+        """(capture FPS, processed FPS) ตั้งแต่การ scrape ครั้งก่อน"""
+        captured = cam.reader.frames_captured if cam.reader is not None else cam.frames_processed
+        processed = cam.frames_processed
+        with self._lock:
+            last_time, last_captured, last_processed = self._last_scrape.get(cam.name, (self.started_at, 0, 0))
+            self._last_scrape[cam.name] = (now, captured, processed)
+        elapsed = now - last_time
+        if elapsed <= 0:
+            return 0.0, 0.0
+        return (captured - last_captured) / elapsed, (processed - last_processed) / elapsed
+
+    def render(self) -> str:
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str, samples: list):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for suffix, labels, value in samples:
+                lines.append(f"{name}{suffix}{_labels(**labels)} {float(value)!r}")
+
+        now = time.time()
+        rates = {cam.name: self._rates(cam, now) for cam in self.cameras}
+        metric("drowning_capture_fps", "gauge", "Frames read from the source per second (since last scrape).",
+               [("", {"camera": name}, capture) for name, (capture, _) in rates.items()])
+        metric("drowning_processed_fps", "gauge", "Frames processed by the pipeline per second (since last scrape).",
+               [("", {"camera": name}, processed) for name, (_, processed) in rates.items()])
+        metric("drowning_frames_captured_total", "counter", "Frames read from the source.",
+               [("", {"camera": cam.name}, cam.reader.frames_captured)
+                for cam in self.cameras if cam.reader is not None])
+        metric("drowning_frames_processed_total", "counter", "Frames processed by the pipeline.",
+               [("", {"camera": cam.name}, cam.frames_processed) for cam in self.cameras])
+        metric("drowning_frames_dropped_total", "counter", "Frames overwritten before the main loop picked them up.",
+               [("", {"camera": cam.name}, cam.reader.dropped_frames) for cam in self.cameras if cam.reader is not None])
+        supervised = [(cam.name, cam.reader.cap) for cam in self.cameras
+                      if cam.reader is not None and hasattr(cam.reader.cap, "reconnects")]
+        metric("drowning_capture_connected", "gauge", "1 while the camera stream is delivering frames.",
+               [("", {"camera": name}, int(cap.connected)) for name, cap in supervised])
+        metric("drowning_capture_reconnects_total", "counter", "Successful reconnects after an outage or frozen stream.",
+               [("", {"camera": name}, cap.reconnects) for name, cap in supervised])
+        metric("drowning_person_states", "gauge", "Entries in person_state.",
+               [("", {"camera": cam.name}, len(cam.person_state)) for cam in self.cameras])
+        metric("drowning_submerged_persons", "gauge", "People waiting for re-identification.",
+               [("", {"camera": cam.name}, len(cam.submerged_persons)) for cam in self.cameras])
+
+        buffers = [(cam.name, cam.video_buffer.stats()) for cam in self.cameras if hasattr(cam.video_buffer, "stats")]
+        metric("drowning_prebuffer_bytes", "gauge", "Memory held by the pre-event frame buffer.",
+               [("", {"camera": name}, stats["bytes"]) for name, stats in buffers])
+        metric("drowning_prebuffer_frames", "gauge", "Frames held by the pre-event frame buffer.",
+               [("", {"camera": name}, stats["frames"]) for name, stats in buffers])
+        metric("drowning_alert_recording", "gauge", "1 while an alert clip is being recorded.",
+               [("", {"camera": cam.name}, int(cam.alert_manager.recording)) for cam in self.cameras])
+
+        alert_threads = {name: 0 for name in ALERT_THREAD_NAMES}
+        for thread in threading.enumerate():
+            if thread.name in alert_threads:
+                alert_threads[thread.name] += 1
+        metric("drowning_alert_threads", "gauge", "Live alert sender / clip encoder threads.",
+               [("", {"kind": name}, count) for name, count in alert_threads.items()])
+
+        if self.timer is not None:
+            samples = []
+            for stage, (counts, total, count) in sorted(self.timer.histogram_snapshot().items()):
+                cumulative = 0
+                for bound, bucket_count in zip(LATENCY_BUCKETS, counts):
+                    cumulative += bucket_count
+                    samples.append(("_bucket", {"stage": stage, "le": f"{bound:g}"}, cumulative))
+                samples.append(("_bucket", {"stage": stage, "le": "+Inf"}, count))
+                samples.append(("_sum", {"stage": stage}, total))
+                samples.append(("_count", {"stage": stage}, count))
+            metric("drowning_stage_latency_seconds", "histogram", "Time spent per pipeline stage.", samples)
+
+        if self.bot is not None:
+            stats = self.bot.stats()
+            metric("drowning_telegram_sent_total", "counter", "Telegram jobs sent.", [("", {}, stats["sent"])])
+            metric("drowning_telegram_failed_total", "counter", "Telegram jobs that failed after retries.",
+                   [("", {}, stats["failed"])])
+            metric("drowning_telegram_dropped_total", "counter", "Telegram jobs dropped because the queue was full.",
+                   [("", {}, stats["dropped"])])
+            metric("drowning_telegram_retries_total", "counter", "Telegram send retries.", [("", {}, stats["retries"])])
+            metric("drowning_telegram_pending", "gauge", "Telegram jobs waiting in the queue.",
+                   [("", {}, stats["pending"])])
+            by_priority = {}
+            for _, latency, priority in list(self.bot.send_latencies):
+                by_priority.setdefault(priority, []).append(latency)
+            samples = []
+            for priority, (count, total) in sorted(dict(self.bot.latency_totals).items()):
+                latencies = sorted(by_priority.get(priority, []))
+                samples += [("", {"priority": priority, "quantile": q},
+                             latencies[min(len(latencies) - 1, int(len(latencies) * float(q)))])
+                            for q in ("0.5", "0.9", "0.99") if latencies]
+                samples += [("_sum", {"priority": priority}, total), ("_count", {"priority": priority}, count)]
+            metric("drowning_telegram_send_latency_seconds", "summary",
+                   "Time from detection (or enqueue) to successful send per priority "
+                   "(quantiles over the last 200 sends).", samples)
+
+        return "\n".join(lines) + "\n"
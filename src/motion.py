@@ -0,0 +1,65 @@
+import numpy as np
+
+
+class ConstantVelocityModel:
+    """
+    ทำนายตำแหน่งกล่องของแต่ละ track ระหว่างเฟรมที่ไม่ได้รัน detector (constant velocity).
+
+    ความเร็วของกล่อง (px/วินาที ต่อมุม x1, y1, x2, y2) คำนวณจากผลตรวจจับสองครั้งล่าสุด
+    และเฉลี่ยแบบ exponential เพื่อลดการสั่นของกล่อง
+    """
+
+    def __init__(self, smoothing: float = 0.5, max_predict_sec: float = 1.0):
+        """
+        พารามิเตอร์:
+            smoothing (float): น้ำหนักของความเร็วใหม่ (1.0 = ใช้ความเร็วล่าสุดอย่างเดียว).
+            max_predict_sec (float): ทำนายล่วงหน้าได้ไม่เกินนี้นับจากผลตรวจจับล่าสุด
+                (เกินแล้วกล่องหยุดนิ่งที่ตำแหน่งทำนายสุดท้าย).
+        """
+        self.smoothing = float(smoothing)
+        self.max_predict_sec = float(max_predict_sec)
+        self._tracks = {}  # track_id -> (box (4,) float64, velocity (4,) float64 หรือ None, ts)
+
+    def __len__(self) -> int:
+        return len(self._tracks)
+
+    def update(self, track_ids, xyxy, ts: float):
+        """บันทึกผลตรวจจับ (keyframe) - track ที่ไม่อยู่ในเฟรมนี้ถูกลบออก"""
+        boxes = np.asarray(xyxy, dtype=np.float64).reshape(-1, 4)
+        tracks = {}
+        for track_id, box in zip(np.asarray(track_ids).tolist(), boxes):
+            previous = self._tracks.get(track_id)
+            velocity = None  # ยังไม่รู้ความเร็ว (เห็นครั้งแรก) = กล่องอยู่นิ่ง
+            if previous is not None:
+                prev_box, velocity, prev_ts = previous
+                dt = ts - prev_ts
+                if dt > 0:
+                    measured = (box - prev_box) / dt
+                    velocity = measured if velocity is None else (
+                        self.smoothing * measured + (1.0 - self.smoothing) * velocity)
+            tracks[track_id] = (box, velocity, float(ts))
+        self._tracks = tracks
+
+    def predict(self, track_ids, ts: float) -> np.ndarray:
+        """
+        ทำนายกล่องของ track ที่ระบุ ณ เวลา ts
+
+        คืนค่า:
+            np.ndarray: (N, 4) float64 (track ที่ไม่รู้จัก = NaN)
+        """
+        track_ids = np.asarray(track_ids).tolist()
+        boxes = np.full((len(track_ids), 4), np.nan, dtype=np.float64)
+        for index, track_id in enumerate(track_ids):
+            track = self._tracks.get(track_id)
+            if track is None:
+                continue
+            box, velocity, last_ts = track
+            if velocity is None:
+                boxes[index] = box
+                continue
+            dt = min(max(ts - last_ts, 0.0), self.max_predict_sec)
+            boxes[index] = box + velocity * dt
+        return boxes
+
+    def clear(self):
+        self._tracks = {}
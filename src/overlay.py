@@ -0,0 +1,140 @@
+import cv2
+import numpy as np
+
+
+# สีของพื้นที่ (BGR): (สีพื้น, สีขอบ) - ตรงกับ draw_zones()
+POOL_COLORS = ((255, 200, 100), (255, 150, 0))
+SAFE_COLORS = ((100, 255, 100), (0, 200, 0))
+ZONE_FILL_ALPHA = 0.3
+ZONE_BORDER_THICKNESS = 3
+
+# พื้นหลัง Status Panel
+PANEL_RECT = (10, 10, 480, 185)
+PANEL_ALPHA = 0.6
+
+
+# กลุ่มพิกเซลที่กินพื้นที่น้อยกว่าสัดส่วนนี้ของกรอบ จะผสมทีละพิกเซลแทนการผสมทั้งกรอบ
+_SPARSE_FILL_RATIO = 0.25
+
+
+class BlendLayer:
+    """
+    Layer ที่ render ไว้ล่วงหน้า (สี + alpha ต่อพิกเซล) แล้วผสมกับเฟรมเฉพาะภายในกรอบของพิกเซลที่ใช้
+
+    ผลลัพธ์ต่อพิกเซล: out = alpha * color + (1 - alpha) * frame
+
+    พิกเซลถูกแบ่งกลุ่มตามค่า alpha (เช่น พื้น 0.3 / ขอบ 0.7):
+        - กลุ่มที่หนาแน่น (พื้นที่ระบายสี): cv2.addWeighted ภายใน bounding box + cv2.copyTo ตาม mask
+        - กลุ่มที่บาง (เส้นขอบ): ผสมเฉพาะพิกเซลนั้นด้วย index ที่คำนวณไว้แล้ว
+    """
+
+    def __init__(self, color: np.ndarray, alpha: np.ndarray):
+        """
+        พารามิเตอร์:
+            color (np.ndarray): สีของ layer ขนาดเท่าเฟรม (H, W, 3) uint8.
+            alpha (np.ndarray): น้ำหนักของ layer ต่อพิกเซล (H, W) float32 [0, 1] (0 = ไม่ผสม).
+        """
+        height, width = alpha.shape[:2]
+        self.shape = (height, width)
+        self.dense = []   # [(x0, y0, x1, y1, alpha, color_crop, mask_crop หรือ None)]
+        self.sparse = []  # [(flat index, alpha, colors (N, 3))]
+
+        for level in np.unique(alpha):
+            if level <= 0:
+                continue
+            mask = alpha == level
+            ys, xs = np.nonzero(mask)
+            y0, y1 = int(ys.min()), int(ys.max()) + 1
+            x0, x1 = int(xs.min()), int(xs.max()) + 1
+            area = (y1 - y0) * (x1 - x0)
+            level = float(level)
+            if len(ys) >= area * _SPARSE_FILL_RATIO:
+                mask_crop = mask[y0:y1, x0:x1]
+                self.dense.append((
+                    x0, y0, x1, y1, level,
+                    np.ascontiguousarray(color[y0:y1, x0:x1]),
+                    None if mask_crop.all() else mask_crop.astype(np.uint8),
+                ))
+            else:
+                flat_index = ys.astype(np.intp) * width + xs
+                self.sparse.append((flat_index, level, np.ascontiguousarray(color[ys, xs])))
+
+    def matches(self, frame_shape) -> bool:
+        return self.shape == (int(frame_shape[0]), int(frame_shape[1]))
+
+    def apply(self, frame: np.ndarray) -> np.ndarray:
+        """ผสม layer ลงบนเฟรม (in-place)"""
+        for x0, y0, x1, y1, level, color, mask in self.dense:
+            roi = frame[y0:y1, x0:x1]
+            if level >= 1.0:
+                blended = color
+            else:
+                blended = cv2.addWeighted(roi, 1.0 - level, color, level, 0)
+            if mask is None:
+                roi[...] = blended
+            else:
+                cv2.copyTo(blended, mask, roi)
+        if self.sparse:
+            pixels = frame.reshape(-1, frame.shape[2]) if frame.flags.c_contiguous else None
+            for flat_index, level, colors in self.sparse:
+                if pixels is None:
+                    ys, xs = np.divmod(flat_index, self.shape[1])
+                    target = frame[ys, xs]
+                    frame[ys, xs] = colors if level >= 1.0 else cv2.addWeighted(target, 1.0 - level, colors, level, 0)
+                elif level >= 1.0:
+                    pixels[flat_index] = colors
+                else:
+                    pixels[flat_index] = cv2.addWeighted(pixels[flat_index], 1.0 - level, colors, level, 0)
+        return frame
+
+
+def build_zone_layer(frame_shape, pool_zone, safe_zone) -> BlendLayer:
+    """
+    Render สีพื้น (alpha 0.3) และขอบของพื้นที่ครั้งเดียว ให้ได้ผลเหมือน draw_zones()
+
+    draw_zones() วาดขอบลงบนเฟรมแล้วผสมทั้งเฟรมกับสำเนาที่ระบายสีพื้น:
+        - พื้นในพื้นที่:        0.3 * สีพื้น + 0.7 * เฟรม
+        - ขอบนอกพื้นที่อื่น:    0.7 * สีขอบ + 0.3 * เฟรม
+        - ขอบที่ทับสีพื้น:      0.7 * สีขอบ + 0.3 * สีพื้น
+    """
+    height, width = int(frame_shape[0]), int(frame_shape[1])
+    fill = np.zeros((height, width, 3), dtype=np.uint8)
+    fill_mask = np.zeros((height, width), dtype=np.uint8)
+    border = np.zeros((height, width, 3), dtype=np.uint8)
+    border_mask = np.zeros((height, width), dtype=np.uint8)
+
+    for zone, (fill_color, border_color) in ((pool_zone, POOL_COLORS), (safe_zone, SAFE_COLORS)):
+        if not zone or len(zone) < 3:
+            continue
+        pts = np.array(zone, dtype=np.int32)
+        cv2.fillPoly(fill, [pts], fill_color)
+        cv2.fillPoly(fill_mask, [pts], 1)
+        cv2.polylines(border, [pts], True, border_color, ZONE_BORDER_THICKNESS)
+        cv2.polylines(border_mask, [pts], True, 1, ZONE_BORDER_THICKNESS)
+
+    is_fill = fill_mask.astype(bool)
+    is_border = border_mask.astype(bool)
+    border_alpha = 1.0 - ZONE_FILL_ALPHA
+
+    alpha = np.zeros((height, width), dtype=np.float32)
+    alpha[is_fill] = ZONE_FILL_ALPHA
+    alpha[is_border] = border_alpha
+    alpha[is_border & is_fill] = 1.0
+
+    color = fill.astype(np.float32)
+    color[is_border] = border[is_border]
+    both = is_border & is_fill
+    color[both] = border_alpha * border[both] + ZONE_FILL_ALPHA * fill[both]
+    color = np.clip(np.rint(color), 0, 255).astype(np.uint8)
+
+    return BlendLayer(color, alpha)
+
+
+def build_panel_layer(frame_shape) -> BlendLayer:
+    """พื้นหลังสีดำโปร่งแสงของ Status Panel (เหมือน rectangle + addWeighted(0.6, 0.4))"""
+    height, width = int(frame_shape[0]), int(frame_shape[1])
+    x0, y0, x1, y1 = PANEL_RECT
+    color = np.zeros((height, width, 3), dtype=np.uint8)
+    alpha = np.zeros((height, width), dtype=np.float32)
+    alpha[y0:y1 + 1, x0:x1 + 1] = PANEL_ALPHA  # cv2.rectangle รวมจุดปลาย
+    return BlendLayer(color, alpha)
@@ -0,0 +1,141 @@
+import os
+import sys
+import time
+import threading
+import tracemalloc
+from collections import Counter
+
+
+class RuntimeProfiler:
+    """
+    Sampling profiler + tracemalloc diff ที่เปิดได้ระหว่างทำงาน (signal / ปุ่ม) โดยไม่ต้อง restart
+
+    ระหว่าง duration_sec วินาที thread แยกสุ่มอ่าน stack ของทุก thread ทุก interval_sec
+    (sys._current_frames - ไม่ต้องแก้โค้ดที่ถูกวัด) และ tracemalloc ติดตามหน่วยความจำที่จองใหม่
+    เมื่อครบเวลา (หรือสั่งหยุด) เขียนไฟล์ลง out_dir:
+        profile_<เวลา>.folded   - stack แบบ folded ("thread;a;b;c จำนวน") ใช้กับ flamegraph.pl / speedscope
+        memory_<เวลา>.txt       - ตำแหน่งที่จองหน่วยความจำเพิ่มขึ้นมากที่สุด (ยังไม่ถูกคืน) ระหว่างช่วงที่วัด
+    """
+
+    def __init__(self, out_dir: str, duration_sec: float = 30.0, interval_sec: float = 0.01,
+                 trace_frames: int = 10, top_n: int = 30):
+        """
+        พารามิเตอร์:
+            out_dir (str): โฟลเดอร์ผลลัพธ์.
+            duration_sec (float): ระยะเวลาที่วัดต่อครั้ง.
+            interval_sec (float): ระยะห่างของการสุ่ม stack (ยิ่งถี่ยิ่งละเอียดแต่ overhead สูงขึ้น).
+            trace_frames (int): จำนวนเฟรมของ traceback ที่ tracemalloc เก็บ.
+            top_n (int): จำนวนตำแหน่งที่แสดงในรายงานหน่วยความจำ.
+        """
+        self.out_dir = out_dir
+        self.duration_sec = duration_sec
+        self.interval_sec = interval_sec
+        self.trace_frames = trace_frames
+        self.top_n = top_n
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def toggle(self):
+        """เริ่มวัด หรือหยุดก่อนครบเวลา (เขียนผลทันที) ถ้ากำลังวัดอยู่"""
+        if self.running:
+            print("⏹️ [Profiler] หยุดก่อนครบเวลา - กำลังเขียนผล...")
+            self._stop.set()
+        else:
+            self.start()
+
+    def start(self) -> bool:
+        with self._lock:
+            if self.running:
+                return False
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="RuntimeProfiler", daemon=True)
+            self._thread.start()
+        return True
+
+    def install_signal(self, signum=None):
+        """สลับเปิด/ปิดด้วย signal (ค่าเริ่มต้น SIGUSR1 - ไม่มีบน Windows ให้ใช้ปุ่มแทน)"""
+        import signal
+        signum = signum or getattr(signal, "SIGUSR1", None)
+        if signum is None:
+            return False
+        try:
+            signal.signal(signum, lambda *_: self.toggle())
+        except ValueError:  # ไม่ได้อยู่ใน main thread
+            return False
+        return True
+
+    def _run(self):
+        os.makedirs(self.out_dir, exist_ok=True)
+        stamp = time.strftime("%Y%m%d_%H%M%S")
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(self.trace_frames)
+        baseline = tracemalloc.take_snapshot()
+        print(f"🔬 [Profiler] เริ่มวัด {self.duration_sec:g}s (stack ทุก {self.interval_sec * 1000:.0f} ms + tracemalloc)")
+
+        stacks = Counter()
+        samples = 0
+        own_id = threading.get_ident()
+        started = time.perf_counter()
+        deadline = started + self.duration_sec
+        while time.perf_counter() < deadline and not self._stop.is_set():
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stacks[self._fold(names.get(thread_id, str(thread_id)), frame)] += 1
+            samples += 1
+            self._stop.wait(self.interval_sec)
+        elapsed = time.perf_counter() - started
+
+        current = tracemalloc.take_snapshot()
+        if started_tracing:
+            tracemalloc.stop()
+
+        profile_path = os.path.join(self.out_dir, f"profile_{stamp}.folded")
+        with open(profile_path, "w", encoding="utf-8") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        memory_path = os.path.join(self.out_dir, f"memory_{stamp}.txt")
+        self._write_memory_report(memory_path, baseline, current, elapsed)
+        print(f"✅ [Profiler] {samples} samples / {elapsed:.1f}s -> {profile_path}, {memory_path}")
+
+    @staticmethod
+    def _fold(thread_name: str, frame) -> str:
+        """stack ของ thread หนึ่งเป็นบรรทัด folded (root ซ้าย) - ';' และช่องว่างถูกแทนเพื่อไม่ให้ปนกับตัวคั่น"""
+        parts = []
+        while frame is not None:
+            code = frame.f_code
+            parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        parts.append(thread_name)
+        return ";".join(part.replace(";", ":").replace(" ", "_") for part in reversed(parts))
+
+    def _write_memory_report(self, path: str, baseline, current, elapsed: float):
+        filters = [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),  # การจองของ profiler เอง
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ]
+        baseline, current = baseline.filter_traces(filters), current.filter_traces(filters)
+        by_line = current.compare_to(baseline, "lineno")
+        by_traceback = current.compare_to(baseline, "traceback")
+        total = sum(stat.size_diff for stat in by_line)
+
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"# หน่วยความจำที่จองเพิ่มและยังไม่ถูกคืนใน {elapsed:.1f}s: {total / 1024:.1f} KiB\n\n")
+            f.write(f"## Top {self.top_n} ตำแหน่ง (file:line)\n")
+            for stat in by_line[:self.top_n]:
+                frame = stat.traceback[0]
+                f.write(f"{stat.size_diff / 1024:+10.1f} KiB {stat.count_diff:+8d} blocks  {frame.filename}:{frame.lineno}\n")
+            f.write("\n## Top 5 traceback\n")
+            for stat in by_traceback[:5]:
+                f.write(f"\n{stat.size_diff / 1024:+.1f} KiB {stat.count_diff:+d} blocks\n")
+                for line in stat.traceback.format():
+                    f.write(f"    {line}\n")
@@ -0,0 +1,97 @@
+import time
+import bisect
+import threading
+from collections import deque
+from contextlib import contextmanager, nullcontext
+import numpy as np
+
+
+# ขอบบนของแต่ละช่องใน histogram (วินาที) สำหรับ /metrics
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class StageTimer:
+    """
+    เก็บเวลาที่ใช้ของแต่ละขั้นตอนใน pipeline (capture / inference / logic / annotation / alert ...)
+
+    stage() ที่อยู่ภายใน frame() ถูกรวมเวลาต่อเฟรมก่อนบันทึก (1 ค่าต่อเฟรมต่อขั้นตอน)
+    ส่วนเวลาที่เหลือของเฟรมบันทึกเป็น remainder_stage - ใช้ stage()/frame() จาก Main Loop เท่านั้น
+    thread อื่น (encoder / alert) บันทึกด้วย record() โดยตรง
+    """
+
+    def __init__(self, max_samples: int = 10000):
+        """
+        พารามิเตอร์:
+            max_samples (int): จำนวนค่าล่าสุดที่เก็บต่อขั้นตอน (0 = ไม่จำกัด).
+        """
+        self.max_samples = max_samples or None
+        self.samples = {}  # stage -> deque[วินาที]
+        self.histograms = {}  # stage -> [จำนวนต่อช่องของ LATENCY_BUCKETS (+ ช่องเกิน), ผลรวมวินาที, จำนวน] ตั้งแต่เริ่ม
+        self._lock = threading.Lock()
+        self._pending = None  # stage -> วินาทีสะสมของเฟรมที่กำลังวัด
+
+    def record(self, stage: str, seconds: float):
+        with self._lock:
+            samples = self.samples.get(stage)
+            if samples is None:
+                samples = self.samples[stage] = deque(maxlen=self.max_samples)
+            samples.append(seconds)
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = [[0] * (len(LATENCY_BUCKETS) + 1), 0.0, 0]
+            histogram[0][bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            histogram[1] += seconds
+            histogram[2] += 1
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            if self._pending is not None:
+                self._pending[name] = self._pending.get(name, 0.0) + elapsed
+            else:
+                self.record(name, elapsed)
+
+    @contextmanager
+    def frame(self, remainder_stage: str):
+        """วัดทั้งเฟรม: stage() ภายในบันทึกแยก เวลาที่เหลือบันทึกเป็น remainder_stage"""
+        self._pending = {}
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            total = time.perf_counter() - start
+            pending, self._pending = self._pending, None
+            for name, seconds in pending.items():
+                self.record(name, seconds)
+            self.record(remainder_stage, max(0.0, total - sum(pending.values())))
+
+    def histogram_snapshot(self) -> dict:
+        """{stage: (จำนวนต่อช่อง, ผลรวมวินาที, จำนวน)} ทั้งหมดตั้งแต่เริ่ม (ไม่จำกัดด้วย max_samples)"""
+        with self._lock:
+            return {name: (list(counts), total, count) for name, (counts, total, count) in self.histograms.items()}
+
+    def summary(self) -> dict:
+        """{stage: {count, mean_ms, p50_ms, p95_ms, p99_ms, max_ms}}"""
+        with self._lock:
+            snapshot = {name: np.array(samples) for name, samples in self.samples.items() if samples}
+        summary = {}
+        for name, values in snapshot.items():
+            p50, p95, p99 = np.percentile(values, [50, 95, 99]) * 1000.0
+            summary[name] = {
+                "count": int(len(values)),
+                "mean_ms": float(values.mean() * 1000.0),
+                "p50_ms": float(p50),
+                "p95_ms": float(p95),
+                "p99_ms": float(p99),
+                "max_ms": float(values.max() * 1000.0),
+            }
+        return summary
+
+
+def timed(timer, name: str):
+    """timer.stage(name) หรือ context ว่างเมื่อไม่ได้วัดเวลา (timer=None)"""
+    return timer.stage(name) if timer is not None else nullcontext()
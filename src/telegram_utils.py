@@ -1,89 +1,354 @@
 import os
+import time
 import asyncio
+import itertools
 import threading
+from collections import deque
 from telegram import Bot
+from telegram.error import BadRequest, Forbidden, InvalidToken
 from telegram.request import HTTPXRequest
 
+
+class BotApiTransport:
+    """
+    Transport เริ่มต้น: python-telegram-bot Bot หนึ่งตัวกับ HTTPX connection pool เดียว
+    (สร้างครั้งเดียวใน event loop ของ sender thread และใช้ซ้ำทุกการส่ง)
+
+    base_url ใช้ชี้ไปยัง Bot API server อื่นได้ (เช่น local Bot API server หรือ stand-in สำหรับทดสอบ)
+    """
+
+    def __init__(self, token: str, base_url: str = None, timeout_sec: float = 60, pool_size: int = 4):
+        self.token = token
+        self.base_url = base_url
+        self.timeout_sec = timeout_sec
+        self.pool_size = pool_size
+        self.bot = None
+
+    async def start(self):
+        request_config = HTTPXRequest(
+            connection_pool_size=self.pool_size,
+            read_timeout=self.timeout_sec,
+            write_timeout=self.timeout_sec,
+            connect_timeout=self.timeout_sec,
+        )
+        kwargs = {"token": self.token, "request": request_config}
+        if self.base_url:
+            kwargs["base_url"] = self.base_url
+        self.bot = Bot(**kwargs)
+        await self.bot.initialize()
+
+    async def close(self):
+        if self.bot is not None:
+            await self.bot.shutdown()
+            self.bot = None
+
+    async def send_message(self, chat_id, text: str):
+        await self.bot.send_message(chat_id=chat_id, text=text)
+
+    async def send_photo(self, chat_id, photo, caption: str = "", filename: str = None):
+        await self.bot.send_photo(chat_id=chat_id, photo=photo, caption=caption, filename=filename)
+
+    async def send_video(self, chat_id, video, caption: str = "", filename: str = None):
+        await self.bot.send_video(chat_id=chat_id, video=video, caption=caption, filename=filename,
+                                  supports_streaming=True)
+
+
+def _media_size(media) -> int:
+    if isinstance(media, (bytes, bytearray, memoryview)):
+        return len(media)
+    # seek/tell แทน fileno() - SpooledTemporaryFile ย้ายลงดิสก์เมื่อถูกเรียก fileno()
+    position = media.tell()
+    media.seek(0, os.SEEK_END)
+    size = media.tell()
+    media.seek(position)
+    return size
+
+
+# ลำดับความสำคัญของงาน: ค่าน้อยส่งก่อน (การแจ้งเตือนใช้ -ระดับ tier เพื่อให้ระดับสูงแซงคิว)
+PRIORITY_NORMAL = 0
+
+
 class TelegramBot:
-    def __init__(self, token, chat_id):
+    """
+    ส่งข้อความ/สื่อไปยัง Telegram แบบ non-blocking ผ่าน sender thread เดียว.
+
+    sender thread มี event loop และ transport (HTTP connection pool) ที่ใช้ซ้ำตลอดอายุโปรแกรม
+    จึงไม่ต้องสร้าง thread / loop / TCP+TLS ใหม่ทุกครั้งที่แจ้งเตือน งานที่รอส่งอยู่ในคิวที่จำกัดขนาด
+    และส่งซ้ำแบบ backoff เมื่อเครือข่ายมีปัญหา
+
+    งานแบ่งเป็น 2 ช่อง (lane) ที่ส่งพร้อมกันใน event loop เดียว: "text" (ข้อความ) และ "media" (รูป/วิดีโอ)
+    ข้อความจึงไม่ต้องรอการอัปโหลดไฟล์ใหญ่ ภายในแต่ละช่องงานเรียงตาม priority (ค่าน้อยก่อน) แล้วตามลำดับที่เข้าคิว
+    ช่อง media จำกัดขนาดที่ queue_size ส่วนช่อง text ไม่ทิ้งงาน (ข้อความแจ้งเตือนต้องไม่หายแม้รูป/คลิปค้างเต็มคิว)
+    """
+
+    def __init__(self,
+                 token,
+                 chat_id,
+                 transport=None,
+                 queue_size: int = 100,
+                 max_retries: int = 3,
+                 retry_backoff_sec: float = 1.0,
+                 base_url: str = None):
+        """
+        พารามิเตอร์:
+            token (str): Telegram Bot token.
+            chat_id (str): ปลายทางของข้อความ.
+            transport: อ็อบเจกต์ที่มี async start/close/send_message/send_photo/send_video
+                (send_photo/send_video รับ bytes / file-like และ filename, None = BotApiTransport).
+            queue_size (int): จำนวนงาน media สูงสุดที่รอส่ง (เต็มแล้ว media ใหม่ถูกทิ้ง - ข้อความไม่ถูกทิ้ง).
+            max_retries (int): จำนวนครั้งที่ลองส่งซ้ำเมื่อผิดพลาด.
+            retry_backoff_sec (float): เวลารอก่อนส่งซ้ำครั้งแรก (เพิ่มเป็น 2 เท่าทุกครั้ง).
+            base_url (str): Bot API base URL (ใช้กับ transport เริ่มต้นเท่านั้น).
+        """
         self.token = token
         self.chat_id = chat_id
+        self.transport = transport if transport is not None else BotApiTransport(token, base_url=base_url)
+        self.queue_size = queue_size
+        self.max_retries = max_retries
+        self.retry_backoff_sec = retry_backoff_sec
 
+        self._lanes = {}  # "text" / "media" -> asyncio.PriorityQueue (สร้างใน event loop ของ sender thread)
+        self._pending = {"text": 0, "media": 0}  # จำนวนงานที่รอส่งของแต่ละช่อง
+        self._pending_lock = threading.Lock()
+        self._seq = itertools.count()  # ลำดับการเข้าคิว (งาน priority เท่ากันส่งตามลำดับ)
+        self._loop = None
+        self._loop_ready = threading.Event()
+        self._thread = None
+        self._started = False
+        self._closed = False  # หลัง close() งานใหม่ถูกทิ้ง (นับเป็น dropped)
+        self._transport_ready = False
+        self._transport_lock = None
+        self._start_lock = threading.Lock()
 
-    async def send_message_async(self, text: str):
+        # สถิติการส่ง
+        self.sent_count = 0
+        self.failed_count = 0
+        self.dropped_count = 0
+        self.retry_count = 0
+        self.latency_sum = 0.0  # ผลรวม latency ของทุกงานที่ส่งสำเร็จ (วินาที)
+        self.latency_totals = {}  # priority -> [จำนวน, ผลรวมวินาที] ตั้งแต่เริ่ม
+        # (kind, วินาที, priority) ตั้งแต่เวลาตรวจพบ (detected_at) หรือเวลาเข้าคิว จนส่งสำเร็จ
+        self.send_latencies = deque(maxlen=200)
+
+    # ------------------------------------------------------------------
+    # Sender thread
+    # ------------------------------------------------------------------
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._closed:
+                return
+            if not self._started:
+                self._started = True
+                self._thread = threading.Thread(target=self._run_sender, name="TelegramSender", daemon=True)
+                self._thread.start()
+        self._loop_ready.wait()
+
+    def _run_sender(self):
+        """event loop เดียวของ sender thread - แต่ละช่องส่งงานของตัวเองทีละงาน"""
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._loop = loop
+        self._lanes = {"text": asyncio.PriorityQueue(), "media": asyncio.PriorityQueue()}
+        self._transport_lock = asyncio.Lock()
+        self._loop_ready.set()
         try:
-            # สร้าง request config และ bot instance ใหม่สำหรับ loop นี้โดยเฉพาะ
-            request_config = HTTPXRequest(read_timeout=60, write_timeout=60, connect_timeout=60)
-            bot = Bot(token=self.token, request=request_config)
-            async with bot:
-                await bot.send_message(chat_id=self.chat_id, text=text)
-            print("LOG: Successfully sent message")
-        except Exception as e:
-            print(f"LOG_ERROR: Failed to send message: {e}")
+            loop.run_until_complete(asyncio.gather(*(self._run_lane(name) for name in self._lanes)))
+        finally:
+            if self._transport_ready:
+                try:
+                    loop.run_until_complete(self.transport.close())
+                except Exception:
+                    pass
+            loop.close()
 
-    async def send_media_async(self, file_path, mode="photo", caption=""):
-        if not os.path.exists(file_path):
-            print(f"LOG_ERROR: File not found: {file_path}")
-            return
+    async def _run_lane(self, name: str):
+        lane = self._lanes[name]
+        while True:
+            job = await lane.get()
+            if job[2] is None:  # สัญญาณปิด (priority สูงสุด = หลังงานที่ค้างทั้งหมด)
+                break
+            try:
+                await self._process_job(job)
+            finally:
+                self._cleanup(job[5])
+                with self._pending_lock:
+                    self._pending[name] -= 1
 
+    @staticmethod
+    def _cleanup(cleanup):
+        """คืนทรัพยากรของงาน (ปิด buffer / ลบไฟล์ชั่วคราว) หลังส่งสำเร็จหรือล้มเหลว"""
+        if cleanup is None:
+            return
         try:
-            # สร้าง request config และ bot instance ใหม่สำหรับ loop นี้โดยเฉพาะ
-            # กำหนด Timeout เพื่อรองรับไฟล์วิดีโอขนาดใหญ่
-            request_config = HTTPXRequest(read_timeout=60, write_timeout=60, connect_timeout=60)
-            bot = Bot(token=self.token, request=request_config)
-            async with bot:
-                with open(file_path, 'rb') as f:
-                    if mode.lower() == "video":
-                        print(f"LOG: กำลังส่งวิดีโอ... (ขนาด: {os.path.getsize(file_path) / 1024 / 1024:.2f} MB)")
-                        await bot.send_video(
-                            chat_id=self.chat_id,
-                            video=f,
-                            caption=caption,
-                            supports_streaming=True
-                        )
-                    else:
-                        print(f"LOG: กำลังส่งรูปภาพ...")
-                        await bot.send_photo(
-                            chat_id=self.chat_id,
-                            photo=f,
-                            caption=caption
-                        )
-            print(f"LOG: Successfully sent {mode}")
+            cleanup()
         except Exception as e:
-            print(f"LOG_ERROR: Failed to send {mode}: {e}")
+            print(f"LOG_WARN: Cleanup failed: {e}")
+
+    async def _start_transport(self):
+        async with self._transport_lock:
+            if self._transport_ready:
+                return
+            await self.transport.start()
+            self._transport_ready = True
 
-    def _run_async_in_thread(self, coro):
-        """รัน async function ใน thread แยกด้วย event loop ใหม่ (non-blocking)"""
-        def run_in_thread():
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
+    async def _process_job(self, job):
+        priority, _, kind, coro_factory, origin, _ = job
+        delay = self.retry_backoff_sec
+        for attempt in range(self.max_retries + 1):
             try:
-                loop.run_until_complete(coro)
+                # เชื่อมต่อครั้งแรก (หรือเชื่อมต่อใหม่หลังล้มเหลว) ภายใน retry loop เดียวกัน
+                await self._start_transport()
+                await coro_factory()
+                self.sent_count += 1
+                latency = time.time() - origin
+                self.send_latencies.append((kind, latency, priority))
+                self.latency_sum += latency
+                totals = self.latency_totals.setdefault(priority, [0, 0.0])
+                totals[0] += 1
+                totals[1] += latency
+                print(f"LOG: Successfully sent {kind} ({latency * 1000:.0f} ms)")
+                return
+            except (BadRequest, Forbidden, InvalidToken, FileNotFoundError) as e:
+                # ส่งซ้ำไม่ช่วย (ข้อมูล/สิทธิ์ไม่ถูกต้อง หรือไม่มีไฟล์ media)
+                print(f"LOG_ERROR: Failed to send {kind}: {e}")
+                break
             except Exception as e:
-                print(f"LOG_ERROR: Async thread error: {e}")
-            finally:
-                try:
-                    # ปิด pending tasks
-                    pending = asyncio.all_tasks(loop)
-                    for task in pending:
-                        task.cancel()
-                    if pending:
-                        loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
-                except Exception:
-                    pass
-                finally:
-                    loop.close()
-        
-        thread = threading.Thread(target=run_in_thread, daemon=True)
-        thread.start()
-        return thread
-
-    def send_media(self, file_path, mode="photo", caption=""):
-        """ส่ง media แบบ non-blocking ใน thread แยก"""
-        coro = self.send_media_async(file_path, mode, caption)
-        self._run_async_in_thread(coro)
-
-    def send_message(self, text: str):
-        """ส่งข้อความแบบ non-blocking ใน thread แยก"""
-        coro = self.send_message_async(text)
-        self._run_async_in_thread(coro)
\ No newline at end of file
+                if attempt >= self.max_retries:
+                    print(f"LOG_ERROR: Failed to send {kind} after {attempt + 1} attempts: {e}")
+                    break
+                # RetryAfter (flood control) บอกเวลารอมาให้
+                retry_after = getattr(e, "retry_after", None)
+                if hasattr(retry_after, "total_seconds"):
+                    retry_after = retry_after.total_seconds()
+                wait_sec = float(retry_after) if retry_after else delay
+                print(f"LOG_WARN: Send {kind} failed ({e}) - retry in {wait_sec:.1f}s")
+                self.retry_count += 1
+                await asyncio.sleep(wait_sec)
+                delay *= 2
+        self.failed_count += 1
+
+    def _enqueue(self, kind: str, coro_factory, priority: int = PRIORITY_NORMAL, detected_at: float = None,
+                 cleanup=None) -> bool:
+        self._ensure_started()
+        name = "text" if kind == "message" else "media"
+        with self._pending_lock:
+            if self._closed:
+                reason = "sender closed"
+            elif name == "media" and self._pending[name] >= self.queue_size:
+                reason = "media queue full"
+            else:
+                reason = None
+            if reason is not None:
+                self.dropped_count += 1
+                print(f"LOG_ERROR: Telegram {reason} - dropped {kind}")
+                self._cleanup(cleanup)
+                return False
+            self._pending[name] += 1
+            # เข้าคิวภายใต้ lock เดียวกับ close() -> งานอยู่ก่อนสัญญาณปิดเสมอ
+            job = (priority, next(self._seq), kind, coro_factory,
+                   detected_at if detected_at is not None else time.time(), cleanup)
+            self._loop.call_soon_threadsafe(self._lanes[name].put_nowait, job)
+        return True
+
+    # ------------------------------------------------------------------
+    # Async API (รันใน event loop ของ sender thread)
+    # ------------------------------------------------------------------
+    async def send_message_async(self, text: str):
+        await self.transport.send_message(self.chat_id, text)
+
+    async def send_media_async(self, media, mode="photo", caption="", filename: str = None):
+        """
+        media: path ของไฟล์, bytes หรือ file-like (เช่น SpooledTemporaryFile - อ่านตั้งแต่ต้นทุกครั้งที่ส่งซ้ำ)
+
+        ไม่มีไฟล์ตาม path -> FileNotFoundError (นับเป็นส่งไม่สำเร็จ ไม่ส่งซ้ำ)
+        """
+        if isinstance(media, (str, os.PathLike)):
+            if not os.path.exists(media):
+                raise FileNotFoundError(f"File not found: {media}")
+            with open(media, 'rb') as f:
+                await self._send_file(f, mode, caption, filename or os.path.basename(media))
+            return
+        if hasattr(media, "seek"):
+            media.seek(0)
+        await self._send_file(media, mode, caption, filename)
+
+    async def _send_file(self, media, mode: str, caption: str, filename: str):
+        if mode.lower() == "video":
+            print(f"LOG: กำลังส่งวิดีโอ... (ขนาด: {_media_size(media) / 1024 / 1024:.2f} MB)")
+            await self.transport.send_video(self.chat_id, media, caption=caption, filename=filename)
+        else:
+            print(f"LOG: กำลังส่งรูปภาพ...")
+            await self.transport.send_photo(self.chat_id, media, caption=caption, filename=filename)
+
+    # ------------------------------------------------------------------
+    # Public API (non-blocking)
+    # ------------------------------------------------------------------
+    def send_media(self, media, mode="photo", caption="", priority: int = PRIORITY_NORMAL,
+                   detected_at: float = None, filename: str = None, delete_after: bool = False):
+        """
+        ส่ง media แบบ non-blocking (เข้าช่อง media ของ sender thread)
+
+        media: path ของไฟล์, bytes หรือ file-like - file-like ถูกปิดเมื่องานจบ (ส่งสำเร็จ / ล้มเหลว / ถูกทิ้ง)
+        detected_at: epoch ที่ตรวจพบเหตุการณ์ - latency นับจากเวลานี้แทนเวลาเข้าคิว
+        filename: ชื่อไฟล์ที่ Telegram เห็น (bytes / file-like)
+        delete_after: ลบไฟล์ media (path) เมื่องานจบ
+        """
+        cleanup = None
+        if hasattr(media, "close"):
+            cleanup = media.close
+        elif delete_after and isinstance(media, (str, os.PathLike)):
+            cleanup = lambda: os.path.exists(media) and os.remove(media)
+        return self._enqueue(mode, lambda: self.send_media_async(media, mode, caption, filename), priority,
+                             detected_at, cleanup)
+
+    def send_message(self, text: str, priority: int = PRIORITY_NORMAL, detected_at: float = None):
+        """ส่งข้อความแบบ non-blocking (เข้าช่อง text - ไม่รอการอัปโหลดรูป/วิดีโอ)"""
+        return self._enqueue("message", lambda: self.send_message_async(text), priority, detected_at)
+
+    def pending(self) -> int:
+        return sum(self._pending.values())
+
+    def latency_by_priority(self) -> dict:
+        """{priority: {count, p50_ms, max_ms}} จากการส่งล่าสุด (send_latencies)"""
+        groups = {}
+        for _, latency, priority in list(self.send_latencies):
+            groups.setdefault(priority, []).append(latency)
+        summary = {}
+        for priority, latencies in sorted(groups.items()):
+            latencies.sort()
+            summary[priority] = {
+                "count": len(latencies),
+                "p50_ms": latencies[len(latencies) // 2] * 1000.0,
+                "max_ms": latencies[-1] * 1000.0,
+            }
+        return summary
+
+    def stats(self) -> dict:
+        latencies = sorted(latency for _, latency, _ in self.send_latencies)
+        return {
+            "sent": self.sent_count,
+            "failed": self.failed_count,
+            "dropped": self.dropped_count,
+            "retries": self.retry_count,
+            "pending": self.pending(),
+            "latency_p50_ms": latencies[len(latencies) // 2] * 1000.0 if latencies else 0.0,
+            "latency_max_ms": latencies[-1] * 1000.0 if latencies else 0.0,
+        }
+
+    def close(self, timeout: float = 10.0):
+        """ส่งงานที่ค้างในคิวให้หมด (รอไม่เกิน timeout) แล้วปิด sender thread - งานที่ส่งเข้ามาหลังจากนี้ถูกทิ้ง"""
+        with self._start_lock:
+            if self._closed:
+                return
+            self._closed = True
+            if not self._started:
+                return
+        self._loop_ready.wait()
+        with self._pending_lock:
+            if self._loop.is_closed():
+                return
+            for lane in self._lanes.values():
+                self._loop.call_soon_threadsafe(lane.put_nowait,
+                                                (float("inf"), next(self._seq), None, None, None, None))
+        if self._thread is not None:
+            self._thread.join(timeout)
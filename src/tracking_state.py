@@ -0,0 +1,115 @@
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+
+class PersonState:
+    """สถานะการติดตามของคนหนึ่งคน (ใช้ __slots__ แทน dict ต่อคน)"""
+
+    __slots__ = (
+        "display_id",
+        "last_seen",
+        "last_position",
+        "missing_alerted",
+        "missing_alert_level",   # ระดับการแจ้งเตือนที่ส่งไปแล้ว (0 = ยังไม่เคย)
+        "last_repeat_alert",     # เวลาที่ส่งแจ้งเตือนซ้ำครั้งล่าสุด
+        "acknowledged",          # กดปุ่ม S หยุดแจ้งเตือนแล้วหรือไม่
+        "submerged_logged",      # บันทึกลง submerged แล้ว (ป้องกัน print ซ้ำ)
+        "counted_as_missing",    # นับรวมใน missing_in_pool_count แล้ว
+    )
+
+    def __init__(self, display_id: int, last_seen: float, last_position):
+        self.display_id = display_id
+        self.last_seen = last_seen
+        self.last_position = last_position
+        self.missing_alerted = False
+        self.missing_alert_level = 0
+        self.last_repeat_alert = 0
+        self.acknowledged = False
+        self.submerged_logged = False
+        self.counted_as_missing = False
+
+    def copy(self) -> "PersonState":
+        clone = PersonState.__new__(PersonState)
+        for name in PersonState.__slots__:
+            setattr(clone, name, getattr(self, name))
+        return clone
+
+    def mark_seen(self, ts: float, position):
+        """คนโผล่ขึ้นมาแล้ว - อัพเดทตำแหน่งและรีเซ็ตสถานะการแจ้งเตือนทั้งหมด"""
+        self.last_seen = ts
+        self.last_position = position
+        self.missing_alerted = False
+        self.missing_alert_level = 0
+        self.last_repeat_alert = 0
+        self.acknowledged = False
+        self.submerged_logged = False
+
+
+class SubmergedRegistry:
+    """
+    คนที่หายไปใน Pool Zone (อาจดำน้ำ) ที่รอ re-identify - เก็บแบบ array ต่อคอลัมน์
+
+    ตำแหน่ง/เวลาอยู่ใน NumPy array จึงจับคู่ track ใหม่ทุกตัวกับผู้ที่หายไปทุกคนได้ในครั้งเดียว
+    (distance matrix + optimal assignment) แทนการวนหาคนที่ใกล้ที่สุดทีละ track
+    """
+
+    def __init__(self):
+        self.display_ids = []
+        self.states = []
+        self.positions = np.zeros((0, 2), dtype=np.float64)
+        self.times = np.zeros(0, dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.display_ids)
+
+    def __contains__(self, display_id) -> bool:
+        return display_id in self.display_ids
+
+    def add(self, display_id: int, position, time: float, state: PersonState):
+        self.display_ids.append(display_id)
+        self.states.append(state)
+        self.positions = np.vstack([self.positions, np.asarray(position, dtype=np.float64).reshape(1, 2)])
+        self.times = np.append(self.times, float(time))
+
+    def pop(self, display_id: int) -> PersonState:
+        """ลบออกและคืนสถานะที่บันทึกไว้ (None = ไม่มี)"""
+        if display_id not in self.display_ids:
+            return None
+        index = self.display_ids.index(display_id)
+        state = self.states[index]
+        self._keep(np.arange(len(self.display_ids)) != index)
+        return state
+
+    def expire(self, ts: float, max_age_sec: float) -> int:
+        """ลบผู้ที่หายไปนานกว่า max_age_sec (เรียกครั้งเดียวต่อเฟรม) - คืนจำนวนที่ลบ"""
+        keep = (ts - self.times) <= max_age_sec
+        removed = int(len(keep) - keep.sum())
+        if removed:
+            self._keep(keep)
+        return removed
+
+    def _keep(self, keep: np.ndarray):
+        indices = np.flatnonzero(keep).tolist()
+        self.display_ids = [self.display_ids[i] for i in indices]
+        self.states = [self.states[i] for i in indices]
+        self.positions = self.positions[keep]
+        self.times = self.times[keep]
+
+    def match(self, points, ts: float, max_age_sec: float) -> list:
+        """
+        จับคู่ตำแหน่งของ track ใหม่ทั้งหมดกับผู้ที่หายไป (ภายใน max_age_sec) แบบ optimal
+        (ผลรวมระยะทางต่ำสุด) ด้วย linear_sum_assignment
+
+        คืนค่า:
+            list: [(ลำดับของจุด, display_id, ระยะทาง px)]
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        candidates = np.flatnonzero((ts - self.times) <= max_age_sec)
+        if len(points) == 0 or len(candidates) == 0:
+            return []
+
+        diff = points[:, None, :] - self.positions[candidates][None, :, :]
+        distances = np.sqrt((diff * diff).sum(axis=2))
+        rows, cols = linear_sum_assignment(distances)
+        return [(int(row), self.display_ids[candidates[col]], float(distances[row, col]))
+                for row, col in zip(rows, cols)]
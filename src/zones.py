@@ -0,0 +1,271 @@
+import os
+import json
+import cv2
+import numpy as np
+
+
+def load_zones(zones_file):
+    """โหลดพื้นที่จากไฟล์ zones.json"""
+    if os.path.exists(zones_file):
+        try:
+            with open(zones_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+                return data.get("pool_zone"), data.get("safe_zone")
+        except Exception as e:
+            print(f"⚠️ โหลด {zones_file} ไม่สำเร็จ: {e}")
+    return None, None
+
+
+def save_zones(zones_file, pool_zone, safe_zone):
+    """บันทึกพื้นที่ลงไฟล์ zones.json"""
+    data = {"pool_zone": pool_zone, "safe_zone": safe_zone}
+    with open(zones_file, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    print(f"✅ บันทึกพื้นที่ลง {zones_file} เรียบร้อย")
+
+
+def zones_bounding_rect(frame_shape, zones, margin_px: int = 0):
+    """
+    กรอบสี่เหลี่ยมที่ครอบทุกพื้นที่ (เผื่อขอบ margin_px) ภายในเฟรม
+
+    คืนค่า:
+        (x0, y0, x1, y1) แบบ slice (x1/y1 ไม่รวม) หรือ None เมื่อไม่มีพื้นที่
+    """
+    points = [p for zone in zones if zone and len(zone) >= 3 for p in zone]
+    if not points:
+        return None
+    height, width = int(frame_shape[0]), int(frame_shape[1])
+    x, y, w, h = cv2.boundingRect(np.array(points, dtype=np.int32))
+    x0, y0 = max(0, x - margin_px), max(0, y - margin_px)
+    x1, y1 = min(width, x + w + margin_px), min(height, y + h + margin_px)
+    if x0 >= x1 or y0 >= y1:
+        return None
+    return x0, y0, x1, y1
+
+
+def draw_zones(frame, pool_zone, safe_zone):
+    """วาดพื้นที่บนเฟรม"""
+    overlay = frame.copy()
+    
+    # วาดพื้นที่สระว่ายน้ำ (สีฟ้า)
+    if pool_zone and len(pool_zone) >= 3:
+        pts = np.array(pool_zone, dtype=np.int32)
+        cv2.fillPoly(overlay, [pts], (255, 200, 100))  # สีฟ้าอ่อน
+        cv2.polylines(frame, [pts], True, (255, 150, 0), 3)  # ขอบสีฟ้าเข้ม
+    
+    # วาดพื้นที่ปลอดภัย (สีเขียว)
+    if safe_zone and len(safe_zone) >= 3:
+        pts = np.array(safe_zone, dtype=np.int32)
+        cv2.fillPoly(overlay, [pts], (100, 255, 100))  # สีเขียวอ่อน
+        cv2.polylines(frame, [pts], True, (0, 200, 0), 3)  # ขอบสีเขียวเข้ม
+    
+    # ผสมภาพ
+    cv2.addWeighted(overlay, 0.3, frame, 0.7, 0, frame)
+    return frame
+
+
+class ZoneSelector:
+    """คลาสสำหรับเลือกพื้นที่ด้วยการคลิกเมาส์"""
+    
+    def __init__(self, window_name):
+        self.window_name = window_name
+        self.points = []
+        self.current_zone = None
+        self.done = False
+        
+    def mouse_callback(self, event, x, y, flags, param):
+        if event == cv2.EVENT_LBUTTONDOWN:
+            self.points.append((x, y))
+        elif event == cv2.EVENT_RBUTTONDOWN:
+            if len(self.points) >= 3:
+                self.current_zone = self.points.copy()
+                self.done = True
+    
+    def select_zone(self, frame, zone_name, color):
+        """ให้ผู้ใช้เลือกพื้นที่"""
+        self.points = []
+        self.current_zone = None
+        self.done = False
+        
+        cv2.namedWindow(self.window_name)
+        cv2.setMouseCallback(self.window_name, self.mouse_callback)
+        
+        print(f"\n📍 กำหนด{zone_name}:")
+        print("   - คลิกซ้าย = เพิ่มจุด")
+        print("   - คลิกขวา = ยืนยัน (ต้องมีอย่างน้อย 3 จุด)")
+        print("   - กด 's' = ข้าม (ไม่กำหนดพื้นที่นี้)")
+        print("   - กด 'r' = รีเซ็ตจุด")
+        
+        while not self.done:
+            display = frame.copy()
+            
+            # วาดจุดที่คลิก
+            for i, pt in enumerate(self.points):
+                cv2.circle(display, pt, 6, color, -1)
+                cv2.putText(display, str(i+1), (pt[0]+10, pt[1]-10),
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+            
+            # วาดเส้นเชื่อม
+            if len(self.points) > 1:
+                for i in range(len(self.points) - 1):
+                    cv2.line(display, self.points[i], self.points[i+1], color, 2)
+            
+            # วาดเส้นปิด polygon (ถ้ามีอย่างน้อย 3 จุด)
+            if len(self.points) >= 3:
+                cv2.line(display, self.points[-1], self.points[0], color, 2, cv2.LINE_AA)
+                pts = np.array(self.points, dtype=np.int32)
+                overlay = display.copy()
+                cv2.fillPoly(overlay, [pts], (*color[:3], 50))
+                cv2.addWeighted(overlay, 0.3, display, 0.7, 0, display)
+            
+            # แสดงคำแนะนำ
+            cv2.putText(display, f"Selecting: {zone_name}", (10, 30),
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.8, color, 2)
+            cv2.putText(display, f"Points: {len(self.points)} | Left-click: Add | Right-click: Done | 's': Skip | 'r': Reset",
+                       (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+            
+            cv2.imshow(self.window_name, display)
+            key = cv2.waitKey(1) & 0xFF
+            
+            if key == ord('s'):  # Skip
+                print(f"   ⏭️ ข้าม{zone_name}")
+                return None
+            elif key == ord('r'):  # Reset
+                self.points = []
+                print("   🔄 รีเซ็ตจุด")
+            elif key == ord('q'):  # Quit
+                return None
+        
+        print(f"   ✅ กำหนด{zone_name}เรียบร้อย ({len(self.current_zone)} จุด)")
+        return self.current_zone
+
+
+def setup_zones(cap, zones_file, window_name="Zone Setup"):
+    """ตั้งค่าพื้นที่ก่อนเริ่มระบบ"""
+    print("\n" + "=" * 60)
+    print("🎯 โหมดกำหนดพื้นที่ (Zone Setup)")
+    print("=" * 60)
+    
+    # โหลดพื้นที่เดิม
+    pool_zone, safe_zone = load_zones(zones_file)
+    
+    if pool_zone or safe_zone:
+        print("\n📂 พบพื้นที่ที่บันทึกไว้:")
+        if pool_zone:
+            print(f"   🔵 พื้นที่สระว่ายน้ำ: {len(pool_zone)} จุด")
+        if safe_zone:
+            print(f"   🟢 พื้นที่ปลอดภัย: {len(safe_zone)} จุด")
+        
+        # อ่านเฟรมแรก
+        ok, frame = cap.read()
+        if not ok:
+            print("❌ ไม่สามารถอ่านเฟรมจากกล้องได้")
+            return pool_zone, safe_zone
+        
+        # แสดงพื้นที่เดิม
+        display = draw_zones(frame.copy(), pool_zone, safe_zone)
+        cv2.putText(display, "Press 'y' to use saved zones, 'n' to reset, 'q' to quit",
+                   (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        cv2.imshow(window_name, display)
+        
+        print("\n❓ ต้องการใช้พื้นที่เดิมหรือไม่?")
+        print("   'y' = ใช้พื้นที่เดิม")
+        print("   'n' = กำหนดใหม่")
+        print("   'q' = ออก")
+        
+        while True:
+            key = cv2.waitKey(0) & 0xFF
+            if key == ord('y'):
+                print("✅ ใช้พื้นที่เดิม")
+                cv2.destroyWindow(window_name)
+                return pool_zone, safe_zone
+            elif key == ord('n'):
+                print("🔄 กำหนดพื้นที่ใหม่...")
+                pool_zone, safe_zone = None, None
+                break
+            elif key == ord('q'):
+                cv2.destroyWindow(window_name)
+                return None, None
+    
+    # อ่านเฟรมแรก
+    ok, frame = cap.read()
+    if not ok:
+        print("❌ ไม่สามารถอ่านเฟรมจากกล้องได้")
+        return None, None
+    
+    selector = ZoneSelector(window_name)
+    
+    # กำหนดพื้นที่สระว่ายน้ำ (สีฟ้า)
+    pool_zone = selector.select_zone(frame.copy(), "พื้นที่สระว่ายน้ำ (Pool Zone)", (255, 150, 0))
+    
+    # กำหนดพื้นที่ปลอดภัย (สีเขียว) - optional
+    safe_zone = selector.select_zone(frame.copy(), "พื้นที่ปลอดภัย (Safe Zone)", (0, 200, 0))
+    
+    cv2.destroyWindow(window_name)
+    
+    # บันทึกพื้นที่
+    if pool_zone or safe_zone:
+        save_zones(zones_file, pool_zone, safe_zone)
+    
+    return pool_zone, safe_zone
+
+
+class ZoneMask:
+    """
+    Label mask ของพื้นที่ที่ rasterize ไว้ล่วงหน้า (สร้างครั้งเดียว จนกว่าพื้นที่จะเปลี่ยน).
+
+    แต่ละพื้นที่ใช้ 1 bit ในแต่ละพิกเซล จึงรองรับพื้นที่ซ้อนทับกันได้ (เช่น pool กับ safe)
+    และจำนวนพื้นที่ไม่มีผลต่อเวลาในการตรวจสอบ: ทุกจุดใช้การอ่าน array เพียงครั้งเดียว
+    แทนการเรียก cv2.pointPolygonTest ทีละจุดทีละพื้นที่
+    """
+
+    MAX_ZONES = 64
+
+    def __init__(self, zones: dict, frame_shape):
+        """
+        พารามิเตอร์:
+            zones (dict): {ชื่อพื้นที่: polygon [[x, y], ...]} (polygon ที่เป็น None หรือน้อยกว่า 3 จุดจะถูกข้าม).
+            frame_shape (tuple): shape ของเฟรม (height, width, ...).
+        """
+        if len(zones) > self.MAX_ZONES:
+            raise ValueError(f"ZoneMask รองรับได้สูงสุด {self.MAX_ZONES} พื้นที่ (ได้รับ {len(zones)})")
+
+        self.height, self.width = int(frame_shape[0]), int(frame_shape[1])
+        if len(zones) <= 8:
+            dtype = np.uint8
+        elif len(zones) <= 16:
+            dtype = np.uint16
+        elif len(zones) <= 32:
+            dtype = np.uint32
+        else:
+            dtype = np.uint64
+
+        self.mask = np.zeros((self.height, self.width), dtype=dtype)
+        self.bits = {}
+        layer = np.zeros((self.height, self.width), dtype=np.uint8)
+        for index, (name, polygon) in enumerate(zones.items()):
+            bit = dtype(1) << dtype(index)
+            self.bits[name] = bit
+            if not polygon or len(polygon) < 3:
+                continue
+            layer.fill(0)
+            cv2.fillPoly(layer, [np.array(polygon, dtype=np.int32)], 1)
+            self.mask[layer.astype(bool)] |= bit
+
+    def matches(self, frame_shape) -> bool:
+        return self.height == int(frame_shape[0]) and self.width == int(frame_shape[1])
+
+    def lookup(self, points) -> np.ndarray:
+        """คืนค่า bit flags ของพื้นที่ที่แต่ละจุดอยู่ (จุดที่อยู่นอกเฟรม = 0)"""
+        pts = np.asarray(points, dtype=np.int64).reshape(-1, 2)
+        flags = np.zeros(len(pts), dtype=self.mask.dtype)
+        if len(pts) == 0:
+            return flags
+        xs, ys = pts[:, 0], pts[:, 1]
+        valid = (xs >= 0) & (xs < self.width) & (ys >= 0) & (ys < self.height)
+        flags[valid] = self.mask[ys[valid], xs[valid]]
+        return flags
+
+    def contains(self, name, points) -> np.ndarray:
+        """ตรวจสอบว่าแต่ละจุดอยู่ในพื้นที่ name หรือไม่ (คืนค่า bool array)"""
+        return (self.lookup(points) & self.bits[name]) != 0
@@ -0,0 +1,140 @@
+import contextlib
+import io
+import unittest
+
+from src.alert_manager import AlertManager
+from src.clock import VideoClock
+
+
+class FakeBot:
+    """เก็บข้อความที่ส่ง (เวลาตาม clock, ข้อความ, priority) แทน TelegramBot"""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.messages = []
+
+    def send_message(self, text, priority=0, detected_at=None):
+        self.messages.append((round(self.clock.now(), 2), text, priority))
+        return True
+
+
+class AlertSchedulingTest(unittest.TestCase):
+    """การรวม / พัก / cooldown ของ AlertManager.flush - ส่งเฉพาะข้อความ (ไม่มีรูป / คลิป)"""
+
+    def make_manager(self, cooldown_sec=0.0, coalesce_sec=1.0, urgent_level=5):
+        self.clock = VideoClock(origin=1000.0)
+        self.clock.advance(1000.0)
+        self.bot = FakeBot(self.clock)
+        return AlertManager(self.bot, "alert", send_message=True, send_photo=False, send_video=False,
+                            snapshot_path="", video_path="", video_duration_sec=1, video_fps=10,
+                            video_codec="mp4v", alert_cooldown_sec=cooldown_sec,
+                            coalesce_window_sec=coalesce_sec, urgent_level=urgent_level, clock=self.clock)
+
+    def trigger(self, manager, display_id, level, seconds):
+        template = "ID{id} หายไป {seconds} วินาที" if level < 5 else "🆘 ID{id} หายไปนานกว่า {seconds} วินาที"
+        text = template.format(id=display_id, seconds=seconds)
+        return manager.trigger_alert(None, None, text, level=level, display_id=display_id,
+                                     message_template=template, detected_ts=self.clock.now(),
+                                     missing_sec=seconds)
+
+    def run_frames(self, manager, seconds, fps=10):
+        """เลื่อนเวลาทีละเฟรมและเรียก flush เหมือน process_frame ของ Main Loop"""
+        for _ in range(int(round(seconds * fps))):
+            self.clock.advance(self.clock.now() + 1.0 / fps)
+            manager.flush()
+
+    def setUp(self):
+        self._stdout = contextlib.redirect_stdout(io.StringIO())
+        self._stdout.__enter__()
+
+    def tearDown(self):
+        self._stdout.__exit__(None, None, None)
+
+    def test_coalesces_ids_of_same_tier_into_one_message(self):
+        manager = self.make_manager()
+        self.trigger(manager, 2, 3, 30)
+        manager.flush()
+        self.run_frames(manager, 0.3)
+        self.trigger(manager, 5, 3, 31)
+        self.run_frames(manager, 1.0)
+
+        self.assertEqual(len(self.bot.messages), 1)
+        self.assertEqual(self.bot.messages[0][1], "ID2, ID5 หายไป 31 วินาที")
+        self.assertEqual(self.bot.messages[0][2], -3)
+
+    def test_hold_window_delays_new_incident(self):
+        manager = self.make_manager(coalesce_sec=1.0)
+        self.trigger(manager, 2, 1, 20)
+        self.run_frames(manager, 0.9)
+        self.assertEqual(self.bot.messages, [])
+
+        self.run_frames(manager, 0.2)
+        self.assertEqual([text for _, text, _ in self.bot.messages], ["ID2 หายไป 20 วินาที"])
+        self.assertAlmostEqual(self.bot.messages[0][0], 1001.0, places=1)
+
+    def test_urgent_level_skips_hold(self):
+        manager = self.make_manager(coalesce_sec=1.0, urgent_level=5)
+        self.trigger(manager, 2, 5, 40)
+        manager.flush()
+
+        self.assertEqual(len(self.bot.messages), 1)
+        self.assertEqual(self.bot.messages[0][0], 1000.0)
+
+    def test_escalation_during_cooldown_is_sent_immediately(self):
+        manager = self.make_manager(cooldown_sec=10.0)
+        self.trigger(manager, 2, 1, 20)
+        self.run_frames(manager, 1.1)
+        self.assertEqual(len(self.bot.messages), 1)
+
+        self.run_frames(manager, 2.0)
+        self.trigger(manager, 2, 2, 25)
+        manager.flush()
+        self.assertEqual(len(self.bot.messages), 2)
+        self.assertEqual(self.bot.messages[1][1], "ID2 หายไป 25 วินาที")
+
+    def test_same_level_waits_for_cooldown_release(self):
+        manager = self.make_manager(cooldown_sec=10.0)
+        self.trigger(manager, 2, 2, 25)
+        self.run_frames(manager, 1.1)
+        sent_at = self.bot.messages[0][0]
+
+        self.trigger(manager, 5, 2, 25)
+        self.run_frames(manager, 5.0)
+        self.assertEqual(len(self.bot.messages), 1)
+
+        self.run_frames(manager, 6.0)
+        self.assertEqual(len(self.bot.messages), 2)
+        self.assertGreaterEqual(self.bot.messages[1][0], sent_at + 10.0)
+
+    def test_new_incident_after_cooldown_is_not_blocked_by_previous_level(self):
+        manager = self.make_manager(cooldown_sec=10.0)
+        self.trigger(manager, 2, 5, 40)
+        manager.flush()
+        self.run_frames(manager, 15.0)
+
+        self.trigger(manager, 7, 1, 20)
+        self.run_frames(manager, 1.1)
+        self.assertEqual([text for _, text, _ in self.bot.messages][-1], "ID7 หายไป 20 วินาที")
+
+    def test_close_flushes_held_alerts_and_rejects_new_ones(self):
+        manager = self.make_manager(coalesce_sec=5.0)
+        self.trigger(manager, 2, 1, 20)
+        manager.flush()
+        self.assertEqual(self.bot.messages, [])
+
+        manager.close()
+        self.assertEqual(len(self.bot.messages), 1)
+        self.assertFalse(self.trigger(manager, 3, 1, 20))
+
+    def test_coalesce_uses_longest_missing_time_of_group(self):
+        template = "🆘 ID{id} หายไปนานกว่า {seconds} วินาที"
+        alerts = [
+            {"level": 5, "template": template, "text": template.format(id=i, seconds=int(sec)),
+             "display_id": i, "detected_at": 0.0, "missing_sec": sec}
+            for i, sec in ((2, 63.4), (5, 48.9))
+        ]
+        self.assertEqual(AlertManager._coalesce(alerts), [(5, "🆘 ID2, ID5 หายไปนานกว่า 63 วินาที", 0.0)])
+
+
+if __name__ == "__main__":
+    unittest.main()
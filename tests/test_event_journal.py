@@ -0,0 +1,68 @@
+import contextlib
+import io
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+
+from src.event_journal import EventJournal
+
+
+class JournalWriterErrorTest(unittest.TestCase):
+    """writer thread ของ EventJournal ต้องรอดจาก SQLite ผิดพลาด (เขียนซ้ำ / ทิ้ง batch แล้วทำงานต่อ)"""
+
+    def setUp(self):
+        self._stdout = contextlib.redirect_stdout(io.StringIO())
+        self._stdout.__enter__()
+        self._dir = tempfile.TemporaryDirectory()
+        self.journal = EventJournal(os.path.join(self._dir.name, "events.db"), flush_interval_sec=0.05,
+                                    retry_sec=0.01, max_retries=3)
+        self.failures = 0
+        write_batch = self.journal._write_batch
+
+        def flaky_write(connection, batch):
+            if self.failures > 0:
+                self.failures -= 1
+                raise sqlite3.OperationalError("database is locked")
+            write_batch(connection, batch)
+
+        self.journal._write_batch = flaky_write
+
+    def tearDown(self):
+        self.journal.close()
+        self._dir.cleanup()
+        self._stdout.__exit__(None, None, None)
+
+    def wait_for(self, condition, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(condition())
+
+    def test_transient_error_retries_same_batch(self):
+        self.failures = 2
+        for i in range(5):
+            self.journal.record("track", float(i), camera="CAM1")
+        self.wait_for(lambda: self.journal.stats()["written"] == 5)
+
+        stats = self.journal.stats()
+        self.assertEqual(stats["write_errors"], 2)
+        self.assertEqual(stats["dropped"], 0)
+        self.assertEqual(stats["last_error"], "database is locked")
+
+    def test_persistent_error_drops_batch_and_keeps_thread_alive(self):
+        self.failures = 3
+        for i in range(4):
+            self.journal.record("track", float(i), camera="CAM1")
+        self.wait_for(lambda: self.journal.stats()["dropped"] == 4)
+        self.assertTrue(self.journal._thread.is_alive())
+
+        self.journal.record("zone", 10.0, camera="CAM1", display_id=2)
+        self.journal.close()
+        self.assertEqual(self.journal.stats()["written"], 1)
+        self.assertEqual([event["kind"] for event in self.journal.query()], ["zone"])
+
+
+if __name__ == "__main__":
+    unittest.main()